@@ -0,0 +1,303 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""The `batchee` command line interface, for batching TEMPO granule filenames.
+
+Filenames are read from the arguments and/or a file (or standard input), one per
+line, and the batches are written to standard output as JSON, NDJSON or CSV:
+
+- json: a single array with the filenames of each batch, built in memory
+- ndjson: one object per batch, written (and flushed) as soon as the batch is
+  complete, i.e. once a later scan has been seen; for input in time order, only
+  the open batches are held in memory. Sorted, the batches are instead written
+  at the end, sorted through temporary files beyond a memory budget
+- csv: a row per filename with its batch index, written in chunks; only the
+  batch keys are held in memory, and the indices are the same as for json
+"""
+
+import csv
+import json
+import logging
+import sys
+from argparse import ArgumentParser
+from collections.abc import Iterable, Iterator
+from contextlib import nullcontext
+from itertools import islice
+from typing import TextIO
+
+from batchee.granule_table import GranuleTable
+from batchee.grouping import (
+    DROPPED,
+    UNMATCHED_POLICIES,
+    BatchNumbering,
+    group_by_batch_indices,
+    keep_unmatched,
+)
+from batchee.incremental import IncrementalBatcher
+from batchee.list_logging import log_list
+from batchee.tempo_filename_parser import get_batch_assignment, get_day_and_scan, log_rejected
+
+default_logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ("json", "ndjson", "csv")
+
+# Number of filenames read, parsed and written at a time for CSV output
+CHUNK_SIZE = 65536
+
+# Bytes of complete batches held in memory while sorting NDJSON output, see `ExternalSorter`
+SORT_MEMORY = 64 * 2**20
+
+
+def iter_filenames(file_names: Iterable[str], from_file: str | None = None) -> Iterator[str]:
+    """Yield the given filenames, then each non-blank line of `from_file` ("-" for stdin)."""
+    yield from file_names
+    if from_file is None:
+        return
+
+    with open(from_file, encoding="utf-8") if from_file != "-" else nullcontext(sys.stdin) as lines:
+        for line in lines:
+            name = line.strip()
+            if name:
+                yield name
+
+
+def iter_chunks[T](values: Iterable[T], size: int = CHUNK_SIZE) -> Iterator[list[T]]:
+    """Yield lists of up to `size` consecutive values."""
+    iterator = iter(values)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def group_filenames(
+    filenames: list[str], sort: bool = False, unmatched: str = "drop"
+) -> list[list[str]]:
+    """Group filenames into batches, as `get_batch_assignment` (or sorted by day, scan
+    and granule, with `sort`)."""
+    if not sort:
+        assignment = get_batch_assignment(filenames, unmatched, default_logger)
+        log_list(default_logger, "batch_indices", assignment.indices)
+        return group_by_batch_indices(assignment.indices, filenames)
+
+    table = GranuleTable.from_urls(filenames)
+    assignment = table.get_batch_assignment(sort=True, unmatched=unmatched)
+    log_rejected(default_logger, filenames, assignment.rejected)
+    log_list(default_logger, "batch_indices", assignment.indices)
+    order = table.argsort()
+    batches = group_by_batch_indices([assignment.indices[row] for row in order], order)
+    log_list(
+        default_logger,
+        "missing_granules",
+        [granule for rows in batches for granule in table.missing_granules(rows)],
+    )
+    return [table.urls(rows) for rows in batches]
+
+
+def write_csv(filenames: Iterable[str], output: TextIO, unmatched: str = "drop") -> int:
+    """Write a "filename,batch" row for each filename, in input order.
+
+    Filenames that do not match are handled according to `unmatched`, see
+    `batchee.grouping.assign_batches`: dropped filenames are written with an
+    empty batch.
+
+    Returns
+    -------
+    int
+        the number of batches
+    """
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(("filename", "batch"))
+    numbering = BatchNumbering(unmatched)
+    for chunk in iter_chunks(filenames):
+        assignment = numbering.assign([get_day_and_scan(name) for name in chunk], chunk)
+        writer.writerows(
+            (name, "" if index == DROPPED else index)
+            for name, index in zip(chunk, assignment.indices, strict=True)
+        )
+    return numbering.batch_count
+
+
+def write_ndjson(
+    filenames: Iterable[str],
+    output: TextIO,
+    open_batches: int = 1,
+    sort: bool = False,
+    unmatched: str = "drop",
+) -> int:
+    """Write a {"batch": index, "filenames": [...]} line for each batch, as soon as it closes.
+
+    See `batchee.incremental.IncrementalBatcher`. With `sort`, the filenames of each
+    batch are sorted by granule, and the line also lists the "missing_granules"; the
+    lines are then written once all filenames are read, sorted by the first granule
+    of each batch, holding at most `SORT_MEMORY` bytes of them in memory (see
+    `batchee.spill.ExternalSorter`). Filenames that do not match are dropped, or
+    raise a ValueError if `unmatched` is "error" (putting them in batches of their
+    own, with "batch", is not supported).
+
+    Returns
+    -------
+    int
+        the number of batches
+    """
+    batcher = IncrementalBatcher(open_batches, default_logger)
+    batches: dict[int, list[str]] = {}
+    sorter = None
+    if sort:
+        # Imported only when needed, as most output is written as each batch closes
+        from batchee.spill import ExternalSorter
+
+        sorter = ExternalSorter(SORT_MEMORY)
+
+    def write(indices: list[int]) -> None:
+        for index in indices:
+            record: dict = {"batch": index, "filenames": batches.pop(index)}
+            if sorter is None:
+                output.write(json.dumps(record) + "\n")
+                continue
+            table = GranuleTable.from_urls(record["filenames"])
+            order = table.argsort()
+            record["filenames"] = table.urls(order)
+            record["missing_granules"] = table.missing_granules(range(len(table)))
+            sorter.add(table.sort_keys()[order[0]], record)
+        output.flush()
+
+    with sorter if sorter is not None else nullcontext():
+        for name in filenames:
+            index = batcher.add(name)
+            if index is not None:
+                batches.setdefault(index, []).append(name)
+                if closed := batcher.pop_closed():
+                    write(closed)
+            elif keep_unmatched(unmatched, name):
+                raise ValueError("unmatched 'batch' is not supported for ndjson output")
+        write(batcher.close_all())
+
+        if sorter is not None:
+            for _, record in sorter:
+                output.write(json.dumps(record) + "\n")
+            output.flush()
+    return batcher.batch_count
+
+
+def main(argv: list[str] | None = None) -> list[list[str]] | None:
+    """Main CLI entrypoint
+
+    Without an --output format, the batches are written to standard output as JSON.
+    Filenames that are not valid TEMPO granules with ``--unmatched error`` are
+    reported as a usage error.
+
+    Returns
+    -------
+    list[list[str]] | None
+        the filenames of each batch, if no --output format is given
+    """
+    parser = ArgumentParser(
+        prog="batchee",
+        description="Simple CLI wrapper around the granule batchee module.",
+    )
+    parser.add_argument(
+        "file_names",
+        nargs="*",
+        help="A space-separated list of filenames for which batches will be determined.",
+    )
+    parser.add_argument(
+        "-f",
+        "--from-file",
+        help="Also read filenames, one per line, from this file ('-' for standard input)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        choices=OUTPUT_FORMATS,
+        help="Write the batches to standard output: json (all batches, the default, which holds "
+        "every filename and batch in memory), ndjson (one line per batch, as each batch closes) "
+        "or csv (one filename,batch row per filename)",
+    )
+    parser.add_argument(
+        "--open-batches",
+        type=int,
+        default=1,
+        help="For ndjson output, the number of most recent scans still accepting filenames",
+    )
+    parser.add_argument(
+        "-u",
+        "--unmatched",
+        choices=UNMATCHED_POLICIES,
+        default="drop",
+        help="What to do with filenames that are not TEMPO granules: drop them (the default), "
+        "put each in a batch of its own, or stop with an error",
+    )
+    parser.add_argument(
+        "-s",
+        "--sort",
+        help="Sort the batches, and the filenames within each batch, by day, scan and granule; "
+        "ndjson lines are then written once all filenames are read",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help="Enable verbose output to stdout; useful for debugging",
+        action="store_true",
+    )
+
+    args = parser.parse_args(argv)
+    if not args.file_names and args.from_file is None:
+        parser.error("no filenames given; pass filenames or --from-file")
+    if args.sort and args.output == "csv":
+        parser.error("--sort is not supported with --output csv")
+    if args.unmatched == "batch" and args.output == "ndjson":
+        parser.error("--unmatched batch is not supported with --output ndjson")
+
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+
+    filenames = iter_filenames(args.file_names, args.from_file)
+
+    try:
+        if args.output == "csv":
+            write_csv(filenames, sys.stdout, args.unmatched)
+        elif args.output == "ndjson":
+            write_ndjson(filenames, sys.stdout, args.open_batches, args.sort, args.unmatched)
+        else:
+            grouped_names = group_filenames(list(filenames), args.sort, args.unmatched)
+            json.dump(grouped_names, sys.stdout)
+            sys.stdout.write("\n")
+            if args.output is None:
+                return grouped_names
+    except ValueError as error:
+        # e.g. a filename that does not match, with --unmatched error
+        parser.error(str(error))
+    return None
+
+
+def run() -> None:
+    """Console script entrypoint: `main`, without returning the batches (which would
+    otherwise be taken as the exit status)."""
+    main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""A compact, column-oriented table of parsed TEMPO granules.
+
+Each granule is stored as a handful of machine integers in typed arrays (the
+product, processing level and version as codes into small category lists, and
+the US/Central day, scan and granule numbers), with all URLs in one string
+buffer. Grouping, sorting and slicing work on the integer columns, so no
+Python object is kept per granule between parsing and building the output.
+"""
+
+import logging
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import accumulate
+
+from batchee.grouping import (
+    BatchAssignment,
+    assign_batches,
+    assign_sorted_batches,
+    get_first_seen_indices,
+)
+from batchee.tempo_filename_parser import (
+    check_minute_and_second,
+    get_day_in_us_central_for_utc_hour,
+    tempo_granule_filename_pattern,
+)
+
+default_logger = logging.getLogger(__name__)
+
+# The code, day, scan and granule of a filename that is not a TEMPO granule
+UNMATCHED = 0
+_UNMATCHED_SORT_KEY = 2**62
+
+
+class _Urls(Sequence[str]):
+    """The URLs of a table, as a sequence, without copying them."""
+
+    def __init__(self, table: "GranuleTable"):
+        self._table = table
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __getitem__(self, position):  # type: ignore[override]
+        return self._table.url(position)
+
+
+def _get_code(categories: list[str], codes: dict[str, int], value: str) -> int:
+    """The (1-based) code of a category value, adding the value if it is new."""
+    code = codes.get(value)
+    if code is None:
+        categories.append(value)
+        code = codes[value] = len(categories)
+    return code
+
+
+class GranuleTable:
+    """
+    Parsed TEMPO granule filenames, one row per filename, in typed arrays.
+
+    Rows that do not match `tempo_granule_filename_pattern` keep their URL,
+    with every other column set to `UNMATCHED` (0).
+
+    Attributes
+    ----------
+    products, levels, versions : array.array
+        1-based codes into `product_names`, `level_names` and `version_names`,
+        e.g. "NO2", "L2" and "NRT_V02"
+    days : array.array
+        the US/Central day of each granule, as a YYYYMMDD integer
+    scans, granules : array.array
+        the daily scan and granule numbers, e.g. 16 and 3 for "S016G03"
+    """
+
+    def __init__(
+        self,
+        url_buffer: str,
+        url_offsets: array,
+        products: array,
+        levels: array,
+        versions: array,
+        days: array,
+        scans: array,
+        granules: array,
+        product_names: list[str],
+        level_names: list[str],
+        version_names: list[str],
+    ):
+        self._url_buffer = url_buffer
+        self._url_offsets = url_offsets
+        self.products = products
+        self.levels = levels
+        self.versions = versions
+        self.days = days
+        self.scans = scans
+        self.granules = granules
+        self.product_names = product_names
+        self.level_names = level_names
+        self.version_names = version_names
+
+    @classmethod
+    def from_urls(
+        cls, urls: Iterable[str], logger: logging.Logger = default_logger
+    ) -> "GranuleTable":
+        """Parse granule URLs (or filenames) into a new table."""
+        urls = urls if isinstance(urls, Sequence) else list(urls)
+        products, levels, versions = array("H"), array("H"), array("H")
+        days, scans, granules = array("l"), array("H"), array("B")
+        product_names: list[str] = []
+        level_names: list[str] = []
+        version_names: list[str] = []
+        product_codes: dict[str, int] = {}
+        level_codes: dict[str, int] = {}
+        version_codes: dict[str, int] = {}
+
+        # The few distinct headers and hours, and scan and granule ids, are each converted once
+        header_fields: dict[tuple, tuple[int, int, int, int]] = {}
+        numbers: dict[tuple, tuple[int, int]] = {}
+        hours = 0
+
+        match = tempo_granule_filename_pattern.match
+        append_product, append_level, append_version = (
+            products.append,
+            levels.append,
+            versions.append,
+        )
+        append_day, append_scan, append_granule = days.append, scans.append, granules.append
+        for url in urls:
+            matches = match(url)
+            if not matches:
+                for column in (products, levels, versions, days, scans, granules):
+                    column.append(UNMATCHED)
+                continue
+
+            fields = matches.groups()
+            # Headers are converted once per hour, so the minute and second are checked per row
+            check_minute_and_second(fields[6])
+            header = (*fields[0:6], fields[6][0:2])
+            converted = header_fields.get(header)
+            if converted is None:
+                product_type, proxy, level, nrt, version_id, day, hour = header
+                hours += 1
+                converted = header_fields[header] = (
+                    _get_code(product_names, product_codes, product_type + proxy),
+                    _get_code(level_names, level_codes, level),
+                    _get_code(version_names, version_codes, (nrt or "") + version_id),
+                    int(get_day_in_us_central_for_utc_hour(day, hour)),
+                )
+            ids = fields[7:9]
+            scan_and_granule = numbers.get(ids)
+            if scan_and_granule is None:
+                scan_and_granule = numbers[ids] = (int(ids[0][1:]), int(ids[1][1:]))
+
+            append_product(converted[0])
+            append_level(converted[1])
+            append_version(converted[2])
+            append_day(converted[3])
+            append_scan(scan_and_granule[0])
+            append_granule(scan_and_granule[1])
+
+        url_offsets = array("q", accumulate(map(len, urls), initial=0))
+        logger.debug(f"GranuleTable of {len(days)} granules, {hours} distinct headers and hours.")
+        return cls(
+            "".join(urls),
+            url_offsets,
+            products,
+            levels,
+            versions,
+            days,
+            scans,
+            granules,
+            product_names,
+            level_names,
+            version_names,
+        )
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __getitem__(self, positions: slice) -> "GranuleTable":
+        """A new table of the rows in a slice."""
+        return self.take(range(len(self))[positions])
+
+    def url(self, position: int) -> str:
+        """The URL of one row."""
+        offsets = self._url_offsets
+        return self._url_buffer[offsets[position] : offsets[position + 1]]
+
+    def urls(self, positions: Iterable[int] | None = None) -> list[str]:
+        """The URLs of the given rows (by default, of every row), in order."""
+        buffer, offsets = self._url_buffer, self._url_offsets
+        if positions is None:
+            positions = range(len(self))
+        return [buffer[offsets[i] : offsets[i + 1]] for i in positions]
+
+    def matched(self) -> Iterator[int]:
+        """The positions of the rows that are TEMPO granules."""
+        return (position for position, day in enumerate(self.days) if day)
+
+    def keys(self) -> array:
+        """The batch key of each row, day * 1000 + scan, e.g. 20130701009; 0 if not matched."""
+        return array(
+            "q", [day * 1000 + scan for day, scan in zip(self.days, self.scans, strict=True)]
+        )
+
+    def sort_keys(self) -> array:
+        """The sort key of each row, day * 100000 + scan * 100 + granule; rows that are not
+        matched sort last."""
+        return array(
+            "q",
+            [
+                day * 100_000 + scan * 100 + granule if day else _UNMATCHED_SORT_KEY
+                for day, scan, granule in zip(self.days, self.scans, self.granules, strict=True)
+            ],
+        )
+
+    def batch_indices(self, sort: bool = False) -> list[int]:
+        """
+        The batch index of each matched row, as `tempo_filename_parser.get_batch_indices`.
+
+        Parameters
+        ----------
+        sort : bool, optional (default: False)
+            number the batches by day and scan, instead of in the order they are first seen
+
+        Returns
+        -------
+        list[int]
+            batch index for each matched row, in the order of the rows
+        """
+        if sort:
+            return self.get_batch_assignment(sort=True).matched_indices()
+        return get_first_seen_indices(key for key in self.keys() if key)
+
+    def get_batch_assignment(self, sort: bool = False, unmatched: str = "drop") -> BatchAssignment:
+        """
+        The batch index of every row, and the positions of the rows that are not matched.
+
+        Parameters
+        ----------
+        sort : bool, optional (default: False)
+            number the batches by day and scan, instead of in the order they are first seen;
+            batches of unmatched rows (see `unmatched`) then come last
+        unmatched : str, optional (default: "drop")
+            "drop", "batch" or "error", see `batchee.grouping.assign_batches`
+        """
+        keys = self.keys()
+        if not sort:
+            return assign_batches((key or None for key in keys), unmatched, _Urls(self))
+        return assign_sorted_batches([key or None for key in keys], unmatched, _Urls(self))
+
+    def group_positions(self, sort: bool = False) -> list[array]:
+        """
+        The positions of the matched rows of each batch.
+
+        Parameters
+        ----------
+        sort : bool, optional (default: False)
+            order the batches by day and scan, and the rows of each batch by granule
+            (see `argsort`), instead of in the order they are first seen
+
+        Returns
+        -------
+        list[array.array]
+            for each batch, its row positions
+        """
+        keys = self.keys()
+        grouped: dict[int, array] = {}
+        for position in self.argsort() if sort else range(len(keys)):
+            key = keys[position]
+            if key:
+                group = grouped.get(key)
+                if group is None:
+                    group = grouped[key] = array("q")
+                group.append(position)
+        return list(grouped.values())
+
+    def argsort(self) -> list[int]:
+        """The row positions ordered by day, scan and granule, then by position.
+
+        Rows that are not matched come last. This is a single sort on one integer
+        key per row, see `sort_keys`.
+        """
+        return sorted(range(len(self)), key=self.sort_keys().__getitem__)
+
+    def missing_granules(self, positions: Iterable[int]) -> list[str]:
+        """
+        The granules missing from the scans of the given rows, i.e. the gaps in their
+        granule numbers, counting from G01 up to the last granule present.
+
+        Returns
+        -------
+        list[str]
+            the missing granules as day, scan and granule, e.g. ["20240731_S016G03"]
+        """
+        present: dict[tuple[int, int], set[int]] = {}
+        for position in positions:
+            day = self.days[position]
+            if day:
+                present.setdefault((day, self.scans[position]), set()).add(self.granules[position])
+
+        return [
+            f"{day}_S{scan:03d}G{granule:02d}"
+            for (day, scan), granules in sorted(present.items())
+            for granule in range(1, max(granules))
+            if granule not in granules
+        ]
+
+    def take(self, positions: Iterable[int]) -> "GranuleTable":
+        """A new table of the given rows, in the given order; the categories are shared."""
+        positions = positions if isinstance(positions, Sequence) else list(positions)
+        urls = self.urls(positions)
+
+        def column(values: array) -> array:
+            return array(values.typecode, [values[i] for i in positions])
+
+        return GranuleTable(
+            "".join(urls),
+            array("q", accumulate(map(len, urls), initial=0)),
+            column(self.products),
+            column(self.levels),
+            column(self.versions),
+            column(self.days),
+            column(self.scans),
+            column(self.granules),
+            self.product_names,
+            self.level_names,
+            self.version_names,
+        )
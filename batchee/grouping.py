@@ -0,0 +1,484 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""Order-preserving grouping helpers shared by the CLI and the Harmony adapter."""
+
+from collections.abc import Callable, Hashable, Iterable, Iterator, Sequence
+from typing import Any, NamedTuple
+
+# How granules whose filename does not match are batched, see `assign_batches`
+UNMATCHED_POLICIES = ("drop", "batch", "error")
+
+# The batch index of a dropped granule
+DROPPED = -1
+
+# Which copy of a duplicated granule is kept, see `find_duplicates`
+DEDUPLICATION_POLICIES = ("newest", "first")
+
+
+def get_first_seen_indices(keys: Iterable[Hashable]) -> list[int]:
+    """Assign an integer to each key, numbering distinct keys in the order they first appear.
+
+    This runs in a single pass over `keys` with a dictionary lookup per entry,
+    i.e. O(n) overall.
+
+    Parameters
+    ----------
+    keys : Iterable[Hashable]
+        The grouping key for each entry, e.g. [('20130701', 'S009'), ('20130701', 'S009'), ...]
+
+    Returns
+    -------
+    list[int]
+        index for each key in the original iterable, e.g. [0, 0, 0, 1, 1, 1, ...]
+    """
+    index_by_key: dict[Hashable, int] = {}
+    indices: list[int] = []
+    for key in keys:
+        index = index_by_key.get(key)
+        if index is None:
+            index = index_by_key[key] = len(index_by_key)
+        indices.append(index)
+
+    return indices
+
+
+def assign_batches(
+    keys: Iterable[Hashable | None], unmatched: str = "drop", names: Sequence[str] | None = None
+) -> "BatchAssignment":
+    """Assign a batch index to each key, in a single pass, keeping positions aligned.
+
+    Distinct keys are numbered in the order they first appear, as by
+    `get_first_seen_indices`. A None key (e.g. a filename that does not match
+    the pattern of its parser) is handled according to `unmatched`.
+
+    Parameters
+    ----------
+    keys : Iterable[Hashable | None]
+        the grouping key of each entry, or None if it has none
+    unmatched : str, optional (default: "drop")
+        "drop" to give unmatched entries the index `DROPPED`, "batch" to put each
+        in a batch of its own (numbered where it appears), or "error" to raise a
+        ValueError at the first one
+    names : Sequence[str], optional
+        the filename of each entry, for the error message
+
+    Returns
+    -------
+    BatchAssignment
+    """
+    return BatchNumbering(unmatched).assign(keys, names)
+
+
+def assign_sorted_batches(
+    keys: Sequence[Any], unmatched: str = "drop", names: Sequence[str] | None = None
+) -> "BatchAssignment":
+    """Assign a batch index to each key as `assign_batches` does, but number distinct
+    keys in their sorted order instead of in the order they first appear.
+
+    The batches of unmatched entries (with `unmatched` "batch") come after all
+    others, in the order the entries appear.
+
+    Parameters
+    ----------
+    keys : Sequence
+        the sortable grouping key of each entry, or None if it has none
+    unmatched : str, optional (default: "drop")
+        "drop", "batch" or "error", see `assign_batches`
+    names : Sequence[str], optional
+        the filename of each entry, for the error message
+
+    Returns
+    -------
+    BatchAssignment
+    """
+    # Sorting is stable, so the unmatched entries keep their order after all the others
+    order = sorted(
+        range(len(keys)),
+        key=lambda position: (True, ()) if keys[position] is None else (False, keys[position]),
+    )
+    sorted_names = (
+        [names[position] for position in order] if names and unmatched == "error" else None
+    )
+    assignment = assign_batches((keys[position] for position in order), unmatched, sorted_names)
+
+    indices = [DROPPED] * len(keys)
+    for position, index in zip(order, assignment.indices, strict=True):
+        indices[position] = index
+    return BatchAssignment(indices, [order[position] for position in assignment.rejected])
+
+
+def keep_unmatched(unmatched: str, name: str) -> bool:
+    """Apply the `unmatched` policy (see `assign_batches`) to an entry without a key.
+
+    Returns
+    -------
+    bool
+        True if the entry goes in a batch of its own, False if it is dropped
+
+    Raises
+    ------
+    ValueError
+        with `unmatched` "error"
+    """
+    if unmatched == "error":
+        raise ValueError(f"Granule filename does not match its pattern: {name}")
+    return unmatched == "batch"
+
+
+class BatchNumbering:
+    """
+    Batch indices of entries that are assigned a chunk at a time, e.g. from a stream,
+    numbered across all chunks as `assign_batches` numbers them in a single pass.
+    """
+
+    def __init__(self, unmatched: str = "drop"):
+        """
+        Parameters
+        ----------
+        unmatched : str, optional (default: "drop")
+            "drop", "batch" or "error", see `assign_batches`
+        """
+        if unmatched not in UNMATCHED_POLICIES:
+            raise ValueError(f"unmatched must be one of {UNMATCHED_POLICIES}, not {unmatched!r}")
+
+        self.unmatched = unmatched
+        self.batch_count = 0
+        self.entry_count = 0
+        self._index_by_key: dict[Hashable, int] = {}
+
+    def assign(
+        self, keys: Iterable[Hashable | None], names: Sequence[str] | None = None
+    ) -> "BatchAssignment":
+        """Assign a batch index to each of the next entries.
+
+        Parameters
+        ----------
+        keys : Iterable[Hashable | None]
+            the grouping key of each entry, or None if it has none
+        names : Sequence[str], optional
+            the filename of each entry, for the error message
+
+        Returns
+        -------
+        BatchAssignment
+            the batch of each of these entries; rejected positions count from the
+            first of them
+        """
+        index_by_key = self._index_by_key
+        indices: list[int] = []
+        rejected: list[int] = []
+        batch_count = self.batch_count
+        for position, key in enumerate(keys):
+            if key is None:
+                rejected.append(position)
+                name = (
+                    names[position]
+                    if names is not None
+                    else f"at position {self.entry_count + position}"
+                )
+                if keep_unmatched(self.unmatched, name):
+                    index = batch_count
+                    batch_count += 1
+                else:
+                    index = DROPPED
+            else:
+                known_index = index_by_key.get(key)
+                if known_index is None:
+                    known_index = index_by_key[key] = batch_count
+                    batch_count += 1
+                index = known_index
+            indices.append(index)
+        self.batch_count = batch_count
+        self.entry_count += len(indices)
+
+        return BatchAssignment(indices, rejected)
+
+
+def find_duplicates(
+    identities: Iterable[tuple[Hashable, int] | None], keep: str = "newest"
+) -> list[int]:
+    """Find the entries that are copies of another entry with the same identity.
+
+    This runs in a single pass with one hash index, from each identity to the
+    entry kept so far, i.e. O(n) overall.
+
+    Parameters
+    ----------
+    identities : Iterable[tuple[Hashable, int] | None]
+        for each entry, its identity and its version, e.g.
+        (("NO2", "L2", False, "20240731", "S016", "G03"), 3), or None for an
+        entry that is never a duplicate
+    keep : str, optional (default: "newest")
+        "newest" to keep the copy with the highest version (the first of those,
+        on ties), or "first" to keep the first copy
+
+    Returns
+    -------
+    list[int]
+        the positions of the copies to drop, in order
+    """
+    if keep not in DEDUPLICATION_POLICIES:
+        raise ValueError(f"keep must be one of {DEDUPLICATION_POLICIES}, not {keep!r}")
+
+    kept: dict[Hashable, tuple[int, int]] = {}
+    dropped: list[int] = []
+    for position, identity in enumerate(identities):
+        if identity is None:
+            continue
+        key, version = identity
+        previous = kept.get(key)
+        if previous is None:
+            kept[key] = (position, version)
+        elif keep == "newest" and version > previous[1]:
+            dropped.append(previous[0])
+            kept[key] = (position, version)
+        else:
+            dropped.append(position)
+
+    dropped.sort()
+    return dropped
+
+
+class BatchAssignment(NamedTuple):
+    """The batch of each entry of the input, at the same position."""
+
+    #: batch index of each entry, or `DROPPED`
+    indices: list[int]
+    #: the positions of the entries that had no key, in order
+    rejected: list[int]
+
+    def matched_indices(self) -> list[int]:
+        """The batch indices without the dropped entries, as `get_batch_indices` returns."""
+        return [index for index in self.indices if index != DROPPED]
+
+
+def group_by_batch_indices[T](batch_indices: Iterable[int], values: Iterable[T]) -> list[list[T]]:
+    """Collect `values` into one list per batch, ordered by batch index.
+
+    Values with a negative batch index (i.e. `DROPPED`) are left out. Within
+    each batch, values keep their order.
+
+    Parameters
+    ----------
+    batch_indices : Iterable[int]
+        batch index for each value, e.g. [0, 0, 0, 1, 1, 1, ...]
+    values : Iterable
+        the entries to be grouped, in the same order as `batch_indices`
+
+    Returns
+    -------
+    list[list]
+        values grouped by batch, e.g. [[v0, v1, v2], [v3, v4, v5], ...]
+    """
+    grouped = _group(batch_indices, values)
+
+    # Batches numbered in first-seen order are already in index order
+    if any(index != position for position, index in enumerate(grouped)):
+        return [grouped[index] for index in sorted(grouped)]
+    return list(grouped.values())
+
+
+def group_by_first_appearance[T](
+    batch_indices: Iterable[int], values: Iterable[T]
+) -> list[list[T]]:
+    """Collect `values` into one list per batch, ordered by where each batch first appears.
+
+    As `group_by_batch_indices`, but the batch indices only identify the batches:
+    e.g. for values already in sorted order, the batches come out sorted by their
+    first value, however they were numbered.
+    """
+    return list(_group(batch_indices, values).values())
+
+
+def _group[T](batch_indices: Iterable[int], values: Iterable[T]) -> dict[int, list[T]]:
+    """The values of each batch, by batch index, in the order the batches first appear."""
+    grouped: dict[int, list[T]] = {}
+    for batch_index, value in zip(batch_indices, values, strict=True):
+        group = grouped.get(batch_index)
+        if group is None:
+            if batch_index < 0:
+                continue
+            group = grouped[batch_index] = []
+        group.append(value)
+    return grouped
+
+
+def sort_batches[T](batches: Iterable[Sequence[T]], get_key: Callable[[T], Any]) -> list[list[T]]:
+    """Sort the entries of each batch, then the batches by their first entry.
+
+    Parameters
+    ----------
+    batches : Iterable[Sequence]
+        the batches
+    get_key : Callable
+        the sort key of an entry, e.g. its (day, scan, granule)
+
+    Returns
+    -------
+    list[list]
+        the sorted batches, each sorted; sorting is stable, so entries with equal
+        keys keep their order
+    """
+    sorted_batches = [sorted(batch, key=get_key) for batch in batches]
+    sorted_batches.sort(key=lambda batch: get_key(batch[0]) if batch else ())
+    return sorted_batches
+
+
+def _fits(size: int, count: int, max_size: int, max_count: int) -> bool:
+    """Whether a batch of `count` entries totalling `size` is within the caps (0 means no cap)."""
+    return (not max_size or size <= max_size) and (not max_count or count <= max_count)
+
+
+def _split_greedy(sizes: Sequence[int], max_size: int, max_count: int) -> list[int]:
+    """Return the end of each piece, filling every piece as far as the caps allow."""
+    ends: list[int] = []
+    piece_size = piece_count = 0
+    for position, size in enumerate(sizes):
+        if piece_count and not _fits(piece_size + size, piece_count + 1, max_size, max_count):
+            ends.append(position)
+            piece_size = piece_count = 0
+        piece_size += size
+        piece_count += 1
+    ends.append(len(sizes))
+    return ends
+
+
+def _split_even(sizes: Sequence[int], pieces: int) -> list[int]:
+    """Return the end of each of `pieces` pieces of (nearly) equal size, or equal count."""
+    if any(sizes):
+        total, cumulative = sum(sizes), 0
+        ends: list[int] = []
+        for position, size in enumerate(sizes):
+            # Cut before this entry if it is closer to the next target than after it
+            target = total * (len(ends) + 1) / pieces
+            if position > 0 and len(ends) < pieces - 1 and cumulative + size / 2 > target:
+                ends.append(position)
+            cumulative += size
+        return [*ends, len(sizes)]
+
+    quotient, remainder = divmod(len(sizes), pieces)
+    return [(i + 1) * quotient + min(i + 1, remainder) for i in range(pieces)]
+
+
+def split_batch[T](
+    batch: Sequence[T], sizes: Sequence[int], max_size: int = 0, max_count: int = 0
+) -> list[list[T]]:
+    """Split a batch into contiguous pieces within a size and/or count cap.
+
+    The batch is cut into as few pieces as the caps allow, balanced so that the
+    pieces have similar sizes (rather than, say, several full pieces and a small
+    remainder). An entry larger than `max_size` on its own forms a piece by itself.
+
+    Parameters
+    ----------
+    batch : Sequence
+        the entries of the batch, in order
+    sizes : Sequence[int]
+        the size of each entry, e.g. in bytes
+    max_size : int, optional
+        the largest total size of a piece; 0 for no cap
+    max_count : int, optional
+        the largest number of entries in a piece; 0 for no cap
+
+    Returns
+    -------
+    list[list]
+        the pieces, in order; a single piece if the batch is already within the caps
+    """
+    ends = _split_greedy(sizes, max_size, max_count)
+    if len(ends) > 1:
+        even_ends = _split_even(sizes, len(ends))
+        starts = [0, *even_ends[:-1]]
+        if len(even_ends) == len(ends) and all(
+            start < end and _fits(sum(sizes[start:end]), end - start, max_size, max_count)
+            for start, end in zip(starts, even_ends, strict=True)
+        ):
+            ends = even_ends
+
+    starts = [0, *ends[:-1]]
+    return [list(batch[start:end]) for start, end in zip(starts, ends, strict=True)]
+
+
+def balance_batches[T](
+    batches: Iterable[Sequence[T]],
+    get_size: Callable[[T], int] | None = None,
+    max_size: int = 0,
+    max_count: int = 0,
+    merge: bool = False,
+) -> Iterator[list[T]]:
+    """Lazily split oversized batches and, optionally, merge consecutive undersized ones.
+
+    Parameters
+    ----------
+    batches : Iterable[Sequence]
+        the batches, in order
+    get_size : Callable, optional
+        the size of an entry, e.g. in bytes; required for `max_size`
+    max_size : int, optional
+        the largest total size of a batch; 0 for no cap
+    max_count : int, optional
+        the largest number of entries in a batch; 0 for no cap
+    merge : bool, optional (default: False)
+        combine consecutive batches while the combination is within the caps (if
+        there are any caps). Only use this where the entries of different batches
+        may be processed together.
+
+    Yields
+    ------
+    list
+        the balanced batches, in order; see `split_batch`
+    """
+    if max_size and get_size is None:
+        raise ValueError("get_size is required to cap the size of batches")
+    merge = merge and bool(max_size or max_count)
+
+    pending: list[T] = []
+    pending_size = 0
+    for batch in batches:
+        sizes = [get_size(entry) for entry in batch] if get_size is not None else [0] * len(batch)
+        batch_size = sum(sizes)
+
+        if (
+            merge
+            and pending
+            and _fits(pending_size + batch_size, len(pending) + len(batch), max_size, max_count)
+        ):
+            pending.extend(batch)
+            pending_size += batch_size
+            continue
+
+        if pending:
+            yield pending
+            pending, pending_size = [], 0
+
+        if merge and _fits(batch_size, len(batch), max_size, max_count):
+            pending, pending_size = list(batch), batch_size
+        else:
+            yield from split_batch(batch, sizes, max_size, max_count)
+
+    if pending:
+        yield pending
@@ -26,11 +26,14 @@
 # limitations under the License.
 """A Harmony CLI wrapper around batchee"""
 
+import sys
 from argparse import ArgumentParser
 
 import harmony_service_lib
 
+from batchee.harmony.options import BatcheeOptions
 from batchee.harmony.service_adapter import ConcatBatching as HarmonyAdapter
+from batchee.harmony.writers import run_cli, run_worker, uses_batchee_invoke
 
 
 def main(config: harmony_service_lib.util.Config = None) -> None:
@@ -50,9 +53,27 @@ def main(config: harmony_service_lib.util.Config = None) -> None:
         description="Run the pre-concatenate-batching service",
     )
     harmony_service_lib.setup_cli(parser)
+    parser.add_argument(
+        "--batchee-worker",
+        metavar="FILE",
+        help="run as a long-lived worker, invoking the service for each JSON request line "
+        "read from FILE (- for standard input), instead of once",
+    )
     args = parser.parse_args()
-    if harmony_service_lib.is_harmony_cli(args):
-        harmony_service_lib.run_cli(parser, args, HarmonyAdapter, cfg=config)
+    if args.batchee_worker:
+        wrap_stdout = bool(args.harmony_wrap_stdout)
+        if args.batchee_worker == "-":
+            failure_count = run_worker(sys.stdin, HarmonyAdapter, config, wrap_stdout)
+        else:
+            with open(args.batchee_worker) as requests:
+                failure_count = run_worker(requests, HarmonyAdapter, config, wrap_stdout)
+        if failure_count:
+            sys.exit(1)
+    elif harmony_service_lib.is_harmony_cli(args):
+        if args.harmony_action == "invoke" and uses_batchee_invoke(BatcheeOptions.from_env()):
+            run_cli(parser, args, HarmonyAdapter, cfg=config)
+        else:
+            harmony_service_lib.run_cli(parser, args, HarmonyAdapter, cfg=config)
     else:
         parser.error("Only --harmony CLIs are supported")
 
@@ -0,0 +1,153 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""Per-stage timers and counters of a Harmony invocation, and their exporters"""
+
+import json
+import logging
+import os
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+
+class InvocationMetrics:
+    """
+    Time spent in each stage of an invocation, and counters such as the number of
+    items read, batches produced, the size of the largest batch and bytes written.
+
+    The stages are, in pipeline order: read_items, extract_urls, assign_batches,
+    group, build_catalogs and write_output. In streaming mode the stages are
+    interleaved, so each stage is timed around its own work (e.g. reading each
+    item) rather than from start to end.
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.stage_seconds: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the body of a `with` block, and add it to the total of a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def timed[T](self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Iterate over `iterable`, adding the time spent producing each value to a stage."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                value = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add_time(name, time.perf_counter() - start)
+            yield value
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_max(self, name: str, value: int) -> None:
+        self.counters[name] = max(self.counters.get(name, 0), value)
+
+    def as_dict(self) -> dict[str, Any]:
+        """The metrics as a JSON-serializable dictionary."""
+        total_seconds = time.perf_counter() - self.start_time
+        items = self.counters.get("items", 0)
+        return {
+            "total_seconds": round(total_seconds, 6),
+            "items_per_second": round(items / total_seconds, 1) if total_seconds else 0.0,
+            "stage_seconds": {
+                name: round(seconds, 6) for name, seconds in self.stage_seconds.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def log(self, logger: logging.Logger) -> dict[str, Any]:
+        """Write the metrics as one JSON log record, and return them."""
+        record = self.as_dict()
+        logger.info(f"batchee.metrics {json.dumps(record)}", extra={"batcheeMetrics": record})
+        return record
+
+
+def write_prometheus_textfile(record: dict[str, Any], filename: str) -> None:
+    """Write metrics (as returned by `InvocationMetrics.as_dict`) in the Prometheus text
+    format, e.g. for the node_exporter textfile collector. The file is replaced atomically.
+    """
+    lines = [
+        "# HELP batchee_invocation_seconds Duration of the last batchee invocation.",
+        "# TYPE batchee_invocation_seconds gauge",
+        f"batchee_invocation_seconds {record['total_seconds']}",
+        "# HELP batchee_items_per_second Input items processed per second.",
+        "# TYPE batchee_items_per_second gauge",
+        f"batchee_items_per_second {record['items_per_second']}",
+        "# HELP batchee_stage_seconds Time spent in each stage of the last invocation.",
+        "# TYPE batchee_stage_seconds gauge",
+    ]
+    lines.extend(
+        f'batchee_stage_seconds{{stage="{name}"}} {seconds}'
+        for name, seconds in record["stage_seconds"].items()
+    )
+    for name, value in record["counters"].items():
+        lines.extend(
+            [
+                f"# TYPE batchee_{name} gauge",
+                f"batchee_{name} {value}",
+            ]
+        )
+
+    temporary_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(temporary_filename, "w") as file:
+        file.write("\n".join(lines) + "\n")
+    os.replace(temporary_filename, filename)
+
+
+def export_opentelemetry(record: dict[str, Any]) -> None:
+    """Record metrics (as returned by `InvocationMetrics.as_dict`) with the OpenTelemetry
+    meter provider configured in this process.
+
+    This requires the ``opentelemetry-api`` package, which is not a dependency of
+    batchee; exporting is configured as usual for OpenTelemetry, e.g. with the
+    ``opentelemetry-sdk`` and its environment variables.
+    """
+    from opentelemetry.metrics import get_meter
+
+    meter = get_meter("batchee")
+    meter.create_histogram("batchee.invocation.duration", unit="s").record(record["total_seconds"])
+    stage_duration = meter.create_histogram("batchee.stage.duration", unit="s")
+    for name, seconds in record["stage_seconds"].items():
+        stage_duration.record(seconds, {"stage": name})
+    for name, value in record["counters"].items():
+        meter.create_histogram(f"batchee.{name}").record(value)
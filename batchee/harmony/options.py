@@ -0,0 +1,231 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""Service options for the Harmony adapter, read from environment variables"""
+
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def _get_bool(environ: Mapping[str, str], name: str, default: bool) -> bool:
+    """Interpret an environment variable as a boolean flag."""
+    value = environ.get(name)
+    return default if value is None else value.strip().lower() in TRUE_VALUES
+
+
+def _get_str(environ: Mapping[str, str], name: str, default: str) -> str:
+    """Read an environment variable as a string, ignoring surrounding whitespace."""
+    return environ.get(name, default).strip()
+
+
+def _get_int(environ: Mapping[str, str], name: str, default: int) -> int:
+    """Interpret an environment variable as an integer."""
+    value = environ.get(name)
+    return default if value is None or not value.strip() else int(value)
+
+
+@dataclass(frozen=True)
+class BatcheeOptions:
+    """
+    Optional behaviors of the Harmony adapter. Each option can be set through the
+    environment variable named in its description, e.g. in the Harmony service
+    configuration.
+
+    Attributes
+    ----------
+    streaming : bool
+        BATCHEE_STREAMING -- walk the input catalog lazily, and save each batch
+        catalog as soon as its scan is complete instead of after all batches are
+        built. Intended for inputs sorted by time, for which peak memory is then
+        bounded by the largest batch.
+    streaming_open_batches : int
+        BATCHEE_STREAMING_OPEN_BATCHES -- in streaming mode, the number of the
+        most recent scans that are still accepting granules. Raise this when
+        granules of consecutive scans may arrive interleaved.
+    grouping_memory : int
+        BATCHEE_GROUPING_MEMORY -- outside streaming mode, group the input items
+        holding only about this many bytes of them in memory, spilling sorted runs
+        to temporary files (in ``TMPDIR``), for catalogs larger than memory. The
+        batches are the same as without it; the largest batch must still fit in
+        memory. 0 (the default) groups all items in memory. The parse cache and
+        sharding are not used.
+    read_concurrency : int
+        BATCHEE_READ_CONCURRENCY -- the number of threads used to read the input
+        STAC item files, e.g. from S3 or a network file system. Items are still
+        processed in catalog order, so batches are the same as for a serial read.
+    fast_writer : bool
+        BATCHEE_FAST_WRITER -- write the batch catalogs and their items straight to
+        JSON (with orjson, if installed) instead of through `pystac` objects.
+    fast_reader : bool
+        BATCHEE_FAST_READER -- read only the data asset href, bbox, datetimes and
+        size of each input STAC item from its JSON file, into a
+        `batchee.harmony.util.GranuleRecord`, instead of building a `pystac.Item`.
+    write_concurrency : int
+        BATCHEE_WRITE_CONCURRENCY -- with the fast writer, the number of threads
+        writing output files.
+    previous_output : str
+        BATCHEE_PREVIOUS_OUTPUT -- the Harmony metadata directory of a previous run
+        (e.g. of the request being retried), to reuse: the catalog of each batch
+        whose granules and catalog fields are unchanged links to the item files of
+        that run instead of new ones. Implies the fast writer and `batch_fingerprint`.
+        See `batchee.harmony.previous_output.PreviousOutput`.
+    batch_extent : bool
+        BATCHEE_BATCH_EXTENT -- add the extent of each batch to its output catalog,
+        as "batchee:extent".
+    batch_fingerprint : bool
+        BATCHEE_BATCH_FINGERPRINT -- add the fingerprint of the granules of each
+        batch to its output catalog, as "batchee:fingerprint", so that a later run
+        can reuse the output with `previous_output`.
+    max_batch_bytes : int
+        BATCHEE_MAX_BATCH_BYTES -- split larger batches into contiguous sub-batches of
+        similar size, using the `file:size` of each granule asset (or the size of a
+        local file). 0 means no limit.
+    max_batch_granules : int
+        BATCHEE_MAX_BATCH_GRANULES -- split batches of more granules into contiguous
+        sub-batches of similar length. 0 means no limit.
+    merge_small_batches : bool
+        BATCHEE_MERGE_SMALL_BATCHES -- combine consecutive batches while they stay
+        within the limits above. This puts several scans in one batch, so only enable
+        it where the downstream service may concatenate granules across scans.
+    unmatched_granules : str
+        BATCHEE_UNMATCHED_GRANULES -- what to do with granules whose filename does not
+        match the pattern of their parser: "drop" them (the default), put each in a
+        "batch" of its own, or fail the request with an "error".
+    deduplicate_granules : str
+        BATCHEE_DEDUPLICATE_GRANULES -- drop the granules that are listed more than
+        once in a batch, keeping the "newest" version or the "first" listed copy of
+        each (by default, "", every copy is kept). See
+        `batchee.tempo_filename_parser.find_duplicate_granules`.
+    sort_batches : bool
+        BATCHEE_SORT_BATCHES -- order the batches, and the granules within each batch,
+        by (US/Central day, scan, granule) instead of the order of the input. In
+        streaming mode, only the granules within each batch are sorted. The catalog
+        of each batch of TEMPO granules then lists the granules missing from its
+        scans, as "batchee:missing_granules".
+    metrics_file : str
+        BATCHEE_METRICS_FILE -- write the per-stage timings and counters of each
+        invocation to this file, in the Prometheus text format.
+    metrics_otel : bool
+        BATCHEE_METRICS_OTEL -- record the per-stage timings and counters of each
+        invocation with OpenTelemetry (requires ``opentelemetry-api``).
+    profile : str
+        BATCHEE_PROFILE -- "cprofile" or "pyinstrument", to profile each invocation
+        and save the profile beside the Harmony metadata directory (not in it, as
+        Harmony reads that directory), or in `profile_dir`.
+    profile_dir : str
+        BATCHEE_PROFILE_DIR -- a directory (or S3 URL) to save the profiles in instead,
+        named after the request id of each invocation.
+    parse_cache : str
+        BATCHEE_PARSE_CACHE -- an SQLite file caching the parsed fields of TEMPO
+        granule filenames across invocations, which can be shared by the worker
+        processes of a node. Not used in streaming mode.
+    parse_cache_size : int
+        BATCHEE_PARSE_CACHE_SIZE -- the number of granules kept in the parse cache,
+        least recently used first out.
+    shard_threshold : int
+        BATCHEE_SHARD_THRESHOLD -- assign batches with a pool of worker processes,
+        each parsing a shard of the granule filenames, for requests of at least this
+        many granules. 0 means never.
+    shard_processes : int
+        BATCHEE_SHARD_PROCESSES -- the number of worker processes for sharded batch
+        assignment; 0 for one per available CPU. Sharding is skipped with fewer than 2.
+    log_dump_dir : str
+        BATCHEE_LOG_DUMP_DIR -- write the full lists of granule URLs and batch indices
+        as JSON files in this directory; the log only holds a summary of them.
+    """
+
+    streaming: bool = False
+    streaming_open_batches: int = 1
+    grouping_memory: int = 0
+    read_concurrency: int = 1
+    fast_writer: bool = False
+    fast_reader: bool = False
+    write_concurrency: int = 1
+    previous_output: str = ""
+    batch_extent: bool = False
+    batch_fingerprint: bool = False
+    max_batch_bytes: int = 0
+    max_batch_granules: int = 0
+    merge_small_batches: bool = False
+    unmatched_granules: str = "drop"
+    deduplicate_granules: str = ""
+    sort_batches: bool = False
+    metrics_file: str = ""
+    metrics_otel: bool = False
+    profile: str = ""
+    profile_dir: str = ""
+    parse_cache: str = ""
+    parse_cache_size: int = 1_000_000
+    shard_threshold: int = 1_000_000
+    shard_processes: int = 0
+    log_dump_dir: str = ""
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] | None = None) -> "BatcheeOptions":
+        """Build the options from environment variables (by default, `os.environ`)."""
+        environ = os.environ if environ is None else environ
+        return cls(
+            streaming=_get_bool(environ, "BATCHEE_STREAMING", cls.streaming),
+            streaming_open_batches=_get_int(
+                environ, "BATCHEE_STREAMING_OPEN_BATCHES", cls.streaming_open_batches
+            ),
+            grouping_memory=_get_int(environ, "BATCHEE_GROUPING_MEMORY", cls.grouping_memory),
+            read_concurrency=_get_int(environ, "BATCHEE_READ_CONCURRENCY", cls.read_concurrency),
+            fast_writer=_get_bool(environ, "BATCHEE_FAST_WRITER", cls.fast_writer),
+            fast_reader=_get_bool(environ, "BATCHEE_FAST_READER", cls.fast_reader),
+            write_concurrency=_get_int(environ, "BATCHEE_WRITE_CONCURRENCY", cls.write_concurrency),
+            previous_output=_get_str(environ, "BATCHEE_PREVIOUS_OUTPUT", cls.previous_output),
+            batch_extent=_get_bool(environ, "BATCHEE_BATCH_EXTENT", cls.batch_extent),
+            batch_fingerprint=_get_bool(
+                environ, "BATCHEE_BATCH_FINGERPRINT", cls.batch_fingerprint
+            ),
+            max_batch_bytes=_get_int(environ, "BATCHEE_MAX_BATCH_BYTES", cls.max_batch_bytes),
+            max_batch_granules=_get_int(
+                environ, "BATCHEE_MAX_BATCH_GRANULES", cls.max_batch_granules
+            ),
+            merge_small_batches=_get_bool(
+                environ, "BATCHEE_MERGE_SMALL_BATCHES", cls.merge_small_batches
+            ),
+            unmatched_granules=_get_str(
+                environ, "BATCHEE_UNMATCHED_GRANULES", cls.unmatched_granules
+            ).lower(),
+            deduplicate_granules=_get_str(
+                environ, "BATCHEE_DEDUPLICATE_GRANULES", cls.deduplicate_granules
+            ).lower(),
+            sort_batches=_get_bool(environ, "BATCHEE_SORT_BATCHES", cls.sort_batches),
+            metrics_file=_get_str(environ, "BATCHEE_METRICS_FILE", cls.metrics_file),
+            metrics_otel=_get_bool(environ, "BATCHEE_METRICS_OTEL", cls.metrics_otel),
+            profile=_get_str(environ, "BATCHEE_PROFILE", cls.profile).lower(),
+            profile_dir=_get_str(environ, "BATCHEE_PROFILE_DIR", cls.profile_dir),
+            parse_cache=_get_str(environ, "BATCHEE_PARSE_CACHE", cls.parse_cache),
+            parse_cache_size=_get_int(environ, "BATCHEE_PARSE_CACHE_SIZE", cls.parse_cache_size),
+            shard_threshold=_get_int(environ, "BATCHEE_SHARD_THRESHOLD", cls.shard_threshold),
+            shard_processes=_get_int(environ, "BATCHEE_SHARD_PROCESSES", cls.shard_processes),
+            log_dump_dir=_get_str(environ, "BATCHEE_LOG_DUMP_DIR", cls.log_dump_dir),
+        )
@@ -0,0 +1,128 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""The batch catalogs of a previous run, for reuse by an incremental run.
+
+A retried request, or one that appends a few granules, often produces mostly
+the same batches as an earlier run. Each batch catalog records the fingerprint
+of its granule URLs as "batchee:fingerprint". With the `batch-catalogs.json` of
+a previous run, a batch whose index, fingerprint and other catalog fields are
+unchanged does not need new item files. Its new catalog links to the item
+files of the previous run instead (see `batchee.harmony.writers.write_batch_json`).
+
+The batch index must be unchanged, because the root and parent links of the
+previous item files point to the previous catalog of the same name, e.g.
+`../catalog3.json`. Once a batch is inserted or removed, the later batches are
+written in full.
+"""
+
+import json
+import logging
+from os import path
+from typing import Any
+
+from pystac import StacIO
+from pystac.utils import make_absolute_href
+
+default_logger = logging.getLogger(__name__)
+
+
+class PreviousOutput:
+    """
+    The batch catalogs of a previous run, by their file names.
+
+    Parameters
+    ----------
+    catalogs : dict[str, tuple[str, dict]]
+        for each batch catalog file name (e.g. "catalog3.json") with a
+        "batchee:fingerprint", the href and JSON of the previous batch catalog
+    """
+
+    def __init__(self, catalogs: dict[str, tuple[str, dict[str, Any]]]):
+        self._catalogs = catalogs
+
+    def __len__(self) -> int:
+        return len(self._catalogs)
+
+    @classmethod
+    def read(cls, metadata_dir: str, logger: logging.Logger = default_logger) -> "PreviousOutput":
+        """Read the batch catalogs listed in the `batch-catalogs.json` of a previous run's
+        metadata directory (a local path or an S3 URL).
+
+        The output of a run that cannot be read, and the catalogs without a
+        fingerprint (written by an older version), are skipped with a warning, as
+        their batches are then simply rebuilt.
+        """
+        stac_io = StacIO.default()
+        catalogs: dict[str, tuple[str, dict[str, Any]]] = {}
+        try:
+            filenames = json.loads(
+                stac_io.read_text(path.join(metadata_dir, "batch-catalogs.json"))
+            )
+            for filename in filenames:
+                href = path.join(metadata_dir, filename)
+                catalog = json.loads(stac_io.read_text(href))
+                if catalog.get("batchee:fingerprint") is not None:
+                    catalogs[filename] = (href, catalog)
+        except (OSError, ValueError) as error:
+            logger.warning(f"Could not read the previous output in {metadata_dir}: {error}")
+            return cls({})
+
+        if len(catalogs) < len(filenames):
+            logger.warning(
+                f"{len(filenames) - len(catalogs)} previous batch catalogs have no "
+                "fingerprint and cannot be reused."
+            )
+        logger.info(f"Read {len(catalogs)} previous batch catalogs from {metadata_dir}.")
+        return cls(catalogs)
+
+    def get_item_links(
+        self, catalog_filename: str, fields: dict[str, Any]
+    ) -> list[dict[str, Any]] | None:
+        """The item links of the previous catalog of a batch, with absolute hrefs, or None
+        if the batch was not in the previous output.
+
+        A previous catalog matches a batch if it has the same file name (i.e. batch
+        index), the same "batchee:fingerprint" and the same value for every other
+        field in `fields` (see `ConcatBatching.get_batch_fields`), e.g. the same
+        extent. Its item files then describe the same granules as new ones would,
+        and their root and parent links point to an equivalent catalog. Each
+        previous catalog matches at most one batch.
+        """
+        if catalog_filename not in self._catalogs:
+            return None
+        href, catalog = self._catalogs[catalog_filename]
+        if "batchee:fingerprint" not in fields or any(
+            catalog.get(name) != value for name, value in fields.items()
+        ):
+            return None
+
+        del self._catalogs[catalog_filename]
+        return [
+            {**link, "href": make_absolute_href(link["href"], href)}
+            for link in catalog["links"]
+            if link["rel"] == "item"
+        ]
@@ -24,6 +24,12 @@
 # is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
 # either express or implied. See the License for the specific language governing permissions and
 # limitations under the License.
+import pickle
+from collections.abc import Hashable, Iterable, Iterator, Sequence
+from contextlib import closing
+from itertools import batched, groupby
+from operator import itemgetter
+from typing import TYPE_CHECKING, Any
 from uuid import uuid4
 
 import pystac
@@ -32,12 +38,51 @@ from harmony_service_lib.util import bbox_to_geometry
 from pystac import Item
 from pystac.item import Asset
 
+from batchee.granule_table import GranuleTable
+from batchee.grouping import (
+    DEDUPLICATION_POLICIES,
+    DROPPED,
+    UNMATCHED_POLICIES,
+    BatchNumbering,
+    balance_batches,
+    group_by_batch_indices,
+    group_by_first_appearance,
+    keep_unmatched,
+)
+from batchee.harmony.metrics import (
+    InvocationMetrics,
+    export_opentelemetry,
+    write_prometheus_textfile,
+)
+from batchee.harmony.options import BatcheeOptions
 from batchee.harmony.util import (
+    GranuleRecord,
+    InputItem,
+    _get_batch_catalog_template,
+    _get_item_date_range,
+    _get_item_size,
     _get_item_url,
     _get_netcdf_urls,
-    _get_output_date_range,
+    _iter_catalog_items,
+    get_batch_extent,
+    get_batch_fingerprint,
+    read_granule_record,
+    to_granule_record,
+)
+from batchee.incremental import IncrementalBatcher
+from batchee.list_logging import log_list
+from batchee.parsers import TEMPO_PARSER, FilenameParser, ParserRegistry, default_registry
+from batchee.tempo_filename_parser import (
+    find_duplicate_granules,
+    get_batch_assignment,
+    log_rejected,
 )
-from batchee.tempo_filename_parser import get_batch_indices
+
+if TYPE_CHECKING:
+    from batchee.parse_cache import ParseCache
+
+# The number of input items whose filenames are parsed at a time by `iter_grouped_batches`
+_GROUPING_CHUNK_SIZE = 4096
 
 
 class ConcatBatching(BaseHarmonyAdapter):
@@ -47,7 +92,7 @@ class ConcatBatching(BaseHarmonyAdapter):
     as support for this behavior is being depreciated in harmony-service-lib
     """
 
-    def __init__(self, message, catalog=None, config=None):
+    def __init__(self, message, catalog=None, config=None, options=None):
         """
         Constructs the adapter
 
@@ -59,12 +104,38 @@ class ConcatBatching(BaseHarmonyAdapter):
             A STAC catalog containing the files on which to act
         config : harmony.util.Config
             The configuration values for this runtime environment.
+        options : batchee.harmony.options.BatcheeOptions
+            Optional service behaviors; read from environment variables if not given.
         """
         super().__init__(message, catalog=catalog, config=config)
+        self.options = options if options is not None else BatcheeOptions.from_env()
+        self.filename_parser = self._get_filename_parser()
+        self.metrics = InvocationMetrics()
+
+    def _get_filename_parser(self) -> FilenameParser | ParserRegistry:
+        """Pick the filename parser registered for the collection(s) of the Harmony message.
+
+        If the sources do not all resolve to the same parser, every registered
+        parser is used, with each granule routed by its filename; a registry of a
+        single parser resolves to that parser.
+        """
+        if len(default_registry) == 1:
+            return next(iter(default_registry))
+        parsers = {
+            default_registry.for_collection(source.collection, source.shortName)
+            for source in self.message.sources
+        }
+        parser = parsers.pop() if len(parsers) == 1 else None
+        return default_registry if parser is None else parser
 
     def invoke(self):
         """
         Primary entrypoint into the service wrapper. Overrides BaseHarmonyAdapter.invoke
+
+        The metrics are reported here, before harmony-service-lib writes the output,
+        so their record has no "write_output" stage or "bytes_written" counter. Options
+        that export the metrics run batchee's invocation instead, which reports them
+        once the output is written (see `batchee.harmony.writers.uses_batchee_invoke`).
         """
         if not self.catalog:
             # Message-only support is being depreciated in Harmony, so we should expect to
@@ -72,71 +143,44 @@ class ConcatBatching(BaseHarmonyAdapter):
             # https://github.com/nasa/harmony-service-lib-py/blob/21bcfbda17caf626fb14d2ac4f8673be9726b549/harmony/adapter.py#L71
             raise RuntimeError("Invoking Batchee without a STAC catalog is not supported")
 
-        return self.message, self.process_catalog(self.catalog)
+        catalogs = self.process_catalog(self.catalog)
+        self.report_metrics()
+        return self.message, catalogs
+
+    def report_metrics(self) -> dict:
+        """Log the timings and counters of this invocation as one JSON record, and export
+        them as configured in the service options. Returns the record.
+        """
+        record = self.metrics.log(self.logger)
+        if self.options.metrics_file:
+            try:
+                write_prometheus_textfile(record, self.options.metrics_file)
+            except OSError as error:
+                self.logger.warning(f"Could not write metrics file: {error}")
+        if self.options.metrics_otel:
+            try:
+                export_opentelemetry(record)
+            except ImportError:
+                self.logger.warning("BATCHEE_METRICS_OTEL requires opentelemetry-api")
+        return record
 
     def process_catalog(self, catalog: pystac.Catalog) -> list[pystac.Catalog]:
         """Converts a list of STAC catalogs into a list of lists of STAC catalogs."""
         self.logger.info("process_catalog() started.")
         try:
-            # Get all the items from the catalog, including from child or linked catalogs
-            items = list(self.get_all_catalog_items(catalog))
-
-            self.logger.info(f"length of items==={len(items)}.")
+            grouped = self.group_batches(catalog)
 
             # Quick return if catalog contains no items
-            if len(items) == 0:
-                result = catalog.clone()
-                result.id = str(uuid4())
-                result.clear_children()
-                return result
-
-            # # --- Get granule filepaths (urls) ---
-            netcdf_urls: list[str] = _get_netcdf_urls(items)
-            self.logger.info(f"netcdf_urls==={netcdf_urls}.")
-
-            # --- Map each granule to an index representing the batch to which it belongs ---
-            batch_indices: list[int] = get_batch_indices(netcdf_urls, self.logger)
-            sorted(set(batch_indices), key=batch_indices.index)
-            self.logger.info(f"batch_indices==={batch_indices}.")
-
-            # --- Construct a dictionary with a separate key for each batch ---
-            grouped: dict[int, list[Item]] = {}
-            for k, v in zip(batch_indices, items, strict=False):
-                grouped.setdefault(k, []).append(v)
+            if len(grouped) == 0:
+                return self._build_empty_catalog(catalog)
 
             # --- Construct a list of STAC Catalogs (which represent each TEMPO scan),
             #   and each Catalog holds multiple Items (which represent each granule).
-            catalogs = []
-            for batch_id, batch_items in grouped.items():
-                self.logger.info(f"constructing new pystac.Catalog for batch_id==={batch_id}.")
-                # Initialize a new, empty Catalog
-                batch_catalog = catalog.clone()
-                batch_catalog.id = str(uuid4())
-                batch_catalog.clear_children()
-                batch_catalog.clear_items()
-
-                for _, item in enumerate(batch_items):
-                    # Construct a new pystac.Item for each granule in the batch
-                    output_item = Item(
-                        str(uuid4()),
-                        bbox_to_geometry(item.bbox),
-                        item.bbox,
-                        None,
-                        _get_output_date_range([item]),
-                    )
-                    output_item.add_asset(
-                        "data",
-                        Asset(
-                            _get_item_url(item),
-                            title=_get_item_url(item),
-                            media_type="application/x-netcdf4",
-                            roles=["data"],
-                        ),
-                    )
-                    batch_catalog.add_item(output_item)
-
-                self.logger.info("STAC catalog creation for batch_id==={batch_id} complete.")
-                catalogs.append(batch_catalog)
+            template = _get_batch_catalog_template(catalog)
+            catalogs = [
+                self._build_batch_catalog(template, batch_id, batch_items)
+                for batch_id, batch_items in enumerate(grouped)
+            ]
 
             self.logger.info("All STAC catalogs are complete.")
 
@@ -145,3 +189,451 @@ class ConcatBatching(BaseHarmonyAdapter):
         except Exception as service_exception:
             self.logger.error(service_exception, exc_info=1)
             raise service_exception
+
+    def iter_batch_catalogs(self, catalog: pystac.Catalog) -> Iterator[pystac.Catalog]:
+        """Lazily yield one STAC catalog per batch, each as soon as its scan is complete.
+
+        See `iter_batches`.
+        """
+        self.logger.info("iter_batch_catalogs() started.")
+        try:
+            template = _get_batch_catalog_template(catalog)
+            for batch_id, batch_items in enumerate(self.iter_batches(catalog)):
+                yield self._build_batch_catalog(template, batch_id, batch_items)
+
+            self.logger.info("All STAC catalogs are complete.")
+
+        except Exception as service_exception:
+            self.logger.error(service_exception, exc_info=1)
+            raise service_exception
+
+    def group_batches(self, catalog: pystac.Catalog) -> list[list[tuple[InputItem, str]]]:
+        """Read all the items of the input catalog, and group them into batches.
+
+        Returns
+        -------
+        list[list[tuple[InputItem, str]]]
+            for each batch, in the order batches are first seen (or sorted, with
+            `options.sort_batches`), each input item with the URL of its NetCDF-4
+            data asset
+        """
+        metrics = self.metrics
+        sort = self.options.sort_batches
+
+        # Get all the items from the catalog, including from child or linked catalogs
+        with metrics.stage("read_items"):
+            items = list(self._iter_input_items(catalog))
+        metrics.count("items", len(items))
+
+        self.logger.info(f"length of items==={len(items)}.")
+
+        if len(items) == 0:
+            return []
+
+        # # --- Get granule filepaths (urls) ---
+        with metrics.stage("extract_urls"):
+            netcdf_urls: list[str] = _get_netcdf_urls(items)
+        log_list(self.logger, "netcdf_urls", netcdf_urls, self.options.log_dump_dir)
+
+        # --- Map each granule to an index representing the batch to which it belongs ---
+        unmatched = self.options.unmatched_granules
+        with metrics.stage("assign_batches"):
+            parse_cache = self._get_parse_cache()
+            table = None
+            if parse_cache is not None:
+                with closing(parse_cache):
+                    assignment = get_batch_assignment(
+                        netcdf_urls, unmatched, self.logger, parse_cache
+                    )
+            elif shard_processes := self._get_shard_processes(len(netcdf_urls)):
+                from batchee.sharding import get_batch_assignment_sharded
+
+                assignment = get_batch_assignment_sharded(
+                    netcdf_urls,
+                    self.filename_parser.get_key,
+                    shard_processes,
+                    self.logger,
+                    unmatched,
+                )
+            elif self._parses_tempo_only():
+                # Parse TEMPO granules once into typed columns, without a Python key per granule
+                table = GranuleTable.from_urls(netcdf_urls, self.logger)
+                assignment = table.get_batch_assignment(unmatched=unmatched)
+                log_rejected(self.logger, netcdf_urls, assignment.rejected)
+            else:
+                assignment = self.filename_parser.get_batch_assignment(
+                    netcdf_urls, unmatched, self.logger
+                )
+        metrics.count("unmatched_granules", len(assignment.rejected))
+        log_list(self.logger, "batch_indices", assignment.indices, self.options.log_dump_dir)
+
+        # --- Construct a list with a separate entry for each batch ---
+        with metrics.stage("group"):
+            batch_indices = assignment.indices
+            grouped: list[list[tuple[InputItem, str]]]
+            if not sort:
+                grouped = group_by_batch_indices(
+                    batch_indices, zip(items, netcdf_urls, strict=True)
+                )
+            else:
+                # Visit the granules in (day, scan, granule) order, so that the batches and the
+                # granules of each batch are sorted, however the batches were numbered
+                order = table.argsort() if table is not None else self._argsort(items, netcdf_urls)
+                grouped = group_by_first_appearance(
+                    (batch_indices[position] for position in order),
+                    ((items[position], netcdf_urls[position]) for position in order),
+                )
+            if self.options.deduplicate_granules:
+                grouped = [self._deduplicate(batch) for batch in grouped]
+            batches = list(self._balance_batches(grouped))
+
+        for batch in batches:
+            self._record_batch(batch)
+        return batches
+
+    def iter_batches(self, catalog: pystac.Catalog) -> Iterator[list[tuple[InputItem, str]]]:
+        """Lazily yield the batches of the input catalog, each as soon as its scan is complete.
+
+        Items are read from the (possibly paged) input catalog one at a time. A
+        batch is complete once granules from `options.streaming_open_batches`
+        later scans have been seen, so for input sorted by time only the open
+        batches are held in memory. A granule that arrives after its batch was
+        yielded is placed in a batch of its own. Each batch is then split or merged
+        as for `group_batches`, see `_balance_batches`.
+
+        Yields
+        ------
+        list[tuple[InputItem, str]]
+            each input item of a batch, with the URL of its NetCDF-4 data asset
+        """
+        batches: Iterable[list[tuple[InputItem, str]]] = self._iter_scan_batches(catalog)
+        if self.options.deduplicate_granules:
+            batches = map(self._deduplicate, batches)
+        if self.options.sort_batches:
+            # Batches are yielded as they complete, so only the items of each are sorted
+            batches = (sorted(batch, key=self._get_sort_key) for batch in batches)
+        for batch in self._balance_batches(batches):
+            self._record_batch(batch)
+            yield batch
+
+    def iter_grouped_batches(
+        self, catalog: pystac.Catalog
+    ) -> Iterator[list[tuple[InputItem, str]]]:
+        """Lazily yield the batches of `group_batches`, holding only about
+        `options.grouping_memory` bytes of input items in memory.
+
+        Items are read one at a time, each kept as its `GranuleRecord`, and tagged
+        with its place in the output: the order of its batch, then its position in
+        the catalog (or, for sorted batches, its sort key). The tagged records are
+        sorted with an `ExternalSorter`, which spills sorted runs to temporary files
+        and merges them, so the batches come out one at a time, in order. Each batch
+        is then de-duplicated and balanced as in `group_batches`.
+
+        Yields
+        ------
+        list[tuple[InputItem, str]]
+            the `GranuleRecord` of each input item of a batch, with the URL of its NetCDF-4
+            data asset
+        """
+        # Imported only when needed, as few requests are larger than memory
+        from batchee.spill import ExternalSorter
+
+        metrics = self.metrics
+        with ExternalSorter(self.options.grouping_memory) as sorter:
+            for order, batch_id, record in self._iter_grouping_entries(catalog):
+                sorter.add(order, (batch_id, record))
+            metrics.count("spilled_runs", sorter.run_count)
+            metrics.count("spilled_bytes", sorter.spilled_bytes)
+
+            merged = (value for _, value in metrics.timed("group", sorter))
+            batches: Iterable[list[tuple[InputItem, str]]] = (
+                [(record, record.url) for _, record in batch]
+                for _, batch in groupby(merged, key=itemgetter(0))
+            )
+            if self.options.deduplicate_granules:
+                batches = map(self._deduplicate, batches)
+            for batch in self._balance_batches(batches):
+                self._record_batch(batch)
+                yield batch
+
+    def _iter_grouping_entries(
+        self, catalog: pystac.Catalog
+    ) -> Iterator[tuple[tuple, Hashable, GranuleRecord]]:
+        """The sort key, batch and record of each batched input item, for
+        `iter_grouped_batches`. Sorting by the keys orders the items as `group_batches`
+        does: by batch, then by position; or, for sorted batches, by the sort key of
+        each granule (see `_get_sort_key` and `GranuleTable.sort_keys`), then by position.
+        """
+        options = self.options
+        unmatched = options.unmatched_granules
+        if unmatched not in UNMATCHED_POLICIES:
+            raise ValueError(f"BATCHEE_UNMATCHED_GRANULES must be one of {UNMATCHED_POLICIES}")
+        sort = options.sort_batches
+        tempo_only = self._parses_tempo_only()
+        metrics = self.metrics
+
+        numbering = BatchNumbering(unmatched)
+        position = 0
+        rejected_count = 0
+        items = metrics.timed("read_items", self._iter_input_items(catalog))
+        for chunk in batched(items, _GROUPING_CHUNK_SIZE):
+            with metrics.stage("extract_urls"):
+                urls = _get_netcdf_urls(list(chunk))
+
+            # Parse TEMPO granules in chunks, for the same keys as the table of `group_batches`
+            with metrics.stage("assign_batches"):
+                if tempo_only:
+                    table = GranuleTable.from_urls(urls, self.logger)
+                    table_keys = table.keys()
+                    keys: Iterable[Hashable | None] = (key or None for key in table_keys)
+                    sort_keys = table.sort_keys()
+                else:
+                    keys = (self.filename_parser.get_key(url) for url in urls)
+                assignment = numbering.assign(keys, urls)
+            rejected_count += len(assignment.rejected)
+
+            # Each batch index is unique to its batch, and unmatched granules kept in
+            # batches of their own sort last
+            for row, (item, url, batch_id) in enumerate(
+                zip(chunk, urls, assignment.indices, strict=True)
+            ):
+                position += 1
+                if batch_id == DROPPED:
+                    continue
+                record = to_granule_record(item, url)
+                if not sort:
+                    yield (batch_id, position), batch_id, record
+                elif tempo_only:
+                    yield (sort_keys[row], position), batch_id, record
+                else:
+                    yield (self._get_sort_key((record, url)), position), batch_id, record
+
+        metrics.count("items", position)
+        metrics.count("unmatched_granules", rejected_count)
+        self.logger.info(f"length of items==={position}.")
+        if rejected_count:
+            self.logger.warning(f"{rejected_count} granule filenames do not match their pattern.")
+
+    def _iter_input_items(self, catalog: pystac.Catalog) -> Iterator[InputItem]:
+        """Lazily yield the input items of the catalog, as `pystac.Item` instances or, with
+        `options.fast_reader`, as the `GranuleRecord` of each item file."""
+        return _iter_catalog_items(
+            catalog,
+            max_workers=self.options.read_concurrency,
+            read_item=read_granule_record if self.options.fast_reader else Item.from_file,
+        )
+
+    def _parses_tempo_only(self) -> bool:
+        """Whether all granules are batched with the TEMPO parser."""
+        parser = self.filename_parser
+        parsers = list(parser) if isinstance(parser, ParserRegistry) else [parser]
+        return parsers == [TEMPO_PARSER]
+
+    def _get_parse_cache(self) -> "ParseCache | None":
+        """The persistent parse cache of the service options, if one is configured and all
+        granules are batched with the TEMPO parser (the cache holds TEMPO fields only).
+        """
+        if not self.options.parse_cache:
+            return None
+
+        if not self._parses_tempo_only():
+            self.logger.warning("BATCHEE_PARSE_CACHE only applies to TEMPO granules; not used.")
+            return None
+        from batchee.parse_cache import ParseCache
+
+        return ParseCache(
+            self.options.parse_cache, self.options.parse_cache_size, logger=self.logger
+        )
+
+    def _get_shard_processes(self, granule_count: int) -> int:
+        """The number of worker processes to assign the batches of this many granules
+        with, per the service options, or 0 to assign them in this process."""
+        options = self.options
+        if not options.shard_threshold or granule_count < options.shard_threshold:
+            return 0
+        # Imported only when needed, as multiprocessing adds to the startup of each job
+        from batchee.sharding import get_available_cpus
+
+        processes = options.shard_processes or get_available_cpus()
+        if processes < 2:
+            return 0
+        try:
+            pickle.dumps(self.filename_parser)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            self.logger.warning("The filename parser cannot be sent to worker processes.")
+            return 0
+        return processes
+
+    def _get_sort_key(self, entry: tuple[InputItem, str]) -> tuple:
+        """The sort key of a granule: its batch key, then its order in the batch, e.g.
+        the (US/Central day, scan, granule) of a TEMPO granule, as `GranuleTable.sort_keys`.
+        Unmatched granules sort last, keeping their order."""
+        sort_key = self.filename_parser.get_sort_key(entry[1])
+        return (1,) if sort_key is None else (0, sort_key)
+
+    def _argsort(self, items: Sequence[InputItem], urls: Sequence[str]) -> list[int]:
+        """The positions of the granules ordered by `_get_sort_key`, then by position."""
+        sort_keys = [self._get_sort_key(entry) for entry in zip(items, urls, strict=True)]
+        return sorted(range(len(sort_keys)), key=sort_keys.__getitem__)
+
+    def get_batch_fields(self, batch_items: list[tuple[InputItem, str]]) -> dict:
+        """Extra fields of the output catalog of a batch.
+
+        With `options.batch_extent`, the catalog of each batch holds the union of its
+        granules' bounding boxes and their full time range as "batchee:extent", laid
+        out as the extent of a STAC Collection (see `batchee.harmony.util.get_batch_extent`).
+        With `options.batch_fingerprint` or `options.previous_output`, it holds the
+        fingerprint of its granule URLs as "batchee:fingerprint" (see
+        `batchee.harmony.util.get_batch_fingerprint`).
+
+        With `options.sort_batches`, the catalog of a batch of TEMPO granules also lists
+        the granules missing from its scans (up to the last granule present), as
+        "batchee:missing_granules", e.g. ["20240731_S016G03"].
+        """
+        options = self.options
+        fields: dict[str, Any] = {}
+        if options.batch_extent:
+            fields["batchee:extent"] = get_batch_extent(item for item, _ in batch_items).to_stac()
+        if options.batch_fingerprint or options.previous_output:
+            fields["batchee:fingerprint"] = get_batch_fingerprint(url for _, url in batch_items)
+        if options.sort_batches and self._parses_tempo_only():
+            table = GranuleTable.from_urls([url for _, url in batch_items], self.logger)
+            fields["batchee:missing_granules"] = table.missing_granules(range(len(table)))
+        return fields
+
+    def _deduplicate(self, batch: list[tuple[InputItem, str]]) -> list[tuple[InputItem, str]]:
+        """Drop the granules of a batch that are listed more than once, keeping one copy of
+        each as per `options.deduplicate_granules`.
+
+        All copies of a granule have the same batch key (its day and scan, or its whole
+        URL), so they are always in the same batch, except for a copy that arrives in
+        streaming mode after its batch was closed.
+        """
+        keep = self.options.deduplicate_granules
+        if keep not in DEDUPLICATION_POLICIES:
+            raise ValueError(
+                f"BATCHEE_DEDUPLICATE_GRANULES must be one of {DEDUPLICATION_POLICIES}"
+            )
+        dropped = find_duplicate_granules([url for _, url in batch], keep, self.logger)
+        if not dropped:
+            return batch
+        self.metrics.count("duplicate_granules", len(dropped))
+        dropped_positions = set(dropped)
+        return [entry for position, entry in enumerate(batch) if position not in dropped_positions]
+
+    def _record_batch(self, batch: list[tuple[InputItem, str]]) -> None:
+        """Count an output batch in the invocation metrics."""
+        self.metrics.count("batches")
+        self.metrics.record_max("largest_batch", len(batch))
+
+    def _iter_scan_batches(self, catalog: pystac.Catalog) -> Iterator[list[tuple[InputItem, str]]]:
+        """Lazily yield the batches of the input catalog, before any balancing."""
+        if self.options.unmatched_granules not in UNMATCHED_POLICIES:
+            raise ValueError(f"BATCHEE_UNMATCHED_GRANULES must be one of {UNMATCHED_POLICIES}")
+        batcher = IncrementalBatcher(
+            self.options.streaming_open_batches, self.logger, self.filename_parser.get_key
+        )
+        open_batches: dict[int, list[tuple[InputItem, str]]] = {}
+        metrics = self.metrics
+
+        item_count = 0
+        items = self._iter_input_items(catalog)
+        for item in metrics.timed("read_items", items):
+            item_count += 1
+            with metrics.stage("extract_urls"):
+                url = _get_item_url(item)
+            if url is None:
+                raise RuntimeError("Some input granules do not have NetCDF-4 assets.")
+
+            with metrics.stage("assign_batches"):
+                batch_id = batcher.add(url)
+            if batch_id is not None:
+                open_batches.setdefault(batch_id, []).append((item, url))
+            else:
+                metrics.count("unmatched_granules")
+                if keep_unmatched(self.options.unmatched_granules, url):
+                    yield [(item, url)]
+
+            for closed_batch_id in batcher.pop_closed():
+                yield open_batches.pop(closed_batch_id)
+
+        for closed_batch_id in batcher.close_all():
+            yield open_batches.pop(closed_batch_id)
+
+        metrics.count("items", item_count)
+        self.logger.info(f"length of items==={item_count}.")
+
+    def _balance_batches(
+        self, batches: Iterable[list[tuple[InputItem, str]]]
+    ) -> Iterable[list[tuple[InputItem, str]]]:
+        """Split batches above, and optionally merge batches below, the size limits
+        in the service options (`max_batch_bytes`, `max_batch_granules` and
+        `merge_small_batches`). Sub-batches keep the order of the granules.
+        """
+        options = self.options
+        if not (options.max_batch_bytes or options.max_batch_granules):
+            return batches
+
+        def get_size(entry: tuple[InputItem, str]) -> int:
+            size = _get_item_size(*entry)
+            if size is None:
+                self.logger.warning(f"Size of granule is not known, counting as 0: {entry[1]}")
+                return 0
+            return size
+
+        return balance_batches(
+            batches,
+            get_size if options.max_batch_bytes else None,
+            max_size=options.max_batch_bytes,
+            max_count=options.max_batch_granules,
+            merge=options.merge_small_batches,
+        )
+
+    def _build_empty_catalog(self, catalog: pystac.Catalog) -> pystac.Catalog:
+        """Construct the output for an input catalog that contains no items."""
+        result = catalog.clone()
+        result.id = str(uuid4())
+        result.clear_children()
+        return result
+
+    def _build_batch_catalog(
+        self, template: pystac.Catalog, batch_id: int, batch_items: list[tuple[InputItem, str]]
+    ) -> pystac.Catalog:
+        """Construct a new STAC Catalog holding a new STAC Item for each granule in a batch.
+
+        Parameters
+        ----------
+        template : pystac.Catalog
+            the input catalog without its items and children, see `_get_batch_catalog_template`
+        batch_id : int
+        batch_items : list[tuple[InputItem, str]]
+            each input item in the batch, with the URL of its NetCDF-4 data asset
+        """
+        self.logger.debug("constructing new pystac.Catalog for batch_id===%s.", batch_id)
+        with self.metrics.stage("build_catalogs"):
+            # Initialize a new, empty Catalog
+            batch_catalog = template.clone()
+            batch_catalog.id = str(uuid4())
+            batch_catalog.extra_fields.update(self.get_batch_fields(batch_items))
+
+            for item, url in batch_items:
+                # Construct a new pystac.Item for each granule in the batch
+                start_datetime, end_datetime = _get_item_date_range(item)
+                output_item = Item(
+                    str(uuid4()),
+                    bbox_to_geometry(item.bbox),
+                    item.bbox,
+                    None,
+                    {
+                        "start_datetime": start_datetime.isoformat(),
+                        "end_datetime": end_datetime.isoformat(),
+                    },
+                )
+                output_item.add_asset(
+                    "data",
+                    Asset(url, title=url, media_type="application/x-netcdf4", roles=["data"]),
+                )
+                batch_catalog.add_item(output_item)
+
+        self.logger.debug("STAC catalog creation for batch_id===%s complete.", batch_id)
+        return batch_catalog
@@ -26,12 +26,107 @@
 # limitations under the License.
 """Misc utility functions"""
 
+import hashlib
+import json
+import os
+from array import array
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from typing import Any, NamedTuple
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
 
-from pystac import Asset, Item
+from pystac import Asset, Catalog, Item, Link, StacIO, read_file
+from pystac.utils import is_absolute_href, str_to_datetime
 
 VALID_EXTENSIONS = (".nc4", ".nc")
 VALID_MEDIA_TYPES = ["application/x-netcdf", "application/x-netcdf4"]
+READ_AHEAD_PER_WORKER = 4
+
+
+class GranuleRecord(NamedTuple):
+    """The fields of an input STAC Item that batching needs, read straight from
+    the item's JSON by `read_granule_record`. It stands in for the `pystac.Item`
+    in `_get_item_url`, `_get_item_size`, `_get_item_date_range` and the batch
+    catalog writers.
+    """
+
+    #: the item file the record was read from
+    href: str
+    #: the href of the item's NetCDF-4 data asset, as `_get_item_url`
+    url: str | None
+    bbox: list[float] | None
+    start_datetime: datetime
+    end_datetime: datetime
+    #: the `file:size` of the data asset, if given
+    size: int | None
+
+    def to_item(self) -> Item:
+        """Read the full `pystac.Item`, for when more than these fields are needed."""
+        return Item.from_file(self.href)
+
+
+type InputItem = Item | GranuleRecord
+
+
+def _parse_datetime(value: str) -> datetime:
+    """Parse an RFC 3339 datetime as pystac does, with the faster
+    `datetime.fromisoformat` for the common forms."""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return str_to_datetime(value)
+
+
+def _is_netcdf_asset_dict(asset: dict[str, Any]) -> bool:
+    """`_is_netcdf_asset`, for the JSON of an asset."""
+    media_type = asset.get("type")
+    return media_type in VALID_MEDIA_TYPES or (
+        media_type is None and asset["href"].lower().endswith(VALID_EXTENSIONS)
+    )
+
+
+def read_granule_record(href: str) -> GranuleRecord:
+    """Read a STAC Item file into a `GranuleRecord`, without building a `pystac.Item`.
+
+    The file is read with the default `pystac.StacIO` (as `pystac.Item.from_file`
+    reads it), and its data asset is picked with the same rules as `_get_item_url`.
+    Hrefs are kept as they are in the file.
+
+    Raises
+    ------
+    ValueError
+        if the item has neither a datetime nor a start and end datetime
+    """
+    item_dict = json.loads(StacIO.default().read_text(href))
+
+    url = None
+    size = None
+    for asset in item_dict.get("assets", {}).values():
+        if "data" in (asset.get("roles") or []) and _is_netcdf_asset_dict(asset):
+            url = asset["href"]
+            size = asset.get("file:size")
+            break
+
+    properties = item_dict.get("properties", {})
+    if properties.get("datetime"):
+        start_datetime = end_datetime = _parse_datetime(properties["datetime"])
+    elif properties.get("start_datetime") and properties.get("end_datetime"):
+        start_datetime = _parse_datetime(properties["start_datetime"])
+        end_datetime = _parse_datetime(properties["end_datetime"])
+    else:
+        raise ValueError(f"Item {href} has neither a datetime nor start and end datetimes")
+
+    return GranuleRecord(
+        href,
+        url,
+        item_dict.get("bbox"),
+        start_datetime,
+        end_datetime,
+        None if size is None else int(size),
+    )
 
 
 def _is_netcdf_asset(asset: Asset) -> bool:
@@ -45,11 +140,13 @@ def _is_netcdf_asset(asset: Asset) -> bool:
     )
 
 
-def _get_item_url(item: Item) -> str | None:
+def _get_item_url(item: InputItem) -> str | None:
     """Check the `pystac.Item` for the first asset with the `data` role and a
     valid input format. If there are no matching assets, return None
 
     """
+    if isinstance(item, GranuleRecord):
+        return item.url
     return next(
         (
             asset.href
@@ -60,7 +157,53 @@ def _get_item_url(item: Item) -> str | None:
     )
 
 
-def _get_netcdf_urls(items: list[Item]) -> list[str]:
+def _get_item_size(item: InputItem, url: str) -> int | None:
+    """Return the size in bytes of the granule at `url`, from the `file:size` of its
+    asset (STAC file extension) or, for a local file, from the file system. Return
+    None if the size is not known.
+
+    """
+    size = _get_asset_size(item, url)
+    if size is not None:
+        return size
+
+    scheme, _, path, _, _ = urlsplit(url)
+    if scheme not in ("", "file"):
+        return None
+    try:
+        return os.stat(url2pathname(path) if scheme else url).st_size
+    except OSError:
+        return None
+
+
+def _get_asset_size(item: InputItem, url: str) -> int | None:
+    """The `file:size` of the asset of an item at `url`, if given."""
+    if isinstance(item, GranuleRecord):
+        return item.size if item.url == url else None
+    for asset in item.assets.values():
+        if asset.href == url and "file:size" in asset.extra_fields:
+            return int(asset.extra_fields["file:size"])
+    return None
+
+
+def to_granule_record(item: InputItem, url: str) -> GranuleRecord:
+    """The `GranuleRecord` of an input item, with the URL of its data asset; a
+    record is returned as is. Records, unlike `pystac.Item` instances, are small
+    and cheap to pickle."""
+    if isinstance(item, GranuleRecord):
+        return item
+    start_datetime, end_datetime = _get_item_date_range(item)
+    return GranuleRecord(
+        item.get_self_href() or "",
+        url,
+        list(item.bbox) if item.bbox is not None else None,
+        start_datetime,
+        end_datetime,
+        _get_asset_size(item, url),
+    )
+
+
+def _get_netcdf_urls(items: list[InputItem]) -> list[str]:
     """Iterate through a list of `pystac.Item` instances, from the input
     `pystac.Catalog`. Extract the `pystac.Asset.href` for the first asset
     of each item that has a role of "data". If there are any items that do
@@ -75,52 +218,219 @@ def _get_netcdf_urls(items: list[Item]) -> list[str]:
     return catalog_urls  # type: ignore[return-value]
 
 
-def _get_output_bounding_box(input_items: list[Item]) -> list[float]:
-    """Create a bounding box that is the maximum combined extent of all input
-    `pystac.Item` bounding box extents.
+def _iter_catalog_items(
+    catalog: Catalog,
+    follow_page_links: bool = True,
+    max_workers: int = 1,
+    read_item: Callable[[str], InputItem] = Item.from_file,
+) -> Iterator[InputItem]:
+    """Lazily yield the `pystac.Item` instances of a catalog, of its child
+    catalogs, and of any following pages (catalogs linked with rel="next").
+
+    Unlike `pystac.Catalog.get_all_items`, items that are read from file are
+    not cached on the catalog links, and each page is released once its items
+    have been yielded, so memory does not grow with the number of items.
+
+    With `max_workers` greater than one, item files are read by a pool of
+    threads, up to a few reads per thread ahead of the consumer, and the next
+    page is read while the current one is being processed. Items are always
+    yielded in catalog order.
+
+    Item files are read with `read_item`, e.g. `read_granule_record` to read
+    only the fields needed for batching. Items already in memory are yielded
+    as they are.
+
+    """
+    if max_workers <= 1:
+        page: Catalog | None = catalog
+        while page is not None:
+            for link in page.get_links(rel="item"):
+                if link.is_resolved():
+                    yield link.target  # type: ignore[misc]
+                else:
+                    yield read_item(_get_absolute_href(link))
 
+            for link in page.get_links(rel="child"):
+                yield from _iter_catalog_items(
+                    _get_linked_catalog(link), follow_page_links=False, read_item=read_item
+                )
+
+            next_link = page.get_single_link(rel="next") if follow_page_links else None
+            page = _get_linked_catalog(next_link) if next_link is not None else None
+        return
+
+    with ThreadPoolExecutor(max_workers, thread_name_prefix="batchee-reader") as executor:
+        pending: deque[Future[InputItem]] = deque()
+        reads = _submit_catalog_item_reads(catalog, follow_page_links, executor, read_item)
+        for future in reads:
+            pending.append(future)
+            if len(pending) >= READ_AHEAD_PER_WORKER * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _submit_catalog_item_reads(
+    catalog: Catalog,
+    follow_page_links: bool,
+    executor: ThreadPoolExecutor,
+    read_item: Callable[[str], InputItem] = Item.from_file,
+) -> Iterator[Future[InputItem]]:
+    """Submit the reads of the items in a catalog, in catalog order, as the
+    returned futures are consumed. See `_iter_catalog_items`.
+
+    """
+    page: Catalog | None = catalog
+    while page is not None:
+        # Read the next page in the background while this one's items are submitted
+        next_link = page.get_single_link(rel="next") if follow_page_links else None
+        next_page = executor.submit(_get_linked_catalog, next_link) if next_link else None
+
+        for link in page.get_links(rel="item"):
+            if link.is_resolved():
+                resolved: Future[InputItem] = Future()
+                resolved.set_result(link.target)  # type: ignore[arg-type]
+                yield resolved
+            else:
+                yield executor.submit(read_item, _get_absolute_href(link))
+
+        for link in page.get_links(rel="child"):
+            yield from _submit_catalog_item_reads(
+                _get_linked_catalog(link), False, executor, read_item
+            )
+
+        page = next_page.result() if next_page is not None else None
+
+
+def _get_absolute_href(link: Link) -> str:
+    """The absolute href of a link, resolved against the href of the catalog that holds it.
+
+    Raises
+    ------
+    ValueError
+        if the href is relative and the catalog has no href to resolve it against
+    """
+    href = link.get_absolute_href()
+    if href is None or not is_absolute_href(href):
+        raise ValueError(f"Cannot resolve the href of a {link.rel!r} link: {link.href}")
+    return href
+
+
+def _get_linked_catalog(link: Link) -> Catalog:
+    """The catalog that a child or next-page link points to, read if it is not yet resolved."""
+    target = link.target if link.is_resolved() else read_file(_get_absolute_href(link))
+    if not isinstance(target, Catalog):
+        raise ValueError(f"The {link.rel!r} link does not point to a STAC catalog: {link.href}")
+    return target
+
+
+def _get_batch_catalog_template(catalog: Catalog) -> Catalog:
+    """Copy the metadata and links of the input `pystac.Catalog`, except for
+    its item and child links. Cloning this template for each output batch
+    avoids copying, and then removing, every input item link per batch.
+
+    """
+    template = catalog.clone()
+    template.links = [link for link in template.links if link.rel not in ("item", "child")]
+    return template
+
+
+class BatchExtent(NamedTuple):
+    """The spatial and temporal extent of a batch of granules, see `get_batch_extent`."""
+
+    #: the union of the items' bounding boxes, [west, south, east, north], or None
+    #: if no item has a bbox
+    bbox: list[float] | None
+    start_datetime: datetime
+    end_datetime: datetime
+
+    def to_stac(self) -> dict[str, Any]:
+        """The extent as the "extent" of a STAC Collection."""
+        return {
+            "spatial": {"bbox": [self.bbox] if self.bbox is not None else []},
+            "temporal": {
+                "interval": [[self.start_datetime.isoformat(), self.end_datetime.isoformat()]]
+            },
+        }
+
+
+def get_batch_extent(input_items: Iterable[InputItem]) -> BatchExtent:
+    """The union of the bounding boxes and the full temporal range of the input items.
+
+    The bounding boxes (the horizontal part, for 3D boxes) and the start and end
+    times (as epoch seconds) are packed into typed arrays, and each column is then
+    reduced with a single `min` or `max`. The input items are not modified.
+
+    Raises
+    ------
+    ValueError
+        if there are no input items
     """
-    bounding_box = input_items[0].bbox
+    input_items = list(input_items)
+    if not input_items:
+        raise ValueError("A batch extent needs at least one item")
 
+    date_ranges = [_get_item_date_range(item) for item in input_items]
+    starts = array("d", [start_datetime.timestamp() for start_datetime, _ in date_ranges])
+    ends = array("d", [end_datetime.timestamp() for _, end_datetime in date_ranges])
+    boxes = array("d")
     for item in input_items:
-        bounding_box[0] = min(bounding_box[0], item.bbox[0])
-        bounding_box[1] = min(bounding_box[1], item.bbox[1])
-        bounding_box[2] = max(bounding_box[2], item.bbox[2])
-        bounding_box[3] = max(bounding_box[3], item.bbox[3])
+        if bbox := item.bbox:
+            boxes.extend((bbox[0], bbox[1], bbox[3], bbox[4]) if len(bbox) == 6 else bbox[:4])
+
+    return BatchExtent(
+        [min(boxes[0::4]), min(boxes[1::4]), max(boxes[2::4]), max(boxes[3::4])] if boxes else None,
+        date_ranges[starts.index(min(starts))][0],
+        date_ranges[ends.index(max(ends))][1],
+    )
 
-    return bounding_box
 
+def get_batch_fingerprint(urls: Iterable[str]) -> str:
+    """The fingerprint of the granules of a batch, whatever their order: the SHA-256,
+    in hexadecimal, of their URLs, sorted and one per line."""
+    digest = hashlib.sha256()
+    for url in sorted(urls):
+        digest.update(url.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
 
-def _get_output_date_range(input_items: list[Item]) -> dict[str, str]:
+
+def _get_output_bounding_box(input_items: list[InputItem]) -> list[float] | None:
+    """Create a bounding box that is the maximum combined extent of all input
+    `pystac.Item` bounding box extents, see `get_batch_extent`.
+
+    """
+    return get_batch_extent(input_items).bbox
+
+
+def _get_output_date_range(input_items: list[InputItem]) -> dict[str, str]:
     """Create a dictionary of start and end datetime, which encompasses the
     full temporal range of all input `pystac.Item` instances. This output
     dictionary will be used for the `properties` of the output Zarr store
     `pystac.Item`.
 
     """
-    start_datetime, end_datetime = _get_item_date_range(input_items[0])
-
-    for item in input_items:
-        new_start_datetime, new_end_datetime = _get_item_date_range(item)
-        start_datetime = min(start_datetime, new_start_datetime)
-        end_datetime = max(end_datetime, new_end_datetime)
-
+    extent = get_batch_extent(input_items)
     return {
-        "start_datetime": start_datetime.isoformat(),
-        "end_datetime": end_datetime.isoformat(),
+        "start_datetime": extent.start_datetime.isoformat(),
+        "end_datetime": extent.end_datetime.isoformat(),
     }
 
 
-def _get_item_date_range(item: Item) -> tuple[datetime, datetime]:
+def _get_item_date_range(item: InputItem) -> tuple[datetime, datetime]:
     """A helper function to retrieve the temporal range from a `pystac.Item`
     instance. If the `pystac.Item.datetime` property exists, there is a
     single datetime associated with the granule, otherwise there will be a
     start and end time contained within the `pystac.Item` metadata.
 
     """
+    if isinstance(item, GranuleRecord):
+        return item.start_datetime, item.end_datetime
     if item.datetime is None:
-        start_datetime = item.common_metadata.start_datetime
-        end_datetime = item.common_metadata.end_datetime
+        # As `item.common_metadata`, but with the faster `_parse_datetime`
+        start, end = item.properties.get("start_datetime"), item.properties.get("end_datetime")
+        start_datetime = _parse_datetime(start) if start else None
+        end_datetime = _parse_datetime(end) if end else None
     else:
         start_datetime = item.datetime
         end_datetime = item.datetime
@@ -0,0 +1,626 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""Writers for the batch catalogs, and a Harmony invocation that uses them"""
+
+import datetime
+import json
+import logging
+import marshal
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import cache
+from os import makedirs, path
+from types import ModuleType
+from typing import TYPE_CHECKING, Any
+from uuid import uuid4
+
+import pystac
+from harmony_service_lib.aws import is_s3, write_s3
+from harmony_service_lib.cli import MultiCatalogLayoutStrategy
+from harmony_service_lib.exceptions import HarmonyException
+from harmony_service_lib.logging import build_logger, setup_stdout_log_formatting
+from harmony_service_lib.message import Message
+from harmony_service_lib.s3_stac_io import S3StacIO
+from harmony_service_lib.util import bbox_to_geometry, config, create_decrypter
+from harmony_service_lib.version import get_version
+from pystac import StacIO
+
+from batchee.harmony.metrics import InvocationMetrics
+from batchee.harmony.options import BatcheeOptions
+from batchee.harmony.util import InputItem, _get_batch_catalog_template, _get_item_date_range
+
+if TYPE_CHECKING:
+    from batchee.harmony.previous_output import PreviousOutput
+
+
+@cache
+def _get_orjson() -> ModuleType | None:
+    """The orjson module if it is installed, imported on first use (by the fast writer)."""
+    try:
+        import orjson
+    except ImportError:  # pragma: no cover - orjson is optional
+        return None
+    return orjson
+
+
+def _dumps(obj: Any) -> bytes:
+    """Encode to indented JSON, with orjson if it is installed."""
+    if (orjson := _get_orjson()) is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode("utf-8")
+
+
+def _write_bytes(uri: str, data: bytes) -> None:
+    """Write a file to a local path or an S3 URL."""
+    if is_s3(uri):
+        write_s3(uri, data)
+    else:
+        makedirs(path.dirname(uri), exist_ok=True)
+        with open(uri, "wb") as file:
+            file.write(data)
+
+
+class _CountingStacIO(StacIO):
+    """A StacIO that counts the bytes written through another StacIO."""
+
+    def __init__(self, stac_io: StacIO):
+        super().__init__()
+        self.stac_io = stac_io
+        self.bytes_written = 0
+
+    def read_text(self, source, *args, **kwargs) -> str:
+        return self.stac_io.read_text(source, *args, **kwargs)
+
+    def write_text(self, dest, txt: str, *args, **kwargs) -> None:
+        self.bytes_written += len(txt.encode("utf-8"))
+        self.stac_io.write_text(dest, txt, *args, **kwargs)
+
+
+def write_batch_catalogs(
+    catalogs: Iterable[pystac.Catalog],
+    metadata_dir: str,
+    metrics: InvocationMetrics | None = None,
+) -> int:
+    """Save each batch catalog to `metadata_dir` as soon as it is produced, then write
+    the `batch-catalogs.json` and `batch-count.txt` files that list them. The layout
+    is the same as the one written by `harmony_service_lib` for a list of catalogs.
+    If there are no catalogs, nothing is written: the output is then a single empty
+    catalog, as `ConcatBatching.process_catalog` returns for it.
+
+    If `metrics` are given, the time spent saving is added to their "write_output"
+    stage, and the bytes written to their "bytes_written" counter.
+
+    Returns
+    -------
+    int
+        the number of batch catalogs written
+    """
+    stac_io = _CountingStacIO(StacIO.default())
+    batch_count = 0
+    for index, catalog in enumerate(catalogs):
+        with metrics.stage("write_output") if metrics else nullcontext():
+            catalog.normalize_and_save(
+                metadata_dir,
+                pystac.CatalogType.SELF_CONTAINED,
+                MultiCatalogLayoutStrategy(index),
+                stac_io=stac_io,
+            )
+        batch_count = index + 1
+
+    if metrics:
+        metrics.count("bytes_written", stac_io.bytes_written)
+
+    _write_batch_list(metadata_dir, batch_count)
+    return batch_count
+
+
+def _write_batch_list(metadata_dir: str, batch_count: int) -> None:
+    """Write the `batch-catalogs.json` and `batch-count.txt` files Harmony reads, if
+    there is at least one batch."""
+    if batch_count == 0:
+        return
+    s3_io = S3StacIO()
+    json_str = json.dumps([f"catalog{i}.json" for i in range(batch_count)])
+    s3_io.write_text(path.join(metadata_dir, "batch-catalogs.json"), json_str)
+    s3_io.write_text(path.join(metadata_dir, "batch-count.txt"), f"{batch_count}")
+
+
+def _output_item_dict(item_id: str, item: InputItem, url: str, catalog_filename: str) -> dict:
+    """The JSON of an output STAC Item, as `pystac.Item.to_dict` would produce it once saved."""
+    start_datetime, end_datetime = _get_item_date_range(item)
+    geometry = bbox_to_geometry(item.bbox)
+    item_dict: dict[str, Any] = {
+        "type": "Feature",
+        "stac_version": pystac.get_stac_version(),
+        "stac_extensions": [],
+        "id": item_id,
+        "geometry": geometry,
+        "bbox": item.bbox,
+        "properties": {
+            "start_datetime": start_datetime.isoformat(),
+            "end_datetime": end_datetime.isoformat(),
+            "datetime": None,
+        },
+        "links": [
+            {"rel": "root", "href": f"../{catalog_filename}", "type": "application/json"},
+            {"rel": "parent", "href": f"../{catalog_filename}", "type": "application/json"},
+        ],
+        "assets": {
+            "data": {
+                "href": url,
+                "type": "application/x-netcdf4",
+                "title": url,
+                "roles": ["data"],
+            }
+        },
+    }
+    if not geometry:
+        item_dict.pop("bbox")
+    return item_dict
+
+
+def write_batch_json(
+    catalog: pystac.Catalog,
+    batches: Iterable[list[tuple[InputItem, str]]],
+    metadata_dir: str,
+    max_workers: int = 1,
+    metrics: InvocationMetrics | None = None,
+    get_batch_fields: Callable[[list[tuple[InputItem, str]]], dict] | None = None,
+    previous: "PreviousOutput | None" = None,
+) -> int:
+    """Write the batch catalogs and their items straight to JSON files, without
+    building `pystac` objects for the output.
+
+    The files are laid out as `write_batch_catalogs` lays them out, i.e.
+    `catalog<N>.json` per batch and `<item id>/<item id>.json` per item (and nothing
+    if there are no batches), and
+    are encoded with orjson when it is available. The files of each batch are
+    encoded together and then written, by `max_workers` threads if more than one.
+
+    Parameters
+    ----------
+    catalog : pystac.Catalog
+        the input catalog, whose metadata and non-item links are copied to each batch
+    batches : Iterable[list[tuple[InputItem, str]]]
+        for each batch, each input item with the URL of its NetCDF-4 data asset
+    metadata_dir : str
+        the Harmony metadata directory, a local path or an S3 URL
+    max_workers : int, optional (default: 1)
+        number of threads writing files
+    metrics : InvocationMetrics, optional
+        if given, the time spent encoding and writing files is added to their
+        "build_catalogs" and "write_output" stages, and the bytes written to their
+        "bytes_written" counter
+    get_batch_fields : Callable, optional
+        extra fields of the catalog of a batch, given its items, see
+        `ConcatBatching.get_batch_fields`
+    previous : PreviousOutput, optional
+        the batch catalogs of a previous run; the catalog of a batch found there
+        (by its index and fields, see `PreviousOutput.get_item_links`) links to the
+        item files of the previous run, and no item files are written for it
+
+    Returns
+    -------
+    int
+        the number of batch catalogs written
+    """
+    template = _get_batch_catalog_template(catalog).to_dict(
+        include_self_link=False, transform_hrefs=False
+    )
+    template_links = [link for link in template["links"] if link["rel"] not in ("root", "parent")]
+
+    if metrics is None:
+        metrics = InvocationMetrics()
+
+    batch_count = 0
+    with ThreadPoolExecutor(max(1, max_workers), thread_name_prefix="batchee-writer") as executor:
+        for index, batch_items in enumerate(batches):
+            with metrics.stage("build_catalogs"):
+                catalog_filename = f"catalog{index}.json"
+                files: list[tuple[str, bytes]] = []
+                fields = get_batch_fields(batch_items) if get_batch_fields else {}
+                item_links = (
+                    previous.get_item_links(catalog_filename, fields)
+                    if previous is not None
+                    else None
+                )
+                if item_links is not None:
+                    # The item files of the previous run describe the same granules
+                    metrics.count("reused_batches")
+                else:
+                    item_links = []
+                    for item, url in batch_items:
+                        item_id = str(uuid4())
+                        item_dict = _output_item_dict(item_id, item, url, catalog_filename)
+                        item_path = path.join(metadata_dir, item_id, f"{item_id}.json")
+                        files.append((item_path, _dumps(item_dict)))
+                        item_links.append(
+                            {
+                                "rel": "item",
+                                "href": f"./{item_id}/{item_id}.json",
+                                "type": "application/geo+json",
+                            }
+                        )
+
+                catalog_dict = {
+                    **template,
+                    **fields,
+                    "id": str(uuid4()),
+                    "links": [
+                        {
+                            "rel": "root",
+                            "href": f"./{catalog_filename}",
+                            "type": "application/json",
+                        },
+                        *template_links,
+                        *item_links,
+                    ],
+                }
+                files.append((path.join(metadata_dir, catalog_filename), _dumps(catalog_dict)))
+
+            with metrics.stage("write_output"):
+                if max_workers > 1:
+                    for _ in executor.map(lambda file: _write_bytes(*file), files):
+                        pass
+                else:
+                    for uri, data in files:
+                        _write_bytes(uri, data)
+            metrics.count("bytes_written", sum(len(data) for _, data in files))
+            batch_count = index + 1
+
+    _write_batch_list(metadata_dir, batch_count)
+    return batch_count
+
+
+def _write_batches(adapter, metadata_dir: str) -> None:
+    """Group and write the batches of the adapter's catalog with the streaming, spilling,
+    fast or incremental writers of its options."""
+    options = adapter.options
+    if options.streaming:
+        batches = adapter.iter_batches(adapter.catalog)
+    elif options.grouping_memory:
+        batches = adapter.iter_grouped_batches(adapter.catalog)
+    else:
+        batches = adapter.group_batches(adapter.catalog)
+
+    previous = None
+    if options.previous_output:
+        # Imported only when needed, as most requests are not incremental
+        from batchee.harmony.previous_output import PreviousOutput
+
+        previous = PreviousOutput.read(options.previous_output, adapter.logger)
+
+    if options.fast_writer or previous is not None:
+        batch_count = write_batch_json(
+            adapter.catalog,
+            batches,
+            metadata_dir,
+            options.write_concurrency,
+            adapter.metrics,
+            adapter.get_batch_fields,
+            previous,
+        )
+    else:
+        template = _get_batch_catalog_template(adapter.catalog)
+        batch_count = write_batch_catalogs(
+            (
+                adapter._build_batch_catalog(template, batch_id, batch_items)
+                for batch_id, batch_items in enumerate(batches)
+            ),
+            metadata_dir,
+            adapter.metrics,
+        )
+
+    if batch_count == 0:
+        adapter._build_empty_catalog(adapter.catalog).normalize_and_save(
+            metadata_dir, pystac.CatalogType.SELF_CONTAINED
+        )
+
+
+def uses_batchee_invoke(options: BatcheeOptions) -> bool:
+    """Whether an invocation with these options needs batchee's own invocation, i.e.
+    one of its writers, profiling, or metrics that include writing the output.
+    Otherwise `harmony_service_lib.run_cli` invokes the adapter."""
+    return bool(
+        options.streaming
+        or options.grouping_memory
+        or options.fast_writer
+        or options.previous_output
+        or options.profile
+        or options.metrics_file
+        or options.metrics_otel
+    )
+
+
+def _build_adapter(
+    AdapterClass, harmony_input: str, sources: str | None, data_location: str | None, cfg
+):
+    """Build the adapter for a request from the values of its --harmony-* options, as
+    `harmony_service_lib.run_cli` does."""
+    catalog = pystac.Catalog.from_file(sources) if sources else None
+    if cfg.shared_secret_key:
+        decrypter = create_decrypter(cfg.shared_secret_key.encode("utf-8"))
+        message = Message(json.loads(harmony_input), decrypter)
+    else:
+        message = Message(json.loads(harmony_input))
+    if data_location:
+        message.stagingLocation = data_location
+    return AdapterClass(message, catalog=catalog, config=cfg)
+
+
+def _write_error(
+    metadata_dir: str, message: str, category: str = "Unknown", level: str = "Error"
+) -> None:
+    """Write the error of a failed request to error.json in the metadata directory, in
+    the format Harmony reads, as `harmony_service_lib.run_cli` does."""
+    _write_bytes(
+        path.join(metadata_dir, "error.json"),
+        json.dumps({"error": message, "category": category, "level": level}).encode("utf-8"),
+    )
+
+
+def _invoke(adapter, metadata_dir: str) -> None:
+    """Invoke the adapter and write its output to the metadata directory, as
+    `harmony_service_lib.run_cli` does, but with the writer selected by the adapter's
+    options, and reporting the metrics of the invocation once its output is written."""
+    try:
+        logging.info(f"Invoking adapter with harmony-service-lib-py version {get_version()}")
+        is_s3_metadata_dir = is_s3(metadata_dir)
+        if not is_s3_metadata_dir:
+            makedirs(metadata_dir, exist_ok=True)
+        if not adapter.catalog:
+            raise RuntimeError("Invoking Batchee without a STAC catalog is not supported")
+
+        options = adapter.options
+        if not (
+            options.streaming
+            or options.grouping_memory
+            or options.fast_writer
+            or options.previous_output
+        ):
+            # As `adapter.invoke`, without reporting the metrics before the output is written
+            stac_output = adapter.process_catalog(adapter.catalog)
+            if isinstance(stac_output, list):
+                write_batch_catalogs(stac_output, metadata_dir, adapter.metrics)
+            else:
+                stac_output.normalize_and_save(metadata_dir, pystac.CatalogType.SELF_CONTAINED)
+        else:
+            _write_batches(adapter, metadata_dir)
+
+        if not is_s3_metadata_dir:
+            with open(path.join(metadata_dir, "message.json"), "w") as file:
+                json.dump(adapter.message.output_data, file)
+
+        adapter.report_metrics()
+    except HarmonyException as err:
+        logging.error(err, exc_info=True)
+        _write_error(metadata_dir, err.message, err.category, err.level)
+        raise
+    except BaseException as err:
+        logging.error(err, exc_info=True)
+        _write_error(metadata_dir, "Service request failed with an unknown error")
+        raise
+
+
+@contextmanager
+def _profiled(profiler: str, profile_path: str, logger: logging.Logger) -> Iterator[None]:
+    """Profile the body of a `with` block, and save the profile at `profile_path`.
+
+    Parameters
+    ----------
+    profiler : str
+        "cprofile", saved with a ".prof" extension (for pstats or snakeviz), or
+        "pyinstrument", saved with an ".html" extension; anything falsy disables profiling
+    profile_path : str
+        a local path or an S3 URL, without the extension; see `_get_profile_path`
+    logger : logging.Logger
+    """
+    if profiler not in ("cprofile", "pyinstrument"):
+        if profiler:
+            logger.warning(f"Unknown BATCHEE_PROFILE {profiler!r}; use cprofile or pyinstrument")
+        yield
+        return
+
+    if profiler == "pyinstrument":
+        from pyinstrument import Profiler
+
+        pyinstrument_profiler = Profiler()
+        pyinstrument_profiler.start()
+        try:
+            yield
+        finally:
+            pyinstrument_profiler.stop()
+            filename = f"{profile_path}.html"
+            _write_bytes(filename, pyinstrument_profiler.output_html().encode("utf-8"))
+            logger.info(f"Saved profile to {filename}")
+    else:
+        import cProfile
+
+        cprofile_profiler = cProfile.Profile()
+        cprofile_profiler.enable()
+        try:
+            yield
+        finally:
+            # Stops profiling; the stats are then what `cProfile.Profile.dump_stats` writes
+            cprofile_profiler.create_stats()
+            filename = f"{profile_path}.prof"
+            _write_bytes(filename, marshal.dumps(cprofile_profiler.stats))
+            logger.info(f"Saved profile to {filename}")
+
+
+def _get_profile_path(options: BatcheeOptions, metadata_dir: str, request_id: str) -> str:
+    """Where the profile of an invocation is saved, without its extension: in
+    `options.profile_dir`, named after the request, or else beside the metadata
+    directory, e.g. "outputs/metadata-batchee-profile" for "outputs/metadata/"."""
+    if options.profile_dir:
+        return path.join(options.profile_dir, f"batchee-profile-{request_id or uuid4()}")
+    return f"{metadata_dir.rstrip('/')}-batchee-profile"
+
+
+def run_cli(parser, args, AdapterClass, cfg=None) -> None:
+    """
+    Runs a --harmony-action=invoke CLI invocation, as `harmony_service_lib.run_cli`
+    does, except that batch catalogs are written by batchee: as soon as each is
+    complete in streaming mode, and straight to JSON with the fast writer. Used
+    only for the options that need it, see `uses_batchee_invoke`.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        The parser being used to parse CLI arguments, used to provide CLI argument errors
+    args : Namespace
+        Argument values parsed from the command line
+    AdapterClass : class
+        The ConcatBatching (sub)class to use to handle service invocations
+    cfg : harmony_service_lib.util.Config
+        A configuration instance for this service
+    """
+    if cfg is None:
+        cfg = config()
+    if args.harmony_wrap_stdout:
+        setup_stdout_log_formatting(cfg)
+
+    if bool(args.harmony_input_file):
+        with open(args.harmony_input_file) as f:
+            args.harmony_input = f.read()
+
+    if not bool(args.harmony_input):
+        parser.error(
+            "--harmony-input or --harmony-input-file must be provided for --harmony-action=invoke"
+        )
+    elif not bool(args.harmony_metadata_dir):
+        parser.error("--harmony-metadata-dir must be provided for --harmony-action=invoke")
+
+    _run_invocation(
+        AdapterClass,
+        args.harmony_input,
+        args.harmony_sources,
+        args.harmony_data_location,
+        args.harmony_metadata_dir,
+        cfg,
+    )
+
+
+def run_worker(requests: Iterable[str], AdapterClass, cfg=None, wrap_stdout: bool = False) -> int:
+    """
+    Runs one --harmony-action=invoke invocation for each of a series of requests, in
+    this process, so that starting Python and importing harmony-service-lib and
+    pystac is paid for once rather than once per request.
+
+    Each request is a JSON object on a line of its own, with the values of the
+    --harmony-* options of an invocation: "harmony_input" (the message, as a string
+    or an object) or "harmony_input_file", "harmony_sources", "harmony_metadata_dir"
+    and, optionally, "harmony_data_location". Blank lines are skipped. A request
+    that fails is logged (and writes its `error.json`, as an invocation does), and
+    the worker goes on to the next one.
+
+    Parameters
+    ----------
+    requests : Iterable[str]
+        the request lines, e.g. an open file or `sys.stdin`
+    AdapterClass : class
+        The ConcatBatching (sub)class to use to handle service invocations
+    cfg : harmony_service_lib.util.Config
+        A configuration instance for this service
+    wrap_stdout : bool, optional (default: False)
+        as --harmony-wrap-stdout
+
+    Returns
+    -------
+    int
+        the number of requests that failed
+    """
+    if cfg is None:
+        cfg = config()
+    if wrap_stdout:
+        setup_stdout_log_formatting(cfg)
+    logger = build_logger(cfg)
+
+    request_count = 0
+    failure_count = 0
+    for line in requests:
+        if not line.strip():
+            continue
+        request_count += 1
+        try:
+            request = json.loads(line)
+            harmony_input = request.get("harmony_input")
+            if request.get("harmony_input_file"):
+                with open(request["harmony_input_file"]) as f:
+                    harmony_input = f.read()
+            elif isinstance(harmony_input, dict):
+                harmony_input = json.dumps(harmony_input)
+            if not harmony_input or not request.get("harmony_metadata_dir"):
+                raise ValueError(
+                    "A worker request needs harmony_input (or harmony_input_file) "
+                    "and harmony_metadata_dir"
+                )
+            _run_invocation(
+                AdapterClass,
+                harmony_input,
+                request.get("harmony_sources"),
+                request.get("harmony_data_location"),
+                request["harmony_metadata_dir"],
+                cfg,
+            )
+        except Exception as err:
+            failure_count += 1
+            logger.error(f"Worker request {request_count} failed: {err}")
+
+    logger.info(f"Worker finished {request_count} requests, {failure_count} failed")
+    return failure_count
+
+
+def _run_invocation(
+    AdapterClass,
+    harmony_input: str,
+    sources: str | None,
+    data_location: str | None,
+    metadata_dir: str,
+    cfg,
+) -> None:
+    """Build the adapter for one request and invoke it, logging its duration as
+    harmony-service-lib does."""
+    start_time = datetime.datetime.now()
+    adapter = None
+    try:
+        adapter = _build_adapter(AdapterClass, harmony_input, sources, data_location, cfg)
+        adapter.logger.info(f"timing.{cfg.app_name}.start")
+        profile_path = _get_profile_path(
+            adapter.options, metadata_dir, getattr(adapter.message, "requestId", "")
+        )
+        with _profiled(adapter.options.profile, profile_path, adapter.logger):
+            _invoke(adapter, metadata_dir)
+    finally:
+        time_diff = datetime.datetime.now() - start_time
+        extra_fields = {
+            "user": getattr(adapter.message, "user", "") if adapter else "",
+            "requestId": getattr(adapter.message, "requestId", "") if adapter else "",
+            "durationMs": int(round(time_diff.total_seconds() * 1000)),
+        }
+        build_logger(cfg).info(f"timing.{cfg.app_name}.end", extra=extra_fields)
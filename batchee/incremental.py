@@ -0,0 +1,167 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""Stateful batching of granules that arrive one at a time, e.g. from an NRT feed."""
+
+import logging
+from collections.abc import Callable, Hashable, Iterable
+from typing import TYPE_CHECKING, Any
+
+from batchee.tempo_filename_parser import get_day_and_scan
+
+if TYPE_CHECKING:
+    from pystac import Item
+
+default_logger = logging.getLogger(__name__)
+
+
+class IncrementalBatcher:
+    """
+    Assign batch indices to TEMPO granules as they arrive, without rescanning history.
+
+    Batches are numbered in the order they are first seen, so feeding a list of
+    filenames through `add_many` gives the same indices as `get_batch_indices`
+    whenever the input is in time order. Only the most recent
+    `max_open_batches` (day, scan) batches are kept open; once a granule from a
+    later scan arrives, the oldest open batch is closed and forgotten, so memory
+    grows with the number of open scans rather than with the number of granules.
+
+    A granule that arrives for a scan that has already been closed starts a new
+    batch, which is closed straight away.
+
+    Granules of other missions can be batched by passing the `get_key` of a
+    `batchee.parsers.FilenameParser` (or of a `ParserRegistry`). Batches are then
+    opened and closed in the sort order of their keys instead of by (day, scan).
+    """
+
+    def __init__(
+        self,
+        max_open_batches: int = 1,
+        logger: logging.Logger = default_logger,
+        get_key: Callable[[str], tuple[Hashable, ...] | None] = get_day_and_scan,
+    ):
+        """
+        Parameters
+        ----------
+        max_open_batches : int, optional (default: 1)
+            number of the most recent scans that accept new granules; use more
+            than one when granules of consecutive scans may arrive interleaved
+        logger : logging.Logger, optional
+        get_key : Callable[[str], tuple | None], optional (default: `get_day_and_scan`)
+            the batch key of a filename, or None if it should be skipped; keys of
+            the same feed must be sortable against each other
+        """
+        if max_open_batches < 1:
+            raise ValueError("max_open_batches must be at least 1")
+
+        self.max_open_batches = max_open_batches
+        self.logger = logger
+        self.get_key = get_key
+        self.batch_count = 0
+        self._open_batches: dict[tuple[Hashable, ...], int] = {}
+        self._newly_closed: list[int] = []
+
+    @property
+    def open_batches(self) -> dict[tuple[Hashable, ...], int]:
+        """The batch index of each (day, scan) (or other key) that is still open."""
+        return dict(self._open_batches)
+
+    def add(self, granule: "str | Item") -> int | None:
+        """
+        Parameters
+        ----------
+        granule : str | pystac.Item
+            a granule filename or URL, or a STAC Item with a NetCDF-4 data asset
+
+        Returns
+        -------
+        int | None
+            the batch index of the granule, or None if its filename does not match
+            `tempo_granule_filename_pattern` (or has no key)
+        """
+        filename: str | None
+        if isinstance(granule, str):
+            filename = granule
+        else:
+            # Imported here, so that batching filenames does not import pystac
+            from batchee.harmony.util import _get_item_url
+
+            filename = _get_item_url(granule)
+        day_and_scan = self.get_key(filename) if filename else None
+        if day_and_scan is None:
+            self.logger.warning(f"Skipping granule with an unrecognized filename: {filename}")
+            return None
+
+        batch_index = self._open_batches.get(day_and_scan)
+        if batch_index is None:
+            batch_index = self._open_batches[day_and_scan] = self.batch_count
+            self.batch_count += 1
+
+            while len(self._open_batches) > self.max_open_batches:
+                oldest = min(self._open_batches)
+                if oldest == day_and_scan:
+                    self.logger.warning(f"Granule arrived after its scan was closed: {filename}")
+                self._newly_closed.append(self._open_batches.pop(oldest))
+
+        return batch_index
+
+    def add_many(self, granules: Iterable["str | Item"]) -> list[int | None]:
+        """Add a chunk of granules, returning the batch index of each (see `add`)."""
+        return [self.add(granule) for granule in granules]
+
+    def pop_closed(self) -> list[int]:
+        """Return the indices of batches closed since the last call, in the order they closed."""
+        closed, self._newly_closed = self._newly_closed, []
+        return closed
+
+    def close_all(self) -> list[int]:
+        """Close every open batch, e.g. at the end of a feed, and return all newly closed indices."""
+        self._newly_closed.extend(self._open_batches[key] for key in sorted(self._open_batches))
+        self._open_batches.clear()
+        return self.pop_closed()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the batcher state as a JSON-serializable dictionary."""
+        return {
+            "max_open_batches": self.max_open_batches,
+            "batch_count": self.batch_count,
+            "open_batches": [[*key, index] for key, index in self._open_batches.items()],
+            "newly_closed": list(self._newly_closed),
+        }
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        state: dict[str, Any],
+        logger: logging.Logger = default_logger,
+        get_key: Callable[[str], tuple[Hashable, ...] | None] = get_day_and_scan,
+    ) -> "IncrementalBatcher":
+        """Rebuild a batcher from the output of `snapshot`, with the same `get_key`."""
+        batcher = cls(max_open_batches=state["max_open_batches"], logger=logger, get_key=get_key)
+        batcher.batch_count = state["batch_count"]
+        batcher._open_batches = {tuple(entry[:-1]): entry[-1] for entry in state["open_batches"]}
+        batcher._newly_closed = list(state["newly_closed"])
+        return batcher
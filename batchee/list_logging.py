@@ -0,0 +1,108 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""Bounded, lazily formatted logging of long lists, e.g. of granule URLs or batch indices.
+
+At INFO, a list is logged as a summary: its length, its first and last few
+entries and a short hash of its contents, so that two runs can be compared
+without the full list. The full list is only logged at DEBUG. Either message
+is only formatted if a handler actually emits it.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from collections.abc import Sequence
+from typing import Any
+
+# Number of entries shown from each end of a list in an INFO summary
+SUMMARY_EDGE_ITEMS = 3
+
+
+def get_list_hash(values: Sequence[Any]) -> str:
+    """Return a short hash of the text of each entry of a list."""
+    digest = hashlib.blake2b(digest_size=8)
+    for value in values:
+        digest.update(str(value).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class ListSummary:
+    """A list that formats as its length, first and last entries and hash, when logged."""
+
+    def __init__(self, values: Sequence[Any], edge_items: int = SUMMARY_EDGE_ITEMS):
+        self.values = values
+        self.edge_items = edge_items
+
+    def __str__(self) -> str:
+        values, edge_items = self.values, self.edge_items
+        if len(values) <= 2 * edge_items:
+            shown = ", ".join(map(repr, values))
+        else:
+            shown = ", ".join(
+                [*map(repr, values[:edge_items]), "...", *map(repr, values[-edge_items:])]
+            )
+        return f"[{shown}] (count={len(values)}, hash={get_list_hash(values)})"
+
+
+class FullList:
+    """A list that formats in full, when logged."""
+
+    def __init__(self, values: Sequence[Any]):
+        self.values = values
+
+    def __str__(self) -> str:
+        return str(list(self.values))
+
+
+def log_list(
+    logger: logging.Logger | logging.LoggerAdapter,
+    name: str,
+    values: Sequence[Any],
+    dump_dir: str | None = None,
+) -> None:
+    """Log a summary of a list at INFO and the full list at DEBUG, both lazily formatted.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+    name : str
+        what the list holds, e.g. "netcdf_urls"
+    values : Sequence
+    dump_dir : str, optional
+        if given, also write the full list as JSON to `<dump_dir>/<name>.json`
+    """
+    logger.info("%s===%s.", name, ListSummary(values))
+    logger.debug("%s (all)===%s.", name, FullList(values))
+
+    if dump_dir:
+        os.makedirs(dump_dir, exist_ok=True)
+        filename = os.path.join(dump_dir, f"{name}.json")
+        with open(filename, "w") as file:
+            json.dump(list(values), file, default=str)
+        logger.info("%s written to %s", name, filename)
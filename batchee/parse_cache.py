@@ -0,0 +1,276 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""A persistent, size-bounded cache of parsed TEMPO granule filenames, in SQLite.
+
+The same granules often appear in many requests (overlapping jobs, retries and
+reprocessing). The cache maps each granule's base name to its parsed fields,
+including its US/Central day, so a granule is only parsed once per node. Names
+are parsed as `get_day_and_scan` parses them, against the whole filename, path
+or URL; the few whose TEMPO fields are not in the base name (e.g. a URL with a
+query string) are parsed every time instead of cached. The
+SQLite database is opened in WAL mode with a busy timeout, so worker processes
+on the same node can share one cache file.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections.abc import Sequence
+from typing import NamedTuple
+
+from batchee.tempo_filename_parser import (
+    get_day_in_us_central_for_utc_time,
+    tempo_granule_filename_pattern,
+)
+
+default_logger = logging.getLogger(__name__)
+
+# A hit refreshes the last-used time of an entry at most this often, to limit writes
+_TOUCH_INTERVAL_SECONDS = 3600
+
+
+class ParsedGranule(NamedTuple):
+    """The fields of a TEMPO granule filename, with its day converted to US/Central."""
+
+    product: str
+    level: str
+    version: str
+    day: str
+    scan: str
+    granule: str
+
+
+def _get_basename(filename: str) -> str:
+    return filename[filename.rfind("/") + 1 :]
+
+
+def parse_granule(filename: str) -> ParsedGranule | None:
+    """Parse a TEMPO granule filename, path or URL, or return None if it does not match
+    `tempo_granule_filename_pattern`."""
+    matches = tempo_granule_filename_pattern.match(filename)
+    if not matches:
+        return None
+
+    product_type, proxy, level, nrt, version_id, day, time_in_granule, scan, granule = (
+        matches.group(
+            "product_type",
+            "proxy",
+            "processing_level",
+            "nrt",
+            "version_id",
+            "day_in_granule",
+            "time_in_granule",
+            "daily_scan_id",
+            "granule_id",
+        )
+    )
+    return ParsedGranule(
+        product_type + proxy,
+        level,
+        f"{nrt or ''}{version_id}",
+        get_day_in_us_central_for_utc_time(day, time_in_granule),
+        scan,
+        granule,
+    )
+
+
+class ParseCache:
+    """
+    A cache of `ParsedGranule` by granule base name, stored in an SQLite file.
+
+    Entries are evicted least recently used first once there are more than
+    `max_entries`. Filenames that are not TEMPO granules are not cached.
+    """
+
+    # Entries are counted again after this many inserts, as other processes share the file
+    _RECOUNT_INTERVAL = 100_000
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 1_000_000,
+        timeout: float = 30.0,
+        logger: logging.Logger = default_logger,
+    ):
+        """
+        Parameters
+        ----------
+        path : str
+            the SQLite database file, created if it does not exist
+        max_entries : int, optional (default: 1,000,000)
+            the number of entries kept, roughly 100 bytes each
+        timeout : float, optional (default: 30)
+            seconds to wait for another process that is writing to the cache
+        logger : logging.Logger, optional
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.logger = logger
+        self._connection: sqlite3.Connection | None = None
+        self._connection_pid: int | None = None
+        # An upper bound of the number of entries, counted on the first insert
+        self._row_count: int | None = None
+        self._inserts_since_count = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The connection of this process, opened (and the schema created) on first use."""
+        # A connection must not be shared with forked worker processes
+        if self._connection is None or self._connection_pid != os.getpid():
+            self._connection, self._connection_pid = self._connect(), os.getpid()
+            self._row_count = None
+        return self._connection
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection and create the schema, retrying for up to `timeout` seconds
+        while another process holds the database, e.g. while switching it to WAL mode
+        (SQLite reports that as locked without waiting on the busy timeout)."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS granules ("
+                    " name TEXT PRIMARY KEY, product TEXT, level TEXT, version TEXT,"
+                    " day TEXT, scan TEXT, granule TEXT, last_used INTEGER"
+                    ") WITHOUT ROWID"
+                )
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS granules_last_used ON granules (last_used)"
+                )
+                return connection
+            except sqlite3.OperationalError as error:
+                connection.close()
+                if "locked" not in str(error) or time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def close(self) -> None:
+        if self._connection is not None and self._connection_pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM granules").fetchone()[0]
+
+    def parse_many(self, filenames: Sequence[str]) -> list[ParsedGranule | None]:
+        """Parse each filename, from the cache where possible, and cache the new ones.
+
+        Returns
+        -------
+        list[ParsedGranule | None]
+            the parsed fields of each filename, or None where it is not a TEMPO granule
+        """
+        names = [_get_basename(filename) for filename in filenames]
+        unique_names = list(dict.fromkeys(names))
+        now = int(time.time())
+
+        # One query for all names: SQLite joins the JSON array of names to the table
+        rows = self.connection.execute(
+            "SELECT g.name, g.product, g.level, g.version, g.day, g.scan, g.granule, g.last_used"
+            " FROM json_each(?) AS j JOIN granules AS g ON g.name = j.value",
+            (json.dumps(unique_names),),
+        ).fetchall()
+        parsed: dict[str, ParsedGranule | None] = {
+            row[0]: ParsedGranule._make(row[1:7]) for row in rows
+        }
+        stale = [row[0] for row in rows if now - row[7] > _TOUCH_INTERVAL_SECONDS]
+
+        hit_count = len(parsed)
+        new_rows = []
+        for name in unique_names:
+            if name not in parsed:
+                granule = parsed[name] = parse_granule(name)
+                if granule is not None:
+                    new_rows.append((name, *granule, now))
+        # A base name that parses gives the same fields as its whole filename, the
+        # others are parsed whole, as the TEMPO fields may be elsewhere in a URL
+        results = [
+            parsed[name] if parsed[name] is not None else parse_granule(filename)
+            for name, filename in zip(names, filenames, strict=True)
+        ]
+
+        self.logger.info(
+            f"parse cache: {hit_count} hits, {len(unique_names) - hit_count} misses "
+            f"of {len(unique_names)} granule names."
+        )
+        if new_rows or stale:
+            self._store(new_rows, stale, now)
+
+        return results
+
+    def _store(self, new_rows: list[tuple], stale: list[str], now: int) -> None:
+        """Add new entries, refresh the last-used time of hits, and evict the oldest entries."""
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # A miss may have been cached by another process since it was looked up
+            inserted = connection.executemany(
+                "INSERT OR IGNORE INTO granules VALUES (?, ?, ?, ?, ?, ?, ?, ?)", new_rows
+            ).rowcount
+            if stale:
+                connection.execute(
+                    "UPDATE granules SET last_used = ?"
+                    " WHERE name IN (SELECT value FROM json_each(?))",
+                    (now, json.dumps(stale)),
+                )
+            if inserted > 0:
+                self._evict(inserted)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            self._row_count = None
+            raise
+
+    def _evict(self, inserted: int) -> None:
+        """Delete the least recently used entries beyond `max_entries`.
+
+        The entries are counted on the first insert and every `_RECOUNT_INTERVAL`
+        inserts after it, and this process's inserts and deletes are added to the
+        count in between, instead of counting them in every transaction.
+        """
+        self._inserts_since_count += inserted
+        if self._row_count is None or self._inserts_since_count >= self._RECOUNT_INTERVAL:
+            self._row_count, self._inserts_since_count = len(self), 0
+        else:
+            self._row_count += inserted
+
+        excess = self._row_count - self.max_entries
+        if excess > 0:
+            self._row_count -= self.connection.execute(
+                "DELETE FROM granules WHERE name IN"
+                " (SELECT name FROM granules ORDER BY last_used LIMIT ?)",
+                (excess,),
+            ).rowcount
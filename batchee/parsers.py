@@ -0,0 +1,375 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""A registry of filename parsers, for batching granules of more than one mission.
+
+Each parser pairs a compiled regular expression with a key function: granules
+with the same key go in the same batch. Patterns are matched against the whole
+filename, path or URL, as `batchee.tempo_filename_parser.get_day_and_scan` matches
+TEMPO granules, so a granule is batched the same way whichever path batches it.
+Filenames are routed to a single parser by a literal prefix of their base name
+(e.g. "TEMPO_"), so the cost of finding the parser for a filename does not grow
+with the number of registered parsers. Filenames without a registered prefix
+(e.g. with a leading "x", or a granule name in a directory or query string that
+the pattern of their parser still accepts) are matched against the pattern of
+each parser.
+"""
+
+import logging
+import re
+from collections.abc import Callable, Hashable, Iterable, Iterator, Sequence
+from dataclasses import dataclass
+
+from batchee.grouping import BatchAssignment, assign_batches, get_first_seen_indices
+from batchee.list_logging import log_list
+from batchee.tempo_filename_parser import (
+    get_day_in_us_central_for_utc_time,
+    log_rejected,
+    tempo_granule_filename_pattern,
+)
+
+default_logger = logging.getLogger(__name__)
+
+BatchKey = tuple[Hashable, ...]
+
+
+def _get_basename(filename: str) -> str:
+    """Return the part of a filename, path or URL after the last slash."""
+    return filename[filename.rfind("/") + 1 :]
+
+
+@dataclass(frozen=True)
+class FilenameParser:
+    """
+    How to batch the granules of one mission or family of collections.
+
+    Attributes
+    ----------
+    name : str
+        unique name of the parser, e.g. "tempo"
+    prefixes : tuple[str, ...]
+        literal prefixes of the granule base names that this parser handles, e.g. ("TEMPO_",)
+    pattern : re.Pattern
+        compiled pattern matched (with `re.match`) against the whole filename, path
+        or URL of each granule; start it with ".*" to find the granule name after a
+        directory, as `tempo_granule_filename_pattern` does
+    key : Callable[[re.Match], tuple]
+        returns the batch key of a granule from its match, e.g. (day, scan)
+    collections : tuple[str, ...]
+        CMR concept ids or short names of the collections that use this parser
+    order : Callable[[re.Match], tuple], optional
+        returns the order of a granule within its batch from its match, e.g.
+        (granule,); by default granules are ordered by their base names
+    """
+
+    name: str
+    prefixes: tuple[str, ...]
+    pattern: re.Pattern[str]
+    key: Callable[[re.Match[str]], BatchKey]
+    collections: tuple[str, ...] = ()
+    order: Callable[[re.Match[str]], tuple] | None = None
+
+    def get_key(self, filename: str) -> BatchKey | None:
+        """Return the batch key of a granule, or None if its filename does not match."""
+        matches = self.pattern.match(filename)
+        return None if matches is None else self.key(matches)
+
+    def get_sort_key(self, filename: str) -> tuple | None:
+        """Return the sort key of a granule, i.e. its batch key then its `order`, or None
+        if its filename does not match."""
+        matches = self.pattern.match(filename)
+        if matches is None:
+            return None
+        order = (_get_basename(filename),) if self.order is None else self.order(matches)
+        return (*self.key(matches), *order)
+
+    def get_batch_indices(
+        self, filenames: Sequence[str], logger: logging.Logger = default_logger
+    ) -> list[int]:
+        """Return the batch index of each matching filename, see `get_batch_indices_by_key`."""
+        return get_batch_indices_by_key(filenames, self.get_key, logger)
+
+    def get_batch_assignment(
+        self,
+        filenames: Sequence[str],
+        unmatched: str = "drop",
+        logger: logging.Logger = default_logger,
+    ) -> BatchAssignment:
+        """Return the batch index of each filename at its position, see
+        `get_batch_assignment_by_key`."""
+        return get_batch_assignment_by_key(filenames, self.get_key, unmatched, logger)
+
+
+def fields_key(*groups: str) -> Callable[[re.Match[str]], BatchKey]:
+    """Make a key function that batches granules by the named groups of their match.
+
+    For example ``fields_key("orbit")`` puts the granules of each orbit in one batch.
+    """
+
+    def key(matches: re.Match[str]) -> BatchKey:
+        return tuple(matches.group(group) for group in groups)
+
+    return key
+
+
+def hour_window_key(
+    hours: int, day_group: str = "day", hour_group: str = "hour"
+) -> Callable[[re.Match[str]], BatchKey]:
+    """Make a key function that batches granules into windows of `hours` hours of each day.
+
+    Parameters
+    ----------
+    hours : int
+        length of each window; windows start at midnight, so this should divide 24
+    day_group : str, optional (default: "day")
+        named group holding the day of the granule
+    hour_group : str, optional (default: "hour")
+        named group holding the hour of the granule, as digits
+    """
+    if not 0 < hours <= 24:
+        raise ValueError("hours must be between 1 and 24")
+
+    def key(matches: re.Match[str]) -> BatchKey:
+        day, hour = matches.group(day_group, hour_group)
+        return day, int(hour) // hours
+
+    return key
+
+
+def _get_tempo_day_and_scan(matches: re.Match[str]) -> BatchKey:
+    """Batch key of a TEMPO granule: its US/Central day and daily scan."""
+    day_in_granule, time_in_granule, daily_scan_id = matches.group(
+        "day_in_granule", "time_in_granule", "daily_scan_id"
+    )
+    return get_day_in_us_central_for_utc_time(day_in_granule, time_in_granule), daily_scan_id
+
+
+def _get_tempo_granule(matches: re.Match[str]) -> tuple:
+    """Order of a TEMPO granule in its batch: its granule number, so that granules sort
+    by (US/Central day, scan, granule), as `GranuleTable.sort_keys`."""
+    return (matches.group("granule_id"),)
+
+
+TEMPO_PARSER = FilenameParser(
+    name="tempo",
+    prefixes=("TEMPO_",),
+    pattern=tempo_granule_filename_pattern,
+    key=_get_tempo_day_and_scan,
+    order=_get_tempo_granule,
+)
+
+
+class ParserRegistry:
+    """
+    A set of filename parsers, with each filename routed to one parser by its prefix.
+
+    The registry itself can be used as a key function over filenames of mixed
+    collections: the key of each granule is prefixed with the name of its parser,
+    so granules of different parsers never share a batch.
+    """
+
+    def __init__(self, parsers: Iterable[FilenameParser] = ()):
+        self._parsers: dict[str, FilenameParser] = {}
+        self._by_prefix: dict[str, FilenameParser] = {}
+        self._by_collection: dict[str, FilenameParser] = {}
+        # Distinct prefix lengths, longest first, so that the longest prefix wins
+        self._prefix_lengths: tuple[int, ...] = ()
+        for parser in parsers:
+            self.register(parser)
+
+    def __iter__(self) -> Iterator[FilenameParser]:
+        return iter(self._parsers.values())
+
+    def __len__(self) -> int:
+        return len(self._parsers)
+
+    def __getitem__(self, name: str) -> FilenameParser:
+        return self._parsers[name]
+
+    def register(self, parser: FilenameParser) -> FilenameParser:
+        """Add a parser to the registry, and return it.
+
+        Raises
+        ------
+        ValueError
+            if the name, one of the prefixes or one of the collections of the parser
+            is already registered
+        """
+        if parser.name in self._parsers:
+            raise ValueError(f"A filename parser named {parser.name!r} is already registered")
+        if not parser.prefixes:
+            raise ValueError(f"Filename parser {parser.name!r} has no prefixes")
+        for prefix in parser.prefixes:
+            if prefix in self._by_prefix:
+                raise ValueError(
+                    f"Prefix {prefix!r} is already registered "
+                    f"by filename parser {self._by_prefix[prefix].name!r}"
+                )
+        for collection in parser.collections:
+            if collection in self._by_collection:
+                raise ValueError(
+                    f"Collection {collection!r} is already registered "
+                    f"by filename parser {self._by_collection[collection].name!r}"
+                )
+
+        self._parsers[parser.name] = parser
+        self._by_prefix.update(dict.fromkeys(parser.prefixes, parser))
+        self._by_collection.update(dict.fromkeys(parser.collections, parser))
+        self._prefix_lengths = tuple(
+            sorted({len(prefix) for prefix in self._by_prefix}, reverse=True)
+        )
+        return parser
+
+    def route(self, filename: str) -> FilenameParser | None:
+        """Return the parser registered for the longest matching prefix of a base name.
+
+        If no prefix matches, the first parser whose pattern matches the filename
+        is returned, or None if there is none.
+        """
+        basename = _get_basename(filename)
+        by_prefix = self._by_prefix
+        for length in self._prefix_lengths:
+            parser = by_prefix.get(basename[:length])
+            if parser is not None:
+                return parser
+        for parser in self._parsers.values():
+            if parser.pattern.match(filename) is not None:
+                return parser
+        return None
+
+    def for_collection(
+        self, collection: str | None, short_name: str | None = None
+    ) -> FilenameParser | None:
+        """Return the parser for a collection, e.g. of a Harmony message source.
+
+        The collection's concept id and short name are looked up first; otherwise
+        the short name is routed like a filename, since short names usually start
+        the same way as granule names (e.g. "TEMPO_NO2_L2").
+        """
+        for name in (collection, short_name):
+            if name is not None and name in self._by_collection:
+                return self._by_collection[name]
+        return self.route(short_name) if short_name else None
+
+    def get_key(self, filename: str) -> BatchKey | None:
+        """Return the batch key of a granule of any registered parser, or None."""
+        basename = _get_basename(filename)
+        for length in self._prefix_lengths:
+            parser = self._by_prefix.get(basename[:length])
+            if parser is not None:
+                matches = parser.pattern.match(filename)
+                return None if matches is None else (parser.name, *parser.key(matches))
+        for parser in self._parsers.values():
+            matches = parser.pattern.match(filename)
+            if matches is not None:
+                return (parser.name, *parser.key(matches))
+        return None
+
+    def get_sort_key(self, filename: str) -> tuple | None:
+        """Return the sort key of a granule of any registered parser, or None."""
+        parser = self.route(filename)
+        if parser is None:
+            return None
+        sort_key = parser.get_sort_key(filename)
+        return None if sort_key is None else (parser.name, *sort_key)
+
+    def get_batch_indices(
+        self, filenames: Sequence[str], logger: logging.Logger = default_logger
+    ) -> list[int]:
+        """Return the batch index of each matching filename, see `get_batch_indices_by_key`."""
+        return get_batch_indices_by_key(filenames, self.get_key, logger)
+
+    def get_batch_assignment(
+        self,
+        filenames: Sequence[str],
+        unmatched: str = "drop",
+        logger: logging.Logger = default_logger,
+    ) -> BatchAssignment:
+        """Return the batch index of each filename at its position, see
+        `get_batch_assignment_by_key`."""
+        return get_batch_assignment_by_key(filenames, self.get_key, unmatched, logger)
+
+
+default_registry = ParserRegistry([TEMPO_PARSER])
+
+
+def get_batch_indices_by_key(
+    filenames: Sequence[str],
+    get_key: Callable[[str], BatchKey | None],
+    logger: logging.Logger = default_logger,
+) -> list[int]:
+    """
+    Like `batchee.tempo_filename_parser.get_batch_indices`, for any key function.
+
+    Parameters
+    ----------
+    filenames : Sequence[str]
+    get_key : Callable[[str], tuple | None]
+        the batch key of a filename, or None to skip it, e.g. `FilenameParser.get_key`
+    logger : logging.Logger, optional
+
+    Returns
+    -------
+    list[int]
+        batch index for each matching filename, in first-seen order, e.g. [0, 0, 0, 1, 1, 1, ...]
+    """
+    logger.info(f"get_batch_indices_by_key() starting --- with {len(filenames)} filenames")
+
+    keys = [key for key in map(get_key, filenames) if key is not None]
+    if logger.isEnabledFor(logging.INFO):
+        log_list(logger, "unique batch keys", list(dict.fromkeys(keys)))
+
+    return get_first_seen_indices(keys)
+
+
+def get_batch_assignment_by_key(
+    filenames: Sequence[str],
+    get_key: Callable[[str], BatchKey | None],
+    unmatched: str = "drop",
+    logger: logging.Logger = default_logger,
+) -> BatchAssignment:
+    """
+    Like `batchee.tempo_filename_parser.get_batch_assignment`, for any key function.
+
+    Parameters
+    ----------
+    filenames : Sequence[str]
+    get_key : Callable[[str], tuple | None]
+        the batch key of a filename, or None if it does not match
+    unmatched : str, optional (default: "drop")
+        "drop", "batch" or "error", see `batchee.grouping.assign_batches`
+    logger : logging.Logger, optional
+
+    Returns
+    -------
+    batchee.grouping.BatchAssignment
+        the batch index of each filename, and the positions of those that did not match
+    """
+    logger.info(f"get_batch_assignment_by_key() starting --- with {len(filenames)} filenames")
+
+    assignment = assign_batches(map(get_key, filenames), unmatched, filenames)
+    log_rejected(logger, filenames, assignment.rejected)
+    return assignment
@@ -0,0 +1,236 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""Batch assignment for very large lists of filenames, sharded over worker processes.
+
+The filenames are copied once into a shared memory block, as newline-separated
+UTF-8. Each worker decodes its own shard (a range of whole lines) from that
+block, numbers the keys of its shard in the order they are first seen, and
+writes a local key number for each filename into a second shared block. Only the
+distinct keys of each shard are sent back. The parent then numbers the keys of
+the shards, in shard order, which gives the same first-seen batch numbering as
+the serial `get_batch_indices`.
+"""
+
+import logging
+import multiprocessing
+import os
+from array import array
+from collections.abc import Callable, Hashable, Iterator, Sequence
+from multiprocessing.shared_memory import SharedMemory
+
+from batchee.grouping import BatchAssignment, assign_batches
+from batchee.tempo_filename_parser import get_day_and_scan, log_rejected
+
+default_logger = logging.getLogger(__name__)
+
+# The local key number of a filename that does not match
+_UNMATCHED = -1
+
+# Set in each worker process by `_init_worker`
+_get_key: Callable[[str], Hashable | None] = get_day_and_scan
+
+
+def get_available_cpus() -> int:
+    """The number of CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _get_context() -> multiprocessing.context.BaseContext:
+    """Start workers from a fork server where available: the parent may be running
+    threads (e.g. to read STAC items), which makes a plain fork unsafe."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _get_buffer(block: SharedMemory) -> memoryview:
+    """The buffer of an open shared memory block."""
+    buffer = block.buf
+    if buffer is None:
+        raise ValueError(f"Shared memory block {block.name} is closed")
+    return buffer
+
+
+def _init_worker(get_key: Callable[[str], Hashable | None]) -> None:
+    global _get_key
+    _get_key = get_key
+
+
+def _number_shard(
+    names_block: str, numbers_block: str, start: int, end: int, first_row: int
+) -> list[Hashable]:
+    """Number the keys of one shard in first-seen order, writing the number of each
+    filename into the numbers block. Returns the distinct keys of the shard, in order."""
+    names = SharedMemory(names_block)
+    numbers = SharedMemory(numbers_block)
+    try:
+        filenames = bytes(_get_buffer(names)[start:end]).decode().split("\n")
+        number_by_key: dict[Hashable, int] = {}
+        local_numbers = array("i")
+        for filename in filenames:
+            key = _get_key(filename)
+            if key is None:
+                local_numbers.append(_UNMATCHED)
+                continue
+            number = number_by_key.get(key)
+            if number is None:
+                number = number_by_key[key] = len(number_by_key)
+            local_numbers.append(number)
+
+        offset = first_row * local_numbers.itemsize
+        _get_buffer(numbers)[offset : offset + len(local_numbers) * local_numbers.itemsize] = (
+            local_numbers.tobytes()
+        )
+        return list(number_by_key)
+    finally:
+        names.close()
+        numbers.close()
+
+
+def _get_shards(data: bytes, shard_count: int) -> list[tuple[int, int, int]]:
+    """Split newline-separated data into at most `shard_count` shards of whole lines,
+    of similar byte size.
+
+    Returns
+    -------
+    list[tuple[int, int, int]]
+        the start and end (exclusive, before the newline) byte offsets, and the
+        first row, of each shard
+    """
+    starts = [0]
+    for shard in range(1, shard_count):
+        newline = data.find(b"\n", max(starts[-1], len(data) * shard // shard_count))
+        if newline < 0:
+            break
+        starts.append(newline + 1)
+
+    shards = []
+    row = 0
+    for start, next_start in zip(starts, [*starts[1:], len(data) + 1], strict=True):
+        shards.append((start, next_start - 1, row))
+        row += data.count(b"\n", start, next_start) + (next_start > len(data))
+    return shards
+
+
+def get_batch_indices_sharded(
+    filenames: Sequence[str],
+    get_key: Callable[[str], Hashable | None] = get_day_and_scan,
+    processes: int = 0,
+    logger: logging.Logger = default_logger,
+) -> list[int]:
+    """
+    Like `batchee.tempo_filename_parser.get_batch_indices`, with the filenames
+    parsed by a pool of worker processes. See `get_batch_assignment_sharded`.
+
+    Returns
+    -------
+    list[int]
+        batch index for each matching filename, in first-seen order, e.g. [0, 0, 0, 1, 1, 1, ...]
+    """
+    return get_batch_assignment_sharded(filenames, get_key, processes, logger).matched_indices()
+
+
+def get_batch_assignment_sharded(
+    filenames: Sequence[str],
+    get_key: Callable[[str], Hashable | None] = get_day_and_scan,
+    processes: int = 0,
+    logger: logging.Logger = default_logger,
+    unmatched: str = "drop",
+) -> BatchAssignment:
+    """
+    Like `batchee.tempo_filename_parser.get_batch_assignment`, with the filenames
+    parsed by a pool of worker processes.
+
+    Parameters
+    ----------
+    filenames : Sequence[str]
+        the filenames, which must not contain newlines
+    get_key : Callable[[str], Hashable | None], optional
+        the batch key of a filename, or None if it does not match (default: the
+        TEMPO (day, scan)). It is pickled to the workers, so it must be defined at
+        module level (e.g. a method of a registered `batchee.parsers.FilenameParser`
+        whose key function is not a closure).
+    processes : int, optional
+        the number of worker processes; 0 (the default) for one per available CPU
+    logger : logging.Logger, optional
+    unmatched : str, optional (default: "drop")
+        "drop", "batch" or "error", see `batchee.grouping.assign_batches`
+
+    Returns
+    -------
+    batchee.grouping.BatchAssignment
+        the batch index of each filename, and the positions of those that did not match
+    """
+    processes = processes or get_available_cpus()
+    logger.info(
+        f"get_batch_assignment_sharded() starting --- with {len(filenames)} filenames "
+        f"and {processes} processes"
+    )
+    if not filenames:
+        return BatchAssignment([], [])
+
+    data = "\n".join(filenames).encode()
+    if data.count(b"\n") != len(filenames) - 1:
+        raise ValueError("Filenames must not contain newlines")
+
+    names = SharedMemory(create=True, size=len(data) or 1)
+    numbers = SharedMemory(create=True, size=len(filenames) * array("i").itemsize)
+    try:
+        _get_buffer(names)[: len(data)] = data
+        shards = _get_shards(data, processes)
+        del data
+
+        with _get_context().Pool(processes, _init_worker, (get_key,)) as pool:
+            shard_keys = pool.starmap(
+                _number_shard, [(names.name, numbers.name, *shard) for shard in shards]
+            )
+
+        local_numbers = array("i")
+        local_numbers.frombytes(_get_buffer(numbers)[: len(filenames) * local_numbers.itemsize])
+    finally:
+        names.close()
+        names.unlink()
+        numbers.close()
+        numbers.unlink()
+
+    # --- Number the keys of all the shards, in shard order ---
+    key_ids: dict[Hashable, int] = {}
+
+    def iter_key_ids() -> Iterator[int | None]:
+        """The key of each filename, as the number of the key over all the shards."""
+        rows = [row for _, _, row in shards[1:]] + [len(filenames)]
+        for (_, _, first_row), end_row, keys in zip(shards, rows, shard_keys, strict=True):
+            shard_key_ids = [key_ids.setdefault(key, len(key_ids)) for key in keys]
+            for number in local_numbers[first_row:end_row]:
+                yield None if number == _UNMATCHED else shard_key_ids[number]
+
+    assignment = assign_batches(iter_key_ids(), unmatched, filenames)
+    logger.info(f"number of unique batch keys==={len(key_ids)}.")
+    log_rejected(logger, filenames, assignment.rejected)
+    return assignment
@@ -0,0 +1,176 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""Sorting more entries than fit in memory, by spilling sorted runs to temporary files.
+
+Entries are pickled as they are added and held in a buffer, up to a memory
+budget. When the buffer is full it is sorted and written to a temporary file as
+one run. Iterating merges the runs, and what is left in the buffer, with
+`heapq.merge`, reading one entry at a time from each run. Runs beyond the
+maximum fan-in are first merged into longer runs, so at most the budget, plus
+one entry and one file buffer per merged run, is held in memory, however many
+entries are sorted.
+"""
+
+import heapq
+import pickle
+import tempfile
+from collections.abc import Iterator
+from itertools import batched
+from operator import itemgetter
+from pathlib import Path
+from typing import Any
+
+#: the default maximum number of runs merged at once
+MAX_FAN_IN = 64
+
+#: an estimate of the memory held by a buffered entry in addition to its pickled
+#: bytes: the list slot, the (key, bytes) tuple, the key and the bytes object header
+ENTRY_OVERHEAD = 160
+
+
+class ExternalSorter:
+    """
+    Sorts (key, value) pairs by key, holding about `memory_budget` bytes of them in memory.
+
+    The sort is stable: pairs with equal keys come out in the order they were added.
+    Keys and values must be picklable, and keys comparable with each other. The
+    temporary files are removed by `close` (or on leaving a ``with`` block).
+
+    Parameters
+    ----------
+    memory_budget : int
+        the bytes of buffered entries (pickled, see `ENTRY_OVERHEAD`) above which
+        the buffer is written to a run
+    directory : str, optional
+        where to create the run files; by default, `tempfile.gettempdir()`
+    max_fan_in : int, optional
+        the maximum number of runs merged at once
+
+    Attributes
+    ----------
+    run_count : int
+        the number of runs written to temporary files
+    spilled_bytes : int
+        the total size of the runs
+    """
+
+    def __init__(
+        self, memory_budget: int, directory: str | None = None, max_fan_in: int = MAX_FAN_IN
+    ):
+        if memory_budget <= 0:
+            raise ValueError(f"memory_budget must be positive, not {memory_budget}")
+        if max_fan_in < 2:
+            raise ValueError(f"max_fan_in must be at least 2, not {max_fan_in}")
+        self.memory_budget = memory_budget
+        self.directory = directory
+        self.max_fan_in = max_fan_in
+        self.run_count = 0
+        self.spilled_bytes = 0
+        self._buffer: list[tuple[Any, bytes]] = []
+        self._buffered_bytes = 0
+        self._runs: list[Path] = []
+        self._run_directory: tempfile.TemporaryDirectory | None = None
+        self._run_number = 0
+
+    def __enter__(self) -> "ExternalSorter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add(self, key: Any, value: Any) -> None:
+        """Add a pair, writing the buffer to a new run if it is then full."""
+        payload = pickle.dumps((key, value), pickle.HIGHEST_PROTOCOL)
+        self._buffer.append((key, payload))
+        self._buffered_bytes += len(payload) + ENTRY_OVERHEAD
+        if self._buffered_bytes >= self.memory_budget:
+            self._spill()
+
+    def __iter__(self) -> Iterator[tuple[Any, Any]]:
+        """Yield every pair added, in key order."""
+        # Merge consecutive runs into longer ones until the runs and the buffer can be
+        # merged at once; each merged run keeps the place of its runs, for stability
+        while len(self._runs) >= self.max_fan_in:
+            groups = batched(self._runs, self.max_fan_in)
+            self._runs = [self._merge_runs(group) for group in groups]
+
+        self._buffer.sort(key=itemgetter(0))
+        buffered = (pickle.loads(payload) for _, payload in self._buffer)
+        return heapq.merge(*map(_read_run, self._runs), buffered, key=itemgetter(0))
+
+    def close(self) -> None:
+        """Remove the run files and empty the buffer."""
+        if self._run_directory is not None:
+            self._run_directory.cleanup()
+            self._run_directory = None
+        self._runs = []
+        self._buffer = []
+        self._buffered_bytes = 0
+
+    def _spill(self) -> None:
+        """Write the buffer, sorted, to a new temporary file."""
+        self._buffer.sort(key=itemgetter(0))
+        run = self._new_run()
+        with open(run, "wb") as file:
+            for _, payload in self._buffer:
+                file.write(payload)
+            self.spilled_bytes += file.tell()
+        self.run_count += 1
+        self._runs.append(run)
+        self._buffer = []
+        self._buffered_bytes = 0
+
+    def _merge_runs(self, runs: tuple[Path, ...]) -> Path:
+        """Merge runs into a new run, and remove them."""
+        if len(runs) == 1:
+            return runs[0]
+        merged = self._new_run()
+        with open(merged, "wb") as file:
+            for pair in heapq.merge(*map(_read_run, runs), key=itemgetter(0)):
+                pickle.dump(pair, file, pickle.HIGHEST_PROTOCOL)
+        for run in runs:
+            run.unlink()
+        return merged
+
+    def _new_run(self) -> Path:
+        """The path of a new run file, in a temporary directory of this sorter."""
+        if self._run_directory is None:
+            self._run_directory = tempfile.TemporaryDirectory(
+                prefix="batchee-runs-", dir=self.directory
+            )
+        self._run_number += 1
+        return Path(self._run_directory.name, f"{self._run_number}.pickle")
+
+
+def _read_run(run: Path) -> Iterator[tuple[Any, Any]]:
+    """The pairs of a run file, one at a time."""
+    with open(run, "rb") as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
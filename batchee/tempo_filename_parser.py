@@ -28,10 +28,24 @@
 
 import logging
 import re
-from argparse import ArgumentParser
+from collections.abc import Iterable, Sequence
 from datetime import datetime
+from functools import lru_cache
+from typing import TYPE_CHECKING
 from zoneinfo import ZoneInfo
 
+from batchee.grouping import (
+    BatchAssignment,
+    assign_batches,
+    find_duplicates,
+    get_first_seen_indices,
+)
+from batchee.list_logging import log_list
+
+if TYPE_CHECKING:
+    from batchee.granule_table import GranuleTable
+    from batchee.parse_cache import ParseCache
+
 default_logger = logging.getLogger(__name__)
 
 tempo_granule_filename_pattern = re.compile(
@@ -48,6 +62,65 @@ tempo_granule_filename_pattern = re.compile(
 )
 
 DEFAULT_TIMEZONE = ZoneInfo("UTC")
+US_CENTRAL_TIMEZONE = ZoneInfo("America/Chicago")
+
+
+@lru_cache(maxsize=2**16)
+def get_day_in_us_central_for_utc_hour(day_in_granule: str, hour_in_granule: str) -> str:
+    """
+    Return the US/Central day for a UTC day and hour, memoized per (day, hour).
+
+    US daylight saving transitions happen on the hour, so the UTC offset of
+    US/Central (and therefore the Central day) is the same for every minute
+    and second within a UTC hour. The fixed-width digits are parsed directly,
+    without `datetime.strptime`.
+
+    Parameters
+    ----------
+    day_in_granule: str
+        The day from granule filename, as YYYYMMDD
+    hour_in_granule: str
+        The two-digit hour from granule filename, as HH
+
+    Returns
+    -------
+    str
+        The day for datetime converted to US/Central
+    """
+    dt = datetime(
+        int(day_in_granule[0:4]),
+        int(day_in_granule[4:6]),
+        int(day_in_granule[6:8]),
+        int(hour_in_granule),
+        tzinfo=DEFAULT_TIMEZONE,
+    )
+    return dt.astimezone(US_CENTRAL_TIMEZONE).strftime("%Y%m%d")
+
+
+def get_day_in_us_central_for_utc_time(day_in_granule: str, time_in_granule: str) -> str:
+    """
+    Return the US/Central day for a UTC day and time, see `get_day_in_us_central_for_utc_hour`.
+
+    The minute and second are checked here, as the memoized conversion only
+    reads the hour: a time that `datetime.strptime` rejects, e.g. "127500",
+    raises ValueError.
+
+    Parameters
+    ----------
+    day_in_granule: str
+        The day from granule filename, as YYYYMMDD
+    time_in_granule: str
+        The time from granule filename, as HHMMSS
+    """
+    check_minute_and_second(time_in_granule)
+    return get_day_in_us_central_for_utc_hour(day_in_granule, time_in_granule[0:2])
+
+
+def check_minute_and_second(time_in_granule: str) -> None:
+    """Raise ValueError if the minute (above 59) or second (above 61, as for
+    `datetime.strptime`) of an HHMMSS time is out of range."""
+    if time_in_granule[2:4] > "59" or time_in_granule[4:6] > "61":
+        raise ValueError(f"Invalid time in granule filename: {time_in_granule}")
 
 
 def get_day_in_us_central(
@@ -72,16 +145,99 @@ def get_day_in_us_central(
     str
         The day for datetime converted to US/Central
     """
+    if assume_tz is DEFAULT_TIMEZONE:
+        return get_day_in_us_central_for_utc_time(day_in_granule, time_in_granule)
 
     dt = datetime.strptime(day_in_granule + time_in_granule, "%Y%m%d%H%M%S")
     dt = dt.replace(tzinfo=assume_tz)
 
-    dt_central = dt.astimezone(ZoneInfo("America/Chicago"))
+    dt_central = dt.astimezone(US_CENTRAL_TIMEZONE)
     return dt_central.strftime("%Y%m%d")
 
 
-def get_batch_indices(filenames: list, logger: logging.Logger = default_logger) -> list[int]:
+def get_day_and_scan(filename: str) -> tuple[str, str] | None:
     """
+    Returns
+    -------
+    tuple[str, str] | None
+        The US/Central day and the daily scan of a granule, e.g. ('20130701', 'S009'),
+        or None if the filename does not match `tempo_granule_filename_pattern`
+    """
+    matches = tempo_granule_filename_pattern.match(filename)
+    if not matches:
+        return None
+
+    day_in_granule, time_in_granule, daily_scan_id = matches.group(
+        "day_in_granule", "time_in_granule", "daily_scan_id"
+    )
+    return get_day_in_us_central_for_utc_time(day_in_granule, time_in_granule), daily_scan_id
+
+
+def get_granule_identity(filename: str) -> tuple[tuple[str | bool, ...], int] | None:
+    """
+    Returns
+    -------
+    tuple[tuple, int] | None
+        The identity of a granule, i.e. its product, processing level, NRT flag,
+        US/Central day, daily scan and granule id, with its version number, e.g.
+        (("NO2", "L2", False, "20240731", "S016", "G03"), 3), or None if the
+        filename does not match `tempo_granule_filename_pattern`
+    """
+    matches = tempo_granule_filename_pattern.match(filename)
+    if not matches:
+        return None
+
+    product_type, proxy, level, nrt, version_id, day, time, scan, granule = matches.groups()
+    central_day = get_day_in_us_central_for_utc_time(day, time)
+    return (product_type + proxy, level, bool(nrt), central_day, scan, granule), int(version_id[1:])
+
+
+def find_duplicate_granules(
+    filenames: Sequence[str], keep: str = "newest", logger: logging.Logger = default_logger
+) -> list[int]:
+    """
+    Find the granules that are listed more than once, e.g. as several versions or
+    from overlapping catalog pages, see `batchee.grouping.find_duplicates`.
+
+    TEMPO granules are identified by `get_granule_identity`, other filenames only
+    by the whole filename (or URL).
+
+    Parameters
+    ----------
+    filenames : Sequence[str]
+    keep : str, optional (default: "newest")
+        "newest" to keep the highest version of each granule, or "first" to keep
+        the first filename of each
+    logger : logging.Logger, optional
+
+    Returns
+    -------
+    list[int]
+        the positions of the filenames to drop, in order
+    """
+    dropped = find_duplicates(
+        (get_granule_identity(name) or ((name,), 0) for name in filenames), keep
+    )
+    if dropped:
+        logger.warning(f"Dropping {len(dropped)} duplicate granules.")
+        log_list(logger, "duplicate_granules", [filenames[position] for position in dropped])
+    return dropped
+
+
+def get_batch_indices(
+    filenames: "list | GranuleTable",
+    logger: logging.Logger = default_logger,
+    cache: "ParseCache | None" = None,
+) -> list[int]:
+    """
+    Parameters
+    ----------
+    filenames : list[str] | batchee.granule_table.GranuleTable
+        the filenames, or a table of already parsed granules
+    logger : logging.Logger, optional
+    cache : batchee.parse_cache.ParseCache, optional
+        a persistent cache of parsed filenames, consulted before parsing
+
     Returns
     -------
     list[int]
@@ -89,68 +245,88 @@ def get_batch_indices(filenames: list, logger: logging.Logger = default_logger)
     """
     logger.info(f"get_batch_indices() starting --- with {len(filenames)} filenames")
 
+    # Imported here, as batchee.granule_table builds on this module
+    from batchee.granule_table import GranuleTable
+
+    if isinstance(filenames, GranuleTable):
+        return filenames.batch_indices()
+
     # Make a new list with days and scans, e.g. [('20130701', 'S009'), ('20130701', 'S009'), ...]
     day_and_scans: list[tuple[str, str]] = []
-    for name in filenames:
-        matches = tempo_granule_filename_pattern.match(name)
-        if matches:
-            match_dict = matches.groupdict()
-            day_in_central = get_day_in_us_central(
-                match_dict["day_in_granule"], match_dict["time_in_granule"]
-            )
-            day_and_scans.append((day_in_central, match_dict["daily_scan_id"]))
+    if cache is not None:
+        for granule in cache.parse_many(filenames):
+            if granule:
+                day_and_scans.append((granule.day, granule.scan))
+    else:
+        for name in filenames:
+            day_and_scan = get_day_and_scan(name)
+            if day_and_scan:
+                day_and_scans.append(day_and_scan)
 
     # Unique day-scans are determined (while keeping the same order). Each will be its own batch.
-    unique_day_scans: list[tuple[str, str]] = sorted(set(day_and_scans), key=day_and_scans.index)
+    if logger.isEnabledFor(logging.INFO):
+        log_list(logger, "unique_day_scans", list(dict.fromkeys(day_and_scans)))
+
+    # Generate a new list with the integer representation (in first-seen order) for each entry
+    return get_first_seen_indices(day_and_scans)
 
-    logger.info(f"unique_day_scans==={unique_day_scans}.")
 
-    # Map each day/scan to an integer
-    batch_mapper: dict[tuple[str, str], int] = {
-        day_scan: idx for idx, day_scan in enumerate(unique_day_scans)
-    }
+def get_batch_assignment(
+    filenames: Sequence[str],
+    unmatched: str = "drop",
+    logger: logging.Logger = default_logger,
+    cache: "ParseCache | None" = None,
+) -> BatchAssignment:
+    """
+    Like `get_batch_indices`, with the batch of each filename at its position.
 
-    # Generate a new list with the integer representation for each entry in the original list
-    return [batch_mapper[day_scan] for day_scan in day_and_scans]
+    Filenames are parsed once; those that do not match
+    `tempo_granule_filename_pattern` are handled according to `unmatched`, see
+    `batchee.grouping.assign_batches`.
 
+    Parameters
+    ----------
+    filenames : Sequence[str]
+    unmatched : str, optional (default: "drop")
+        "drop", "batch" or "error"
+    logger : logging.Logger, optional
+    cache : batchee.parse_cache.ParseCache, optional
+        a persistent cache of parsed filenames, consulted before parsing
 
-def main() -> list[list[str]]:
-    """Main CLI entrypoint"""
+    Returns
+    -------
+    batchee.grouping.BatchAssignment
+        the batch index of each filename, and the positions of those that did not match
+    """
+    logger.info(f"get_batch_assignment() starting --- with {len(filenames)} filenames")
 
-    parser = ArgumentParser(
-        prog="batchee",
-        description="Simple CLI wrapper around the granule batchee module.",
-    )
-    parser.add_argument(
-        "file_names",
-        nargs="+",
-        help="A space-separated list of filenames for which batches will be determined.",
-    )
-    parser.add_argument(
-        "-v",
-        "--verbose",
-        help="Enable verbose output to stdout; useful for debugging",
-        action="store_true",
-    )
+    keys: Iterable[tuple[str, str] | None]
+    if cache is not None:
+        keys = [
+            (granule.day, granule.scan) if granule else None
+            for granule in cache.parse_many(filenames)
+        ]
+    else:
+        keys = map(get_day_and_scan, filenames)
 
-    args = parser.parse_args()
+    assignment = assign_batches(keys, unmatched, filenames)
+    log_rejected(logger, filenames, assignment.rejected)
+    return assignment
 
-    if args.verbose:
-        logging.basicConfig(level=logging.DEBUG)
 
-    input_filenames = args.file_names
+def log_rejected(logger: logging.Logger, filenames: Sequence[str], rejected: list[int]) -> None:
+    """Warn about the filenames that did not match the pattern of their parser."""
+    if rejected:
+        logger.warning(f"{len(rejected)} granule filenames do not match their pattern.")
+        log_list(logger, "unmatched_filenames", [filenames[position] for position in rejected])
 
-    batch_indices = get_batch_indices(input_filenames)
-    unique_category_indices: list[int] = sorted(set(batch_indices), key=batch_indices.index)
-    logging.info(f"batch_indices = {batch_indices}")
 
-    # --- Construct a STAC object based on the batch indices ---
-    grouped: dict[int, list[str]] = {}
-    for k, v in zip(batch_indices, input_filenames, strict=False):
-        grouped.setdefault(k, []).append(v)
-    grouped_names: list[list[str]] = [grouped[k] for k in unique_category_indices]
+def main() -> list[list[str]] | None:
+    """Main CLI entrypoint, see `batchee.cli.main`"""
+    # Imported here, as batchee.cli builds on this module
+    from batchee.cli import main as cli_main
 
-    return grouped_names
+    return cli_main()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,225 @@
+# Copyright 2024 United States Government as represented by the
+# Administrator of the National Aeronautics and Space Administration. All Rights Reserved.
+#
+# This software calls the following third-party software, which is subject to the terms and
+# conditions of its licensor, as applicable.  Users must license their own copies;
+# the links are provided for convenience only.
+#
+# Harmony-service-lib-py
+# https://www.apache.org/licenses/LICENSE-2.0
+# https://github.com/nasa/harmony-service-lib-py?tab=License-1-ov-file
+#
+# pystac
+# https://github.com/stac-utils/pystac/blob/main/LICENSE
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Python Standard Library (version 3.10)
+# https://docs.python.org/3/license.html#psf-license
+#
+# The Batchee: Granule batcher service to support concatenation platform is licensed under the
+# Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with
+# the License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""Bulk batch assignment for large arrays of filenames, using NumPy.
+
+This module requires the optional ``numpy`` dependency (``pip install batchee[numpy]``).
+"""
+
+import logging
+import re
+from collections.abc import Sequence
+from datetime import datetime
+
+import numpy as np
+
+from batchee.tempo_filename_parser import US_CENTRAL_TIMEZONE, get_day_and_scan
+
+default_logger = logging.getLogger(__name__)
+
+# Everything in `tempo_granule_filename_pattern` from "TEMPO_" up to the date in the granule.
+tempo_granule_header_pattern = re.compile(r"TEMPO_[1-9A-Z]+(?:-PROXY)*_L[0-9]_(?:NRT_)?V[0-9]+_")
+
+# Layout of the fixed-width part of a TEMPO filename that follows the header,
+#   e.g. "20240731T235252Z_S016G04"
+_STAMP_LENGTH = 24
+_STAMP_LITERALS = {8: "T", 15: "Z", 16: "_", 17: "S", 21: "G"}
+_STAMP_DIGITS = np.array([i for i in range(_STAMP_LENGTH) if i not in _STAMP_LITERALS])
+_MINIMUM_HEADER_LENGTH = len("TEMPO_X_L0_V0_")
+
+
+def _as_string_array(filenames) -> np.ndarray:
+    """Return the filenames as a 1-D NumPy unicode array, converting pyarrow arrays if needed."""
+    if not isinstance(filenames, np.ndarray) and hasattr(filenames, "to_numpy"):
+        # pyarrow.Array / pyarrow.ChunkedArray (and pandas.Series) of strings
+        filenames = filenames.to_numpy(zero_copy_only=False)
+    names = np.asarray(filenames)
+    if names.dtype.kind != "U":
+        names = names.astype(str)
+    return np.ascontiguousarray(names.reshape(-1))
+
+
+def _gather(codes: np.ndarray, starts: np.ndarray, length: int) -> np.ndarray:
+    """Gather `length` code points from each row of `codes`, starting at a per-row offset."""
+    count, width = codes.shape
+    columns = starts[:, np.newaxis] + np.arange(length)
+    np.clip(columns, 0, width - 1, out=columns)
+    columns += np.arange(0, count * width, width)[:, np.newaxis]
+    return np.take(codes.reshape(-1), columns)
+
+
+def _parse_fixed_width(names: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Locate and parse the date, hour and scan of each TEMPO filename with array operations.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        a mask of the names that were parsed, and for those names the UTC hour
+        (hours since the Unix epoch) and the daily scan number
+    """
+    count = len(names)
+    width = names.dtype.itemsize // 4
+    if count == 0 or width < _MINIMUM_HEADER_LENGTH + _STAMP_LENGTH:
+        return np.zeros(count, dtype=bool), np.empty(0, np.int64), np.empty(0, np.int64)
+
+    codes = names.view(np.uint32).reshape(count, width)
+
+    # --- Cheap prefix check: the last "TEMPO_" and the last "Z_S" locate the fields ---
+    header_starts = np.char.rfind(names, "TEMPO_").astype(np.int64)
+    stamp_starts = np.char.rfind(names, "Z_S").astype(np.int64) - 15
+    header_lengths = stamp_starts - header_starts
+    parsed = (header_starts >= 0) & (header_lengths >= _MINIMUM_HEADER_LENGTH)
+    parsed &= np.char.rfind(names, ".nc") >= stamp_starts + _STAMP_LENGTH
+
+    stamps = _gather(codes, stamp_starts, _STAMP_LENGTH)
+    for position, literal in _STAMP_LITERALS.items():
+        parsed &= stamps[:, position] == ord(literal)
+    digits = stamps[:, _STAMP_DIGITS].astype(np.int64) - ord("0")
+    parsed &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+
+    # --- Validate the variable-width header once per distinct header, e.g. "TEMPO_NO2_L2_V03_" ---
+    header_width = int(header_lengths[parsed].max(initial=0))
+    if header_width:
+        headers = _gather(codes, header_starts, header_width)
+        headers[np.arange(header_width) >= header_lengths[:, np.newaxis]] = 0
+        unique_headers, header_inverse = np.unique(
+            np.ascontiguousarray(headers).view(f"<U{header_width}").reshape(-1),
+            return_inverse=True,
+        )
+        valid_headers = np.array(
+            [bool(tempo_granule_header_pattern.fullmatch(str(h))) for h in unique_headers]
+        )
+        parsed &= valid_headers[header_inverse.reshape(-1)]
+
+    # --- Convert the digit columns to integer fields ---
+    def field(first: int, last: int) -> np.ndarray:
+        columns = np.searchsorted(_STAMP_DIGITS, [first, last])
+        values = np.zeros(count, dtype=np.int64)
+        for column in range(columns[0], columns[1] + 1):
+            values = values * 10 + digits[:, column]
+        return values
+
+    year, month, day, hour = field(0, 3), field(4, 5), field(6, 7), field(9, 10)
+    minute, second = field(11, 12), field(13, 14)
+    scan = field(18, 20)
+
+    # Out-of-range dates and times are left to the scalar path, which raises for them as before
+    parsed &= (month >= 1) & (month <= 12) & (day >= 1) & (hour <= 23)
+    parsed &= (minute <= 59) & (second <= 61)
+    month_starts = (year - 1970).astype("datetime64[Y]") + np.clip(month - 1, 0, 11).astype(
+        "timedelta64[M]"
+    )
+    days = month_starts.astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+    parsed &= days.astype("datetime64[M]") == month_starts
+
+    utc_hours = days[parsed].astype(np.int64) * 24 + hour[parsed]
+    return parsed, utc_hours, scan[parsed]
+
+
+def _utc_offset_hours(utc_hour: int) -> int:
+    """Return the whole-hour UTC offset of US/Central at the given hour since the Unix epoch."""
+    offset = datetime.fromtimestamp(utc_hour * 3600, US_CENTRAL_TIMEZONE).utcoffset()
+    return int(offset.total_seconds()) // 3600  # type: ignore[union-attr]
+
+
+def _central_days_for_utc_hours(utc_hours: np.ndarray) -> np.ndarray:
+    """Map hours since the Unix epoch (UTC) to the US/Central day, as YYYYMMDD integers.
+
+    The UTC offset is looked up once per distinct UTC day, at its first and last
+    hour. Only on the days where those differ (i.e. daylight saving transitions)
+    is the offset looked up for every hour.
+    """
+    utc_days = utc_hours // 24
+    unique_days, day_inverse = np.unique(utc_days, return_inverse=True)
+    day_inverse = day_inverse.reshape(-1)
+    first_offsets = np.array([_utc_offset_hours(24 * int(d)) for d in unique_days])
+    last_offsets = np.array([_utc_offset_hours(24 * int(d) + 23) for d in unique_days])
+
+    offsets = first_offsets[day_inverse]
+    on_transition_day = (first_offsets != last_offsets)[day_inverse]
+    if on_transition_day.any():
+        offsets[on_transition_day] = [
+            _utc_offset_hours(int(h)) for h in utc_hours[on_transition_day]
+        ]
+
+    central_days = ((utc_hours + offsets) // 24).astype("datetime64[D]")
+    central_months = central_days.astype("datetime64[M]")
+    year = central_months.astype("datetime64[Y]").astype(np.int64) + 1970
+    month = central_months.astype(np.int64) % 12 + 1
+    day = (central_days - central_months).astype(np.int64) + 1
+    return year * 10000 + month * 100 + day
+
+
+def get_batch_indices_array(
+    filenames: Sequence[str] | np.ndarray, logger: logging.Logger = default_logger
+) -> np.ndarray:
+    """Vectorized equivalent of `batchee.tempo_filename_parser.get_batch_indices`.
+
+    Names whose date, time and scan can be located with a cheap prefix check
+    are parsed with array slicing; any others are matched one at a time
+    against `tempo_granule_filename_pattern`. As with `get_batch_indices`,
+    names that do not match are skipped, and batches are numbered in the
+    order they are first seen.
+
+    Parameters
+    ----------
+    filenames : Sequence[str] | np.ndarray
+        A NumPy string array, a pyarrow string array, or any sequence of strings
+    logger : logging.Logger, optional
+
+    Returns
+    -------
+    np.ndarray
+        int32 batch index for each matching filename, e.g. [0, 0, 0, 1, 1, 1, ...]
+    """
+    names = _as_string_array(filenames)
+    logger.info(f"get_batch_indices_array() starting --- with {len(names)} filenames")
+
+    parsed, utc_hours, scans = _parse_fixed_width(names)
+    keys = np.full(len(names), -1, dtype=np.int64)
+    keys[parsed] = _central_days_for_utc_hours(utc_hours) * 1000 + scans
+
+    # --- Names that need the full regex fall back to the scalar path ---
+    fallback_positions = np.flatnonzero(~parsed)
+    logger.info(f"number of filenames parsed with the scalar fallback==={len(fallback_positions)}.")
+    for position in fallback_positions:
+        day_and_scan = get_day_and_scan(str(names[position]))
+        if day_and_scan:
+            keys[position] = int(day_and_scan[0]) * 1000 + int(day_and_scan[1][1:])
+
+    keys = keys[keys >= 0]
+    if len(keys) == 0:
+        return np.empty(0, dtype=np.int32)
+
+    # --- Number the unique (day, scan) keys in the order they are first seen ---
+    _, first_positions, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    first_seen_rank = np.empty(len(first_positions), dtype=np.int32)
+    first_seen_rank[np.argsort(first_positions, kind="stable")] = np.arange(
+        len(first_positions), dtype=np.int32
+    )
+    logger.info(f"number of unique_day_scans==={len(first_positions)}.")
+
+    return first_seen_rank[inverse.reshape(-1)]
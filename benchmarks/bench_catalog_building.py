@@ -0,0 +1,136 @@
+"""Timing and allocation benchmark for building the output batch catalogs.
+
+Compares the original construction (a full `catalog.clone()` per batch, then
+clearing its children and items, and repeated asset scans per item) with
+`ConcatBatching._build_batch_catalog`, which clones a small template catalog
+and reuses each item's already-extracted URL.
+
+Usage::
+
+    python benchmarks/bench_catalog_building.py [--items 20000] [--batch-size 10]
+"""
+
+import logging
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+from harmony_service_lib.util import bbox_to_geometry
+from pystac import Asset, Catalog, Item, Link
+from synthetic import make_tempo_filenames
+
+from batchee.harmony.options import BatcheeOptions
+from batchee.harmony.service_adapter import ConcatBatching
+from batchee.harmony.util import _get_batch_catalog_template, _get_item_url, _get_output_date_range
+
+
+def make_input(count: int) -> tuple[Catalog, list[Item]]:
+    """Build an input catalog with one (unresolved) item link per granule, and the items."""
+    catalog = Catalog("input", "synthetic input catalog")
+    catalog.add_link(Link("harmony_source", "https://cmr.example/search/concepts/C0-EXAMPLE"))
+    items = []
+    start = datetime(2024, 6, 1, 12)
+    for position, name in enumerate(make_tempo_filenames(count)):
+        item = Item(
+            f"item-{position}",
+            None,
+            [-120.0, 20.0, -60.0, 60.0],
+            None,
+            {
+                "start_datetime": (start + timedelta(minutes=position)).isoformat(),
+                "end_datetime": (start + timedelta(minutes=position + 1)).isoformat(),
+            },
+        )
+        item.add_asset("metadata", Asset(f"s3://bucket/{name}.xml", roles=["metadata"]))
+        item.add_asset("data", Asset(f"s3://bucket/{name}", roles=["data"]))
+        items.append(item)
+        catalog.add_link(Link("item", f"./item-{position}.json"))
+    return catalog, items
+
+
+def build_with_catalog_clone(catalog: Catalog, batches: list[list[Item]]) -> list[Catalog]:
+    """The construction as originally written, kept here as the baseline."""
+    catalogs = []
+    for batch_items in batches:
+        batch_catalog = catalog.clone()
+        batch_catalog.id = str(uuid4())
+        batch_catalog.clear_children()
+        batch_catalog.clear_items()
+        for item in batch_items:
+            output_item = Item(
+                str(uuid4()),
+                bbox_to_geometry(item.bbox),
+                item.bbox,
+                None,
+                _get_output_date_range([item]),
+            )
+            output_item.add_asset(
+                "data",
+                Asset(
+                    _get_item_url(item),
+                    title=_get_item_url(item),
+                    media_type="application/x-netcdf4",
+                    roles=["data"],
+                ),
+            )
+            batch_catalog.add_item(output_item)
+        catalogs.append(batch_catalog)
+    return catalogs
+
+
+def build_with_template(adapter, catalog: Catalog, batches: list[list[Item]]) -> list[Catalog]:
+    """The current construction, from a template catalog and pre-extracted URLs."""
+    template = _get_batch_catalog_template(catalog)
+    return [
+        adapter._build_batch_catalog(
+            template, batch_id, [(item, _get_item_url(item)) for item in batch_items]
+        )
+        for batch_id, batch_items in enumerate(batches)
+    ]
+
+
+def measure(function, *args) -> tuple[float, int, int]:
+    """Return the wall-clock time, and the peak traced memory and allocated blocks of a second run."""
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    del result
+    return elapsed, peak, blocks
+
+
+def main() -> None:
+    """Run the benchmark and print the comparison."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=10)
+    args = parser.parse_args()
+
+    catalog, items = make_input(args.items)
+    batches = [items[i : i + args.batch_size] for i in range(0, len(items), args.batch_size)]
+    adapter = ConcatBatching.__new__(ConcatBatching)
+    adapter.logger = logging.getLogger("batchee.benchmark")
+    adapter.logger.setLevel(logging.WARNING)
+    adapter.options = BatcheeOptions()
+    adapter.message = MagicMock()
+
+    print(f"{len(items)} items in {len(batches)} batches")
+    print(f"{'path':>14} {'time [s]':>9} {'peak [MiB]':>11} {'output blocks':>14}")
+    for label, function, function_args in [
+        ("catalog.clone", build_with_catalog_clone, (catalog, batches)),
+        ("template", build_with_template, (adapter, catalog, batches)),
+    ]:
+        elapsed, peak, blocks = measure(function, *function_args)
+        print(f"{label:>14} {elapsed:>9.3f} {peak / 2**20:>11.1f} {blocks:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark of grouping in memory against grouping with sorted runs spilled to disk.
+
+Writes a paged Harmony-style catalog of granules in shuffled order (so that
+streaming mode does not apply), then, for each ``--memory`` budget, groups it
+with `ConcatBatching.group_batches` (budget 0) or
+`ConcatBatching.iter_grouped_batches`, with the fast reader, and goes through
+the batches as a writer does. Reports the time and the peak memory traced with
+`tracemalloc`.
+
+Usage::
+
+    python benchmarks/bench_external_grouping.py [--items 50000] [--memory 0 4000000 1000000]
+"""
+
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from pathlib import Path
+
+from harmony_service_lib.message import Message
+from pystac import Catalog
+from suite import HARMONY_ENV, HARMONY_MESSAGE
+from synthetic import make_tempo_granules, write_paged_catalog
+
+from batchee.harmony.options import BatcheeOptions
+from batchee.harmony.service_adapter import ConcatBatching
+
+
+def group(catalog_path: Path, grouping_memory: int) -> tuple[int, dict]:
+    """Group the catalog and go through its batches; return the number of batches and
+    the adapter's metrics counters."""
+    catalog = Catalog.from_file(str(catalog_path))
+    options = BatcheeOptions(fast_reader=True, grouping_memory=grouping_memory)
+    adapter = ConcatBatching(Message(HARMONY_MESSAGE), catalog=catalog, options=options)
+    if grouping_memory:
+        batches = adapter.iter_grouped_batches(catalog)
+    else:
+        batches = iter(adapter.group_batches(catalog))
+    batch_count = sum(1 for _ in batches)
+    return batch_count, adapter.metrics.counters
+
+
+def main() -> None:
+    """Run the benchmark and print a table of timings and peak memory."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--memory", type=int, nargs="+", default=[0, 4_000_000, 1_000_000])
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    for name, value in HARMONY_ENV.items():
+        os.environ.setdefault(name, value)
+
+    granules = make_tempo_granules(args.items)
+    random.Random(0).shuffle(granules)
+    with tempfile.TemporaryDirectory() as directory:
+        catalog_path = write_paged_catalog(Path(directory), granules, args.page_size)
+
+        print(f"{args.items} items")
+        print(f"{'budget [B]':>11} {'time [s]':>9} {'peak MiB':>9} {'batches':>8} {'runs':>5}")
+        for grouping_memory in args.memory:
+            tracemalloc.start()
+            start = time.perf_counter()
+            batch_count, counters = group(catalog_path, grouping_memory)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{grouping_memory or 'in memory':>11} {elapsed:>9.2f} {peak / 2**20:>9.1f}"
+                f" {batch_count:>8} {counters.get('spilled_runs', 0):>5}"
+            )
+
+
+if __name__ == "__main__":
+    main()
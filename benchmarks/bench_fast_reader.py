@@ -0,0 +1,75 @@
+"""Benchmark of reading input STAC items as `pystac.Item`s or as `GranuleRecord`s.
+
+Writes a paged Harmony-style catalog with one JSON file per granule to a
+temporary directory, then, for each reader, times reading every item with
+`_iter_catalog_items` and extracting the data asset URLs with
+`_get_netcdf_urls` (best of ``--repeat`` runs), and measures the memory held by
+the list of items that was read (in one extra, traced run).
+
+Usage::
+
+    python benchmarks/bench_fast_reader.py [--items 20000] [--repeat 3]
+"""
+
+import gc
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from pathlib import Path
+
+from pystac import Catalog, Item
+from synthetic import make_tempo_granules, write_paged_catalog
+
+from batchee.harmony.util import _get_netcdf_urls, _iter_catalog_items, read_granule_record
+
+READERS = {"pystac.Item": Item.from_file, "GranuleRecord": read_granule_record}
+
+
+def read_items(catalog_path: Path, read_item) -> list:
+    return list(_iter_catalog_items(Catalog.from_file(str(catalog_path)), read_item=read_item))
+
+
+def main() -> None:
+    """Run the benchmark and print a table of timings and memory per item."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        catalog_path = write_paged_catalog(
+            Path(directory), make_tempo_granules(args.items), args.page_size
+        )
+
+        print(
+            f"{'reader':>14} {'read [us/item]':>15} {'urls [us/item]':>15} {'memory [B/item]':>16}"
+        )
+        for label, read_item in READERS.items():
+            read_time = url_time = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                items = read_items(catalog_path, read_item)
+                read_time = min(read_time, time.perf_counter() - start)
+                start = time.perf_counter()
+                _get_netcdf_urls(items)
+                url_time = min(url_time, time.perf_counter() - start)
+                del items
+
+            gc.collect()
+            tracemalloc.start()
+            items = read_items(catalog_path, read_item)
+            gc.collect()
+            held, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del items
+
+            print(
+                f"{label:>14} {1e6 * read_time / args.items:>15.1f}"
+                f" {1e6 * url_time / args.items:>15.2f} {held / args.items:>16.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Time and memory of parsed granules as Python tuples or as a `GranuleTable`.
+
+Compares the parsed (day, scan) tuples kept by `get_batch_indices` with a
+`GranuleTable` built from the same URLs, then times grouping, sorting and
+slicing on the table. Memory is the peak traced by tracemalloc while parsing,
+excluding the input URLs (but including the table's own URL buffer).
+
+Usage::
+
+    python benchmarks/bench_granule_table.py [--names 1000000] [--repeat 3]
+"""
+
+import logging
+import tracemalloc
+from argparse import ArgumentParser
+
+from bench_grouping import time_call
+from synthetic import make_tempo_filenames
+
+from batchee.granule_table import GranuleTable
+from batchee.tempo_filename_parser import get_batch_indices, get_day_and_scan
+
+
+def peak_memory(function, argument) -> int:
+    """Return the peak traced memory, in bytes, of one call."""
+    tracemalloc.start()
+    try:
+        result = function(argument)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        del result
+
+
+def main() -> None:
+    """Run the benchmark and print a table of timings."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("batchee").setLevel(logging.WARNING)
+    urls = [f"s3://bucket/granules/{name}" for name in make_tempo_filenames(args.names)]
+    table = GranuleTable.from_urls(urls)
+
+    def parse_tuples(names):
+        return [get_day_and_scan(name) for name in names]
+
+    rows = [
+        ("get_batch_indices(urls)", time_call(get_batch_indices, urls, args.repeat), None),
+        ("  parsed tuples", time_call(parse_tuples, urls, args.repeat), parse_tuples),
+        ("GranuleTable.from_urls", time_call(GranuleTable.from_urls, urls, args.repeat), None),
+        ("  (memory)", 0.0, GranuleTable.from_urls),
+        ("table.batch_indices", time_call(GranuleTable.batch_indices, table, args.repeat), None),
+        ("table.group_positions", time_call(GranuleTable.group_positions, table, 1), None),
+        ("table.argsort", time_call(GranuleTable.argsort, table, 1), None),
+        ("table[::2]", time_call(lambda t: t[::2], table, 1), None),
+    ]
+
+    print(f"{'step':>24} {'time [s]':>9} {'us/name':>8} {'peak MB':>8}")
+    for label, elapsed, measured in rows:
+        memory = f"{peak_memory(measured, urls) / 1e6:>8.1f}" if measured else f"{'':>8}"
+        print(f"{label:>24} {elapsed:>9.3f} {1e6 * elapsed / args.names:>8.2f} {memory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Scaling benchmark for batch index assignment.
+
+Times `get_first_seen_indices` (the grouping step on its own) and the full
+`get_batch_indices` over synthetic TEMPO filenames, from 10^2 up to 10^6 names,
+and reports the time per filename at each size. A flat time-per-filename column
+shows that the cost grows linearly with the number of granules.
+
+Usage::
+
+    python benchmarks/bench_grouping.py [--max-exponent 6] [--repeat 3]
+"""
+
+import logging
+import time
+from argparse import ArgumentParser
+
+from synthetic import make_tempo_filenames
+
+from batchee.grouping import get_first_seen_indices
+from batchee.tempo_filename_parser import get_batch_indices
+
+
+def time_call(function, argument, repeat: int) -> float:
+    """Return the best wall-clock time, in seconds, out of `repeat` calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """Run the benchmark and print a table of timings."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-exponent", type=int, default=2)
+    parser.add_argument("--max-exponent", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("batchee").setLevel(logging.WARNING)
+
+    print(f"{'n':>9} {'grouping [s]':>13} {'ns/name':>9} {'batch idx [s]':>14} {'us/name':>9}")
+    for exponent in range(args.min_exponent, args.max_exponent + 1):
+        count = 10**exponent
+        filenames = make_tempo_filenames(count)
+        day_and_scans = [(name[17:25], name[34:38]) for name in filenames]
+
+        grouping_time = time_call(get_first_seen_indices, day_and_scans, args.repeat)
+        batch_time = time_call(get_batch_indices, filenames, args.repeat)
+
+        print(
+            f"{count:>9} {grouping_time:>13.4f} {1e9 * grouping_time / count:>9.1f}"
+            f" {batch_time:>14.4f} {1e6 * batch_time / count:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark of serial and threaded STAC item reading from a paged catalog.
+
+Writes a paged Harmony-style catalog (catalog0.json -> catalog1.json -> ...)
+with one JSON file per granule to a temporary directory, then times reading
+every item with `_iter_catalog_items` at several concurrency limits. Use
+`--latency-ms` to add a fixed delay to every file read, as a stand-in for
+S3 or NFS-staged inputs.
+
+Usage::
+
+    python benchmarks/bench_item_reading.py [--items 5000] [--latency-ms 0]
+"""
+
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+from pystac import Catalog
+from pystac.stac_io import DefaultStacIO, StacIO
+from synthetic import make_tempo_filenames, write_paged_catalog
+
+from batchee.harmony.util import _iter_catalog_items
+
+
+class SlowStacIO(DefaultStacIO):
+    """A StacIO that sleeps before every read, to mimic remote storage latency."""
+
+    latency = 0.0
+
+    def read_text(self, source, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().read_text(source, *args, **kwargs)
+
+
+def main() -> None:
+    """Run the benchmark and print a table of timings."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    SlowStacIO.latency = args.latency_ms / 1000
+    StacIO.set_default(SlowStacIO)
+
+    with tempfile.TemporaryDirectory() as directory:
+        catalog_path = write_paged_catalog(
+            Path(directory), make_tempo_filenames(args.items), args.page_size
+        )
+
+        print(f"{'workers':>8} {'time [s]':>9} {'items/s':>9} {'speedup':>8}")
+        serial_time = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            count = sum(
+                1
+                for _ in _iter_catalog_items(
+                    Catalog.from_file(str(catalog_path)), max_workers=workers
+                )
+            )
+            elapsed = time.perf_counter() - start
+            serial_time = serial_time or elapsed
+            print(
+                f"{workers:>8} {elapsed:>9.3f} {count / elapsed:>9.0f} {serial_time / elapsed:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
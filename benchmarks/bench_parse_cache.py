@@ -0,0 +1,58 @@
+"""Benchmark of batch assignment with and without the persistent parse cache.
+
+Times `get_batch_indices` parsing every filename, then with a `ParseCache` that
+is empty (parse and store), warm in the same process, and warm in a new
+process (a fresh connection to the same file, as for a later Harmony request).
+The timezone memo is cleared before each run, as it would be in a new worker.
+
+Usage::
+
+    python benchmarks/bench_parse_cache.py [--names 100000] [--repeat 3]
+"""
+
+import logging
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from synthetic import make_tempo_filenames
+
+from batchee.parse_cache import ParseCache
+from batchee.tempo_filename_parser import get_batch_indices, get_day_in_us_central_for_utc_hour
+
+
+def run(filenames: list[str], cache: ParseCache | None) -> float:
+    get_day_in_us_central_for_utc_hour.cache_clear()
+    start = time.perf_counter()
+    get_batch_indices(filenames, cache=cache)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """Run the benchmark and print a table of timings."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("batchee").setLevel(logging.WARNING)
+    filenames = [f"s3://bucket/granules/{name}" for name in make_tempo_filenames(args.names)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "parse-cache.sqlite")
+        timings = {
+            "no cache": min(run(filenames, None) for _ in range(args.repeat)),
+            "cold cache": run(filenames, ParseCache(path)),
+        }
+        cache = ParseCache(path)
+        timings["warm, same process"] = min(run(filenames, cache) for _ in range(args.repeat))
+        timings["warm, new process"] = run(filenames, ParseCache(path))
+
+    print(f"{'run':>20} {'time [s]':>9} {'us/name':>8}")
+    for label, elapsed in timings.items():
+        print(f"{label:>20} {elapsed:>9.3f} {1e6 * elapsed / args.names:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Mixed-collection throughput of the filename parser registry.
+
+Registers TEMPO plus an increasing number of synthetic missions, each with its
+own prefix and compiled pattern, and times batch assignment over a mix of their
+filenames. Prefix routing ("registry") is compared with trying every pattern in
+turn ("sequential"): the registry's time per filename should stay flat as
+parsers are added, while the sequential time grows with the parser count.
+
+Usage::
+
+    python benchmarks/bench_parsers.py [--names 100000] [--parsers 1 10 100 1000]
+"""
+
+import logging
+import random
+import re
+from argparse import ArgumentParser
+from functools import partial
+
+from bench_grouping import time_call
+from synthetic import make_tempo_filenames
+
+from batchee.parsers import (
+    TEMPO_PARSER,
+    FilenameParser,
+    ParserRegistry,
+    fields_key,
+    get_batch_indices_by_key,
+)
+
+
+def make_mission_parser(number: int) -> FilenameParser:
+    """A synthetic mission, batched by orbit."""
+    prefix = f"M{number:04d}_"
+    return FilenameParser(
+        name=f"mission-{number}",
+        prefixes=(prefix,),
+        pattern=re.compile(rf".*{prefix}L2_(?P<day>\d{{8}})T\d{{6}}_O(?P<orbit>\d{{6}})\.h5"),
+        key=fields_key("orbit"),
+    )
+
+
+def make_mixed_filenames(parsers: list[FilenameParser], count: int) -> list[str]:
+    """Half TEMPO filenames, and half spread evenly over the synthetic missions."""
+    names = make_tempo_filenames(count // 2)
+    missions = [parser for parser in parsers if parser is not TEMPO_PARSER]
+    for position in range(count - len(names)):
+        parser = missions[position % len(missions)] if missions else TEMPO_PARSER
+        names.append(f"{parser.prefixes[0]}L2_20240801T000000_O{position // 100:06d}.h5")
+    random.Random(0).shuffle(names)
+    return [f"s3://bucket/granules/{name}" for name in names]
+
+
+def sequential_key_function(parsers: list[FilenameParser]):
+    """Try each parser's pattern in turn, as a registry without routing would."""
+
+    def get_key(filename: str):
+        for parser in parsers:
+            key = parser.get_key(filename)
+            if key is not None:
+                return (parser.name, *key)
+        return None
+
+    return get_key
+
+
+def main() -> None:
+    """Run the benchmark and print a table of timings."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, default=100_000)
+    parser.add_argument("--parsers", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--sequential-limit",
+        type=int,
+        default=100,
+        help="skip the sequential baseline above this many parsers",
+    )
+    args = parser.parse_args()
+
+    logging.getLogger("batchee").setLevel(logging.WARNING)
+
+    print(
+        f"{'parsers':>8} {'registry [s]':>13} {'us/name':>8} {'sequential [s]':>15} {'us/name':>8}"
+    )
+    for parser_count in args.parsers:
+        parsers = [TEMPO_PARSER] + [make_mission_parser(i) for i in range(parser_count - 1)]
+        registry = ParserRegistry(parsers)
+        filenames = make_mixed_filenames(parsers, args.names)
+
+        registry_time = time_call(registry.get_batch_indices, filenames, args.repeat)
+        row = f"{parser_count:>8} {registry_time:>13.4f} {1e6 * registry_time / args.names:>8.2f}"
+
+        if parser_count <= args.sequential_limit:
+            sequential = partial(get_batch_indices_by_key, get_key=sequential_key_function(parsers))
+            sequential_time = time_call(sequential, filenames, args.repeat)
+            row += f" {sequential_time:>15.4f} {1e6 * sequential_time / args.names:>8.2f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
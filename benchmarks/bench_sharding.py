@@ -0,0 +1,56 @@
+"""Scaling benchmark for sharded batch assignment across worker processes.
+
+Times the serial `get_batch_indices` and `get_batch_indices_sharded` with 1 to
+N worker processes (by default, up to the number of available CPUs) over
+synthetic TEMPO filenames, and reports the speed-up over the serial path. Each
+sharded run includes starting the worker pool and copying the filenames into
+shared memory.
+
+Usage::
+
+    python benchmarks/bench_sharding.py [--names 1000000 4000000] [--processes 1 2 4 8]
+"""
+
+import logging
+from argparse import ArgumentParser
+from functools import partial
+
+from bench_grouping import time_call
+from synthetic import make_tempo_filenames
+
+from batchee.sharding import get_available_cpus, get_batch_indices_sharded
+from batchee.tempo_filename_parser import get_batch_indices
+
+
+def main() -> None:
+    """Run the benchmark and print a table of timings."""
+    cpus = get_available_cpus()
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument(
+        "--processes",
+        type=int,
+        nargs="+",
+        default=sorted({1, *(2**i for i in range(1, cpus.bit_length())), cpus}),
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("batchee").setLevel(logging.WARNING)
+    print(f"available CPUs: {cpus}")
+    print(f"{'names':>10} {'processes':>9} {'time [s]':>9} {'us/name':>8} {'speed-up':>8}")
+    for count in args.names:
+        filenames = [f"s3://bucket/granules/{name}" for name in make_tempo_filenames(count)]
+        serial = time_call(get_batch_indices, filenames, args.repeat)
+        print(f"{count:>10} {'serial':>9} {serial:>9.3f} {1e6 * serial / count:>8.2f} {1:>8.2f}")
+        for processes in args.processes:
+            sharded = partial(get_batch_indices_sharded, processes=processes)
+            elapsed = time_call(sharded, filenames, args.repeat)
+            print(
+                f"{count:>10} {processes:>9} {elapsed:>9.3f} {1e6 * elapsed / count:>8.2f} "
+                f"{serial / elapsed:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Microbenchmark for the UTC to US/Central day conversion.
+
+Compares the original `strptime` + per-call `ZoneInfo` conversion with the
+memoized `get_day_in_us_central`, over timestamps shaped like a run of TEMPO
+granules (a few granules per scan, many scans per day).
+
+Usage::
+
+    python benchmarks/bench_timezone.py [--count 200000] [--repeat 3]
+"""
+
+import timeit
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from batchee.tempo_filename_parser import (
+    get_day_in_us_central,
+    get_day_in_us_central_for_utc_hour,
+)
+
+
+def strptime_day_in_us_central(day_in_granule: str, time_in_granule: str) -> str:
+    """The conversion as originally written, kept here as the baseline."""
+    dt = datetime.strptime(day_in_granule + time_in_granule, "%Y%m%d%H%M%S")
+    dt = dt.replace(tzinfo=ZoneInfo("UTC"))
+    return dt.astimezone(ZoneInfo("America/Chicago")).strftime("%Y%m%d")
+
+
+def make_timestamps(count: int) -> list[tuple[str, str]]:
+    """Build `count` (day, time) string pairs, 40 seconds apart."""
+    start = datetime(2024, 3, 1, 11, 0, 0)
+    timestamps = []
+    for position in range(count):
+        timestamp = start + timedelta(seconds=40 * position)
+        timestamps.append((timestamp.strftime("%Y%m%d"), timestamp.strftime("%H%M%S")))
+    return timestamps
+
+
+def main() -> None:
+    """Run the benchmark and print the time per conversion."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    timestamps = make_timestamps(args.count)
+
+    def run_baseline():
+        for day, time in timestamps:
+            strptime_day_in_us_central(day, time)
+
+    def run_memoized():
+        get_day_in_us_central_for_utc_hour.cache_clear()
+        for day, time in timestamps:
+            get_day_in_us_central(day, time)
+
+    for label, function in [("strptime baseline", run_baseline), ("memoized", run_memoized)]:
+        best = min(timeit.repeat(function, number=1, repeat=args.repeat))
+        print(f"{label:>18}: {best:8.4f} s total, {1e9 * best / args.count:8.1f} ns/conversion")
+
+
+if __name__ == "__main__":
+    main()
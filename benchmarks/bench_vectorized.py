@@ -0,0 +1,44 @@
+"""Benchmark of the NumPy bulk batch assignment against the scalar path.
+
+Usage::
+
+    python benchmarks/bench_vectorized.py [--max-exponent 6] [--repeat 3]
+"""
+
+import logging
+from argparse import ArgumentParser
+
+import numpy as np
+from bench_grouping import time_call
+from synthetic import make_tempo_filenames
+
+from batchee.tempo_filename_parser import get_batch_indices
+from batchee.vectorized import get_batch_indices_array
+
+
+def main() -> None:
+    """Run the benchmark and print a table of timings."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-exponent", type=int, default=3)
+    parser.add_argument("--max-exponent", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("batchee").setLevel(logging.WARNING)
+
+    print(f"{'n':>9} {'scalar [s]':>11} {'array [s]':>10} {'speedup':>8}")
+    for exponent in range(args.min_exponent, args.max_exponent + 1):
+        count = 10**exponent
+        filenames = make_tempo_filenames(count)
+        names = np.array([f"s3://bucket/prefix/{name}" for name in filenames])
+
+        scalar_time = time_call(get_batch_indices, names.tolist(), args.repeat)
+        array_time = time_call(get_batch_indices_array, names, args.repeat)
+
+        print(
+            f"{count:>9} {scalar_time:>11.4f} {array_time:>10.4f} {scalar_time / array_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
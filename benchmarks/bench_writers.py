@@ -0,0 +1,66 @@
+"""Benchmark of the pystac batch catalog writer against the direct JSON writer.
+
+Usage::
+
+    python benchmarks/bench_writers.py [--items 20000] [--batch-size 10] [--workers 1 8]
+"""
+
+import logging
+import tempfile
+import time
+from argparse import ArgumentParser
+from unittest.mock import MagicMock
+
+from bench_catalog_building import make_input
+
+from batchee.harmony.options import BatcheeOptions
+from batchee.harmony.service_adapter import ConcatBatching
+from batchee.harmony.util import _get_batch_catalog_template, _get_item_url
+from batchee.harmony.writers import _get_orjson, write_batch_catalogs, write_batch_json
+
+
+def main() -> None:
+    """Run the benchmark and print a table of timings."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+
+    catalog, items = make_input(args.items)
+    pairs = [(item, _get_item_url(item)) for item in items]
+    batches = [pairs[i : i + args.batch_size] for i in range(0, len(pairs), args.batch_size)]
+
+    adapter = ConcatBatching.__new__(ConcatBatching)
+    adapter.logger = logging.getLogger("batchee.benchmark")
+    adapter.logger.setLevel(logging.WARNING)
+    adapter.options = BatcheeOptions()
+    adapter.message = MagicMock()
+
+    def pystac_writer(metadata_dir):
+        template = _get_batch_catalog_template(catalog)
+        write_batch_catalogs(
+            (adapter._build_batch_catalog(template, i, b) for i, b in enumerate(batches)),
+            metadata_dir,
+        )
+
+    runs = [("pystac", pystac_writer)]
+    for workers in args.workers:
+        runs.append(
+            (f"json x{workers}", lambda d, w=workers: write_batch_json(catalog, batches, d, w))
+        )
+
+    print(
+        f"{len(items)} items in {len(batches)} batches, orjson {'on' if _get_orjson() else 'off'}"
+    )
+    print(f"{'writer':>10} {'time [s]':>9} {'items/s':>9}")
+    for label, writer in runs:
+        with tempfile.TemporaryDirectory() as metadata_dir:
+            start = time.perf_counter()
+            writer(metadata_dir)
+            elapsed = time.perf_counter() - start
+        print(f"{label:>10} {elapsed:>9.3f} {len(items) / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Report the import time of batchee's entry points, and check what they import.
+
+Each entry point module is imported in a fresh interpreter with
+``python -X importtime``, ``--repeat`` times, and the run with the lowest total
+is reported: the total, and the imports with the largest cumulative times.
+
+The check fails (exit status 1) if an entry point imports a module that its
+code path does not need (e.g. the ``batchee`` CLI importing pystac, or the
+Harmony service importing the sharding and parse cache modules before they are
+enabled), or, with ``--max-ms``, if its import takes longer than that.
+
+Usage::
+
+    python benchmarks/import_time.py [--repeat 5] [--top 15] [--max-ms 1000]
+"""
+
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+#: modules that must not be imported by each entry point module
+UNEXPECTED_IMPORTS = {
+    "batchee.cli": ["pystac", "harmony_service_lib", "batchee.harmony", "sqlite3"],
+    "batchee.harmony.cli": [
+        "batchee.harmony.previous_output",
+        "batchee.parse_cache",
+        "batchee.sharding",
+        "batchee.spill",
+        "batchee.vectorized",
+        "cProfile",
+    ],
+}
+
+
+def import_times(module: str) -> dict[str, int]:
+    """The cumulative import time, in microseconds, of each module imported by
+    importing `module` in a new interpreter (with `module` itself last)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main() -> None:
+    """Report the import time of each entry point, and exit with status 1 if a check fails."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-ms", type=float, help="fail if an entry point takes longer")
+    args = parser.parse_args()
+
+    failures = []
+    for module, unexpected in UNEXPECTED_IMPORTS.items():
+        times = min((import_times(module) for _ in range(args.repeat)), key=lambda t: t[module])
+        total_ms = times[module] / 1000
+        print(f"{module}: {total_ms:.1f} ms, {len(times)} modules")
+        for name, cumulative in sorted(times.items(), key=lambda item: -item[1])[1 : args.top + 1]:
+            print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+        for name in unexpected:
+            if name in times:
+                failures.append(f"{module} imports {name}")
+        if args.max_ms is not None and total_ms > args.max_ms:
+            failures.append(f"{module} takes {total_ms:.1f} ms to import (> {args.max_ms} ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Benchmark suite for batchee, with JSON baselines and a regression check.
+
+Times, and records the peak traced memory of:
+
+* ``get_batch_indices`` over filenames that mix standard and NRT names, with
+  scans that cross UTC midnight,
+* ``_get_netcdf_urls`` over the STAC items of those granules,
+* ``ConcatBatching.process_catalog`` over an in-memory catalog, and
+* a full ``batchee_harmony`` invocation over a paged catalog on disk.
+
+Each case runs at every requested size. Timings are the best of ``--repeat``
+runs; memory is measured with ``tracemalloc`` in one extra run, so tracing does
+not slow down the timed runs. Log output below WARNING is disabled, so that the
+cost of formatting large log messages is not part of the timings.
+
+Results can be saved as a baseline, and later runs compared against it. The
+comparison fails (exit status 1) if any case is slower, or uses more memory,
+than the baseline by more than ``--threshold``. Baselines are only comparable
+on the same machine and Python version, so CI runs the suite for the base branch
+and for the change on the same runner, and compares the two (see
+``.github/workflows/run_tests.yml``).
+
+Usage::
+
+    python benchmarks/suite.py --sizes 1000 100000 --save baseline.json
+    python benchmarks/suite.py --sizes 1000 100000 --baseline baseline.json [--threshold 0.2]
+"""
+
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from collections.abc import Callable
+from datetime import datetime
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from unittest.mock import patch
+
+from harmony_service_lib.message import Message
+from pystac import Item
+from synthetic import make_catalog, make_item_dict, make_tempo_granules, write_paged_catalog
+
+import batchee.harmony.cli
+from batchee.harmony.options import BatcheeOptions
+from batchee.harmony.service_adapter import ConcatBatching
+from batchee.harmony.util import _get_netcdf_urls
+from batchee.tempo_filename_parser import get_batch_indices
+
+# Scans start at 20:00 UTC, so that every day of scans crosses UTC midnight
+START = datetime(2024, 6, 1, 20)
+
+HARMONY_ENV = {
+    "ENV": "dev",
+    "OAUTH_CLIENT_ID": "",
+    "OAUTH_UID": "",
+    "OAUTH_PASSWORD": "",
+    "OAUTH_REDIRECT_URI": "",
+    "STAGING_PATH": "",
+    "STAGING_BUCKET": "",
+    "SHARED_SECRET_KEY": "_BATCHEE_BENCHMARK_SECRET_KEY_32",
+}
+
+HARMONY_MESSAGE = {
+    "sources": [{"collection": "C0-EXAMPLE"}],
+    "format": {"mime": "application/x-netcdf4"},
+    "subset": {},
+    "requestId": "00001111-2222-3333-4444-555566667777",
+    "user": "benchmark",
+    "client": "benchmark",
+    "isSynchronous": False,
+    "stagingLocation": "s3://example-bucket/public/benchmark/",
+    "callback": "http://localhost/some-path",
+    "version": "0.10.0",
+}
+
+# Each case prepares its input (not timed) and returns the function to measure.
+Case = Callable[[int, Path], Callable[[], object]]
+
+
+def case_get_batch_indices(size: int, workdir: Path) -> Callable[[], object]:
+    filenames = [name for name, _ in make_tempo_granules(size, START, nrt=True)]
+    return lambda: get_batch_indices(filenames)
+
+
+def case_get_netcdf_urls(size: int, workdir: Path) -> Callable[[], object]:
+    granules = make_tempo_granules(size, START, nrt=True)
+    items = [Item.from_dict(make_item_dict(i, *granule)) for i, granule in enumerate(granules)]
+    return lambda: _get_netcdf_urls(items)
+
+
+def case_process_catalog(size: int, workdir: Path) -> Callable[[], object]:
+    catalog = make_catalog(make_tempo_granules(size, START, nrt=True))
+    adapter = ConcatBatching(Message(HARMONY_MESSAGE), catalog=catalog, options=BatcheeOptions())
+    return lambda: adapter.process_catalog(catalog)
+
+
+def case_harmony_cli(size: int, workdir: Path) -> Callable[[], object]:
+    source_dir = workdir / "source"
+    source_dir.mkdir()
+    catalog_path = write_paged_catalog(source_dir, make_tempo_granules(size, START, nrt=True))
+    output_dir = workdir / "output"
+
+    argv = [
+        "batchee_harmony",
+        "--harmony-action",
+        "invoke",
+        "--harmony-input",
+        json.dumps(HARMONY_MESSAGE),
+        "--harmony-source",
+        str(catalog_path),
+        "--harmony-metadata-dir",
+        str(output_dir),
+        "--harmony-data-location",
+        output_dir.as_uri(),
+    ]
+
+    def run() -> None:
+        with patch.object(sys, "argv", argv):
+            batchee.harmony.cli.main()
+
+    return run
+
+
+CASES: dict[str, Case] = {
+    "get_batch_indices": case_get_batch_indices,
+    "_get_netcdf_urls": case_get_netcdf_urls,
+    "process_catalog": case_process_catalog,
+    "harmony_cli": case_harmony_cli,
+}
+
+
+def measure(case: Case, size: int, repeat: int) -> dict[str, float]:
+    """Return the best time of `repeat` runs and the peak traced memory of one more run."""
+    with tempfile.TemporaryDirectory() as directory:
+        function = case(size, Path(directory))
+
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print each result against its baseline, and return the names of regressed results."""
+    regressions = []
+    print(f"\n{'case':<28} {'time':>8} {'baseline':>9} {'ratio':>6} {'peak MiB':>9} {'ratio':>6}")
+    for name, result in results.items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            print(f"{name:<28} (no baseline)")
+            continue
+        time_ratio = result["seconds"] / reference["seconds"]
+        memory_ratio = result["peak_bytes"] / max(reference["peak_bytes"], 1)
+        regressed = max(time_ratio, memory_ratio) > 1 + threshold
+        print(
+            f"{name:<28} {result['seconds']:>8.3f} {reference['seconds']:>9.3f} {time_ratio:>6.2f}"
+            f" {result['peak_bytes'] / 2**20:>9.1f} {memory_ratio:>6.2f}"
+            f"{'  REGRESSED' if regressed else ''}"
+        )
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def get_batchee_version() -> str:
+    """The installed version of batchee, or "unknown" when it runs from a source checkout
+    that is not installed."""
+    try:
+        return version("batchee")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def main() -> None:
+    """Run the benchmark suite, then save and/or check the results."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000])
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare the results with this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="allowed slowdown or memory growth against the baseline (default: 0.2, i.e. 20%%)",
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    for name, value in HARMONY_ENV.items():
+        os.environ.setdefault(name, value)
+
+    results = {}
+    print(f"{'case':<28} {'time [s]':>9} {'us/granule':>11} {'peak MiB':>9}")
+    for case_name in args.cases:
+        for size in args.sizes:
+            name = f"{case_name}[{size}]"
+            result = results[name] = measure(CASES[case_name], size, args.repeat)
+            print(
+                f"{name:<28} {result['seconds']:>9.3f} {1e6 * result['seconds'] / size:>11.2f}"
+                f" {result['peak_bytes'] / 2**20:>9.1f}"
+            )
+
+    if args.save:
+        report = {
+            "batchee": get_batchee_version(),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "repeat": args.repeat,
+            "results": results,
+        }
+        args.save.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) past {args.threshold:.0%}: {regressions}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
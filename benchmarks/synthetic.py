@@ -0,0 +1,122 @@
+"""Synthetic TEMPO granule names and STAC catalogs for the benchmarks.
+
+The filenames follow the real TEMPO pattern: 9 granules per scan, 16 scans per
+day, 40 minutes apart. Each scan's time and (optionally) NRT product variant is
+generated deterministically, so results are comparable from run to run.
+"""
+
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pystac import Catalog, Item, Link
+
+GRANULES_PER_SCAN = 9
+SCANS_PER_DAY = 16
+SCAN_MINUTES = 40
+BBOX = [-120.0, 20.0, -60.0, 60.0]
+
+
+def make_tempo_granules(
+    count: int, start: datetime = datetime(2024, 6, 1, 11), nrt: bool = False
+) -> list[tuple[str, datetime]]:
+    """Return `count` pseudo-real TEMPO filenames with their UTC start time.
+
+    The default start keeps each day's scans within one UTC day. Starting later,
+    e.g. at 20:00, makes scans cross UTC midnight, so that the UTC and
+    US/Central days of the same scan differ. With `nrt`, every other scan is
+    named like an NRT granule.
+    """
+    granules = []
+    for position in range(count):
+        scan_number, granule_number = divmod(position, GRANULES_PER_SCAN)
+        day_number, scan_in_day = divmod(scan_number, SCANS_PER_DAY)
+        timestamp = start + timedelta(
+            days=day_number, minutes=SCAN_MINUTES * scan_in_day + granule_number
+        )
+        product = "NO2_L2_NRT" if nrt and scan_number % 2 else "NO2_L2"
+        granules.append(
+            (
+                f"TEMPO_{product}_V03_{timestamp:%Y%m%dT%H%M%S}Z_"
+                f"S{scan_in_day + 1:03d}G{granule_number + 1:02d}.nc",
+                timestamp,
+            )
+        )
+    return granules
+
+
+def make_tempo_filenames(count: int, **kwargs) -> list[str]:
+    """Return `count` pseudo-real TEMPO filenames, see `make_tempo_granules`."""
+    return [name for name, _ in make_tempo_granules(count, **kwargs)]
+
+
+def make_item_dict(position: int, name: str, timestamp: datetime) -> dict:
+    """A STAC item for one granule, as found in a Harmony input catalog."""
+    return {
+        "stac_version": "1.0.0",
+        "stac_extensions": [],
+        "id": f"item-{position}",
+        "type": "Feature",
+        "links": [],
+        "properties": {
+            "start_datetime": f"{timestamp:%Y-%m-%dT%H:%M:%S}Z",
+            "end_datetime": f"{timestamp + timedelta(minutes=1):%Y-%m-%dT%H:%M:%S}Z",
+        },
+        "bbox": BBOX,
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[-120, 20], [-120, 60], [-60, 60], [-60, 20], [-120, 20]]],
+        },
+        "assets": {
+            "data": {
+                "href": f"s3://bucket/granules/{name}",
+                "title": name,
+                "type": "application/x-netcdf4",
+                "roles": ["data"],
+            }
+        },
+    }
+
+
+def make_catalog(granules: list[tuple[str, datetime]]) -> Catalog:
+    """Build an in-memory input catalog holding one item per granule."""
+    catalog = Catalog("input", "synthetic input catalog")
+    catalog.add_link(Link("harmony_source", "https://cmr.example/search/concepts/C0-EXAMPLE"))
+    catalog.add_items(
+        Item.from_dict(make_item_dict(position, name, timestamp))
+        for position, (name, timestamp) in enumerate(granules)
+    )
+    return catalog
+
+
+def write_paged_catalog(
+    directory: Path, filenames: list[str] | list[tuple[str, datetime]], page_size: int = 1000
+) -> Path:
+    """Write one STAC item file per granule and a chain of catalog pages that link to them.
+
+    Returns the path of the first page, catalog0.json.
+    """
+    granules = [
+        entry if isinstance(entry, tuple) else (entry, datetime(2024, 6, 1, 12))
+        for entry in filenames
+    ]
+    page_count = (len(granules) + page_size - 1) // page_size
+    for page in range(page_count):
+        links = []
+        for position in range(page * page_size, min(len(granules), (page + 1) * page_size)):
+            item = make_item_dict(position, *granules[position])
+            directory.joinpath(f"item-{position}.json").write_text(json.dumps(item))
+            links.append(
+                {"rel": "item", "href": f"./item-{position}.json", "type": "application/json"}
+            )
+        if page + 1 < page_count:
+            links.append({"rel": "next", "href": str(directory / f"catalog{page + 1}.json")})
+        page_catalog = {
+            "stac_version": "1.0.0",
+            "type": "Catalog",
+            "id": f"page-{page}",
+            "description": "synthetic paged catalog",
+            "links": links,
+        }
+        directory.joinpath(f"catalog{page}.json").write_text(json.dumps(page_catalog))
+    return directory / "catalog0.json"
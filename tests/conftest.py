@@ -21,3 +21,13 @@ def pass_options(request):
 @pytest.fixture(scope="function", autouse=True)
 def temp_output_dir(tmpdir_factory) -> Path:
     return Path(tmpdir_factory.mktemp("tmp-"))
+
+
+@pytest.fixture
+def harmony_env(monkeypatch):
+    """Sets the environment harmony-service-lib needs to read catalogs and messages."""
+    for name in ("OAUTH_CLIENT_ID", "OAUTH_UID", "OAUTH_PASSWORD", "OAUTH_REDIRECT_URI"):
+        monkeypatch.setenv(name, "")
+    monkeypatch.setenv("ENV", "dev")
+    monkeypatch.setenv("STAGING_PATH", "")
+    monkeypatch.setenv("STAGING_BUCKET", "")
@@ -0,0 +1,90 @@
+import io
+import json
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from batchee.cli import main
+from tests.test_filename_grouping import example_filenames, example_nrt_filenames
+
+expected_batches = [example_filenames[0:3], example_filenames[3:6], example_filenames[6:9]]
+
+
+def test_json_output_from_arguments_and_file(tmp_path, capsys):
+    list_file = tmp_path / "filenames.txt"
+    list_file.write_text("\n".join(example_filenames[4:]) + "\n\n")
+
+    assert main(["-o", "json", "-f", str(list_file), *example_filenames[:4]]) is None
+
+    assert json.loads(capsys.readouterr().out) == expected_batches
+
+
+def test_ndjson_output_from_stdin(capsys):
+    stdin = io.StringIO("\n".join(example_filenames + example_nrt_filenames))
+
+    with patch.object(sys, "stdin", stdin):
+        main(["--output", "ndjson", "--from-file", "-", "--sort"])
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["batch"] for line in lines] == list(range(6))
+    # Sorted across batches, through runs spilled to disk
+    stdin = io.StringIO("\n".join(reversed(example_filenames + example_nrt_filenames)))
+    with patch.object(sys, "stdin", stdin), patch("batchee.cli.SORT_MEMORY", 1):
+        main(["-o", "ndjson", "-f", "-", "--sort", "--open-batches", "10"])
+    reversed_lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["filenames"] for line in reversed_lines] == [line["filenames"] for line in lines]
+    assert [line["batch"] for line in reversed_lines] == list(range(6))[::-1]
+    assert [line["filenames"] for line in lines[:3]] == expected_batches
+    assert lines[3]["missing_granules"] == [
+        "20250711_S010G01",
+        "20250711_S010G02",
+        "20250711_S010G03",
+        "20250711_S010G07",
+    ]
+
+
+def test_csv_output(capsys):
+    main(["-o", "csv", "not-a-granule.nc", *example_filenames])
+
+    rows = capsys.readouterr().out.splitlines()
+    assert rows[0] == "filename,batch"
+    assert rows[1] == "not-a-granule.nc,"
+    assert rows[2:] == [f"{name},{i // 3}" for i, name in enumerate(example_filenames)]
+
+
+def test_unmatched_policies(capsys):
+    filenames = [example_filenames[0], "not-a-granule.nc", *example_filenames[1:]]
+
+    main(["-o", "csv", "-u", "batch", *filenames])
+    rows = capsys.readouterr().out.splitlines()
+    assert rows[1:4] == [f"{filenames[0]},0", "not-a-granule.nc,1", f"{filenames[2]},0"]
+
+    assert main(["-u", "batch", *filenames]) == [
+        example_filenames[0:3],
+        ["not-a-granule.nc"],
+        example_filenames[3:6],
+        example_filenames[6:9],
+    ]
+    assert main(["-u", "batch", "--sort", *filenames])[-1] == ["not-a-granule.nc"]
+
+    capsys.readouterr()
+    for output in ("json", "csv", "ndjson"):
+        with pytest.raises(SystemExit):
+            main(["-o", output, "-u", "error", *filenames])
+        assert "does not match its pattern: not-a-granule.nc" in capsys.readouterr().err
+
+
+def test_json_output_by_default(capsys):
+    assert main(example_filenames) == expected_batches
+
+    assert json.loads(capsys.readouterr().out) == expected_batches
+
+
+def test_invalid_arguments():
+    with pytest.raises(SystemExit):
+        main([])
+    with pytest.raises(SystemExit):
+        main(["-o", "csv", "--sort", *example_filenames])
+    with pytest.raises(SystemExit):
+        main(["-o", "ndjson", "-u", "batch", *example_filenames])
@@ -1,8 +1,22 @@
 import sys
+from datetime import datetime, timedelta
 from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+import pytest
 
 import batchee.tempo_filename_parser
-from batchee.tempo_filename_parser import get_batch_indices, get_day_in_us_central
+from batchee.granule_table import GranuleTable
+from batchee.parse_cache import parse_granule
+from batchee.parsers import TEMPO_PARSER
+from batchee.tempo_filename_parser import (
+    find_duplicate_granules,
+    get_batch_indices,
+    get_day_and_scan,
+    get_day_in_us_central,
+    get_day_in_us_central_for_utc_hour,
+    get_granule_identity,
+)
 
 example_filenames = [
     "TEMPO_NO2_L2_V03_20240731T235252Z_S016G04.nc",
@@ -45,6 +59,61 @@ def test_timezone_conversion():
     ]
 
 
+def _reference_day_in_us_central(day_in_granule: str, time_in_granule: str) -> str:
+    dt = datetime.strptime(day_in_granule + time_in_granule, "%Y%m%d%H%M%S")
+    dt = dt.replace(tzinfo=ZoneInfo("UTC"))
+    return dt.astimezone(ZoneInfo("America/Chicago")).strftime("%Y%m%d")
+
+
+def test_memoized_timezone_conversion_matches_reference():
+    # Every hour, at a varying minute and second, over several years
+    timestamp = datetime(2022, 1, 1, 0, 0, 0)
+    while timestamp < datetime(2027, 1, 1):
+        day, time = timestamp.strftime("%Y%m%d"), timestamp.strftime("%H%M%S")
+        assert get_day_in_us_central(day, time) == _reference_day_in_us_central(day, time)
+        timestamp += timedelta(hours=1, minutes=7, seconds=13)
+
+
+def test_memoized_timezone_conversion_at_dst_boundaries():
+    # Each minute around the 2024 transitions, i.e. 2024-03-10 08:00Z and 2024-11-03 07:00Z,
+    # and around the local midnights that follow them
+    for start in ["20240310T040000", "20240310T070000", "20241103T040000", "20241103T060000"]:
+        timestamp = datetime.strptime(start, "%Y%m%dT%H%M%S")
+        for _ in range(3 * 60):
+            day, time = timestamp.strftime("%Y%m%d"), timestamp.strftime("%H%M%S")
+            assert get_day_in_us_central(day, time) == _reference_day_in_us_central(day, time)
+            timestamp += timedelta(minutes=1, seconds=1)
+
+    assert get_day_in_us_central_for_utc_hour("20240310", "05") == "20240309"
+    assert get_day_in_us_central_for_utc_hour("20240310", "06") == "20240310"
+    assert get_day_in_us_central_for_utc_hour("20241103", "04") == "20241102"
+    assert get_day_in_us_central_for_utc_hour("20241103", "05") == "20241103"
+    assert get_day_in_us_central_for_utc_hour("20241104", "05") == "20241103"
+    assert get_day_in_us_central_for_utc_hour("20241104", "06") == "20241104"
+
+
+@pytest.mark.parametrize("time", ["127500", "120062", "240000"])
+def test_invalid_times_are_rejected_despite_memoization(time):
+    # The hour is converted (and memoized) first, from a valid time
+    assert get_day_in_us_central("20240601", "120000") == "20240601"
+    filename = f"TEMPO_NO2_L2_V03_20240601T{time}Z_S012G01.nc"
+
+    with pytest.raises(ValueError):
+        get_day_in_us_central("20240601", time)
+    with pytest.raises(ValueError):
+        get_day_and_scan(filename)
+    with pytest.raises(ValueError):
+        GranuleTable.from_urls([example_filenames[0], filename])
+    with pytest.raises(ValueError):
+        TEMPO_PARSER.get_key(filename)
+    with pytest.raises(ValueError):
+        parse_granule(filename)
+
+
+def test_timezone_conversion_with_other_assumed_timezone():
+    assert get_day_in_us_central("20240801", "033000", ZoneInfo("Asia/Tokyo")) == "20240731"
+
+
 def test_grouping():
     results = get_batch_indices(example_filenames)
 
@@ -65,3 +134,27 @@ def test_main_cli():
         grouped_names = batchee.tempo_filename_parser.main()
 
     assert grouped_names == [example_filenames[0:3], example_filenames[3:6], example_filenames[6:9]]
+
+
+def test_main_cli_sorted():
+    test_args = [batchee.tempo_filename_parser.__file__, "--sort"]
+    test_args.extend(reversed(example_filenames))
+
+    with patch.object(sys, "argv", test_args):
+        grouped_names = batchee.tempo_filename_parser.main()
+
+    assert grouped_names == [example_filenames[0:3], example_filenames[3:6], example_filenames[6:9]]
+
+
+def test_duplicate_granules():
+    v02 = example_filenames[1].replace("_V03_", "_V02_")
+    nrt = example_filenames[1].replace("_L2_", "_L2_NRT_")
+    filenames = [v02, *example_filenames, f"s3://other/{example_filenames[4]}", nrt, "a.nc", "a.nc"]
+
+    assert get_granule_identity(v02) == (("NO2", "L2", False, "20240731", "S016", "G05"), 2)
+    assert get_granule_identity(nrt)[0][2] is True
+    assert get_granule_identity("a.nc") is None
+
+    # The V03 copy replaces the earlier V02 one; the NRT granule is a different granule
+    assert find_duplicate_granules(filenames) == [0, 10, 13]
+    assert find_duplicate_granules(filenames, keep="first") == [2, 10, 13]
@@ -0,0 +1,73 @@
+from batchee.granule_table import GranuleTable
+from batchee.grouping import group_by_batch_indices
+from batchee.tempo_filename_parser import get_batch_indices
+from tests.test_filename_grouping import example_filenames, example_nrt_filenames
+
+filenames = [
+    f"s3://bucket/{name}"
+    for name in example_filenames[:5] + example_nrt_filenames + example_filenames[5:]
+]
+
+
+def test_columns():
+    table = GranuleTable.from_urls([*filenames, "s3://bucket/not-a-granule.nc"])
+
+    assert len(table) == len(filenames) + 1
+    assert table.url(0) == filenames[0]
+    assert table.urls() == [*filenames, "s3://bucket/not-a-granule.nc"]
+    assert table.product_names == ["NO2"]
+    assert table.level_names == ["L2"]
+    assert table.version_names == ["V03", "NRT_V02"]
+    assert list(table.versions) == [1] * 5 + [2] * 9 + [1] * 4 + [0]
+    assert list(table.days[:2]) == [20240731, 20240731]
+    assert (table.scans[0], table.granules[0]) == (16, 4)
+    assert list(table.matched()) == list(range(len(filenames)))
+
+
+def test_batch_indices():
+    table = GranuleTable.from_urls(filenames)
+
+    assert get_batch_indices(table) == get_batch_indices(filenames)
+    assert [table.urls(rows) for rows in table.group_positions()] == group_by_batch_indices(
+        get_batch_indices(filenames), filenames
+    )
+
+
+def test_sorting_and_slicing():
+    table = GranuleTable.from_urls([*filenames, "not-a-granule.nc"])
+
+    order = table.argsort()
+    assert order[-1] == len(filenames)
+    assert table.urls(order[:-1]) == sorted(filenames, key=lambda url: url.split("_")[-2:])
+
+    part = table[5:9]
+    assert part.urls() == filenames[5:9]
+    assert list(part.days) == list(table.days[5:9])
+    assert part.version_names is table.version_names
+
+
+def test_sorted_batches_and_missing_granules():
+    table = GranuleTable.from_urls(filenames[::-1])
+    sorted_batches = [[0, 1, 2], [3, 4, 14], [15, 16, 17], [5, 6, 7, 8], [9, 10], [11, 12, 13]]
+
+    batches = table.group_positions(sort=True)
+    assert [table.urls(rows) for rows in batches] == [
+        [filenames[i] for i in batch] for batch in sorted_batches
+    ]
+    batch_of = {i: index for index, batch in enumerate(sorted_batches) for i in batch}
+    assert table.batch_indices(sort=True) == [batch_of[i] for i in reversed(range(18))]
+
+    assert table.missing_granules(batches[0]) == [
+        "20240731_S016G01",
+        "20240731_S016G02",
+        "20240731_S016G03",
+    ]
+    assert table.missing_granules([*batches[3], *batches[4]]) == [
+        "20250711_S010G01",
+        "20250711_S010G02",
+        "20250711_S010G03",
+        "20250711_S010G07",
+        "20250711_S016G01",
+        "20250711_S016G02",
+        "20250711_S016G04",
+    ]
@@ -0,0 +1,141 @@
+import pytest
+
+from batchee.grouping import (
+    DROPPED,
+    BatchNumbering,
+    assign_batches,
+    assign_sorted_batches,
+    balance_batches,
+    find_duplicates,
+    get_first_seen_indices,
+    group_by_batch_indices,
+    group_by_first_appearance,
+    sort_batches,
+    split_batch,
+)
+
+
+def test_first_seen_indices():
+    keys = [("b", 1), ("b", 1), ("a", 2), ("b", 1), ("c", 0), ("a", 2)]
+
+    assert get_first_seen_indices(keys) == [0, 0, 1, 0, 2, 1]
+
+
+def test_first_seen_indices_empty():
+    assert get_first_seen_indices([]) == []
+
+
+def test_group_by_batch_indices_interleaved():
+    values = ["v0", "v1", "v2", "v3", "v4", "v5"]
+
+    grouped = group_by_batch_indices([0, 1, 0, 2, 1, 0], values)
+
+    assert grouped == [["v0", "v2", "v5"], ["v1", "v4"], ["v3"]]
+
+
+def test_group_by_first_appearance():
+    batch_indices = [2, DROPPED, 0, 2, 1]
+
+    assert group_by_first_appearance(batch_indices, "vwxyz") == [["v", "y"], ["x"], ["z"]]
+    assert group_by_batch_indices(batch_indices, "vwxyz") == [["x"], ["z"], ["v", "y"]]
+
+
+def test_assign_batches_unmatched_policies():
+    keys = [("a", 1), None, ("b", 2), ("a", 1), None]
+
+    dropped = assign_batches(keys)
+    assert dropped.indices == [0, DROPPED, 1, 0, DROPPED]
+    assert dropped.rejected == [1, 4]
+    assert dropped.matched_indices() == [0, 1, 0]
+    assert group_by_batch_indices(dropped.indices, "vwxyz") == [["v", "y"], ["x"]]
+
+    batched = assign_batches(keys, unmatched="batch")
+    assert batched.indices == [0, 1, 2, 0, 3]
+    assert batched.rejected == [1, 4]
+
+    with pytest.raises(ValueError, match="not-a-granule.nc"):
+        assign_batches(keys, unmatched="error", names=["a.nc", "not-a-granule.nc"])
+    with pytest.raises(ValueError):
+        assign_batches(keys, unmatched="skip")
+
+
+def test_assign_sorted_batches_numbers_keys_in_order():
+    keys = [("b", 1), None, ("a", 2), ("b", 1), None]
+
+    dropped = assign_sorted_batches(keys)
+    assert dropped.indices == [1, DROPPED, 0, 1, DROPPED]
+    assert dropped.rejected == [1, 4]
+
+    # Batches of unmatched entries come last, in input order
+    assert assign_sorted_batches(keys, unmatched="batch") == ([1, 2, 0, 1, 3], [1, 4])
+
+    with pytest.raises(ValueError, match="first.nc"):
+        assign_sorted_batches(keys, "error", ["b.nc", "first.nc", "a.nc", "b.nc", "last.nc"])
+
+
+def test_batch_numbering_across_chunks():
+    keys = [("a", 1), None, ("b", 2), ("a", 1), None, ("c", 3)]
+    numbering = BatchNumbering("batch")
+
+    first, second = numbering.assign(keys[:3]), numbering.assign(keys[3:])
+
+    assert first.indices + second.indices == assign_batches(keys, "batch").indices
+    assert (first.rejected, second.rejected) == ([1], [1])
+    assert numbering.batch_count == 5
+    with pytest.raises(ValueError, match="at position 1"):
+        BatchNumbering("error").assign(keys)
+
+
+def test_find_duplicates():
+    identities = [("a", 1), ("b", 1), None, ("a", 3), ("a", 2), None, ("b", 1)]
+
+    assert find_duplicates(identities) == [0, 4, 6]
+    assert find_duplicates(identities, keep="first") == [3, 4, 6]
+    with pytest.raises(ValueError):
+        find_duplicates(identities, keep="last")
+
+
+def test_split_batch_balances_pieces():
+    assert split_batch(list(range(10)), [0] * 10, max_count=9) == [
+        [0, 1, 2, 3, 4],
+        [5, 6, 7, 8, 9],
+    ]
+    assert split_batch(list("abcdef"), [5, 1, 1, 1, 1, 5], max_size=8) == [
+        ["a", "b", "c"],
+        ["d", "e", "f"],
+    ]
+
+
+def test_split_batch_keeps_oversized_entries_alone():
+    assert split_batch(list("abc"), [20, 1, 1], max_size=8) == [["a"], ["b", "c"]]
+    assert split_batch(list("abc"), [1, 1, 1], max_size=8) == [["a", "b", "c"]]
+
+
+def test_balance_batches_merges_only_when_asked():
+    batches = [[1, 2], [3], [4, 5, 6, 7, 8]]
+
+    assert list(balance_batches(batches, max_count=3)) == [[1, 2], [3], [4, 5, 6], [7, 8]]
+    assert list(balance_batches(batches, max_count=3, merge=True)) == [
+        [1, 2, 3],
+        [4, 5, 6],
+        [7, 8],
+    ]
+    assert list(balance_batches(batches, lambda entry: 1, max_size=1)) == [
+        [1],
+        [2],
+        [3],
+        [4],
+        [5],
+        [6],
+        [7],
+        [8],
+    ]
+
+
+def test_sort_batches():
+    batches = [[(2, "b"), (1, "c")], [(1, "a"), (1, "b")]]
+
+    assert sort_batches(batches, lambda entry: entry) == [
+        [(1, "a"), (1, "b")],
+        [(1, "c"), (2, "b")],
+    ]
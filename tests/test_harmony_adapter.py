@@ -1,13 +1,29 @@
 import json
+import pstats
+import random
+import re
 import sys
+from dataclasses import replace
 from os import environ
 from pathlib import Path
 from unittest.mock import patch
 from urllib.parse import urlsplit
 
+import pystac
 import pytest
+from harmony_service_lib.message import Message
+from pystac import Catalog, Item
 
 import batchee.harmony.cli
+from batchee.harmony import service_adapter
+from batchee.harmony.options import BatcheeOptions
+from batchee.harmony.service_adapter import ConcatBatching
+from batchee.harmony.util import (
+    _get_batch_catalog_template,
+    _get_item_date_range,
+    _iter_catalog_items,
+)
+from batchee.parsers import TEMPO_PARSER, FilenameParser, ParserRegistry, fields_key
 
 
 @pytest.mark.usefixtures("pass_options")
@@ -16,7 +32,43 @@ class TestBatching:
     __data_path = __test_path.joinpath("data")
     __harmony_path = __data_path.joinpath("harmony")
 
-    def test_service_invoke(self, temp_output_dir):
+    @pytest.mark.parametrize(
+        "batchee_env",
+        [
+            {},
+            {"BATCHEE_STREAMING": "true"},
+            {"BATCHEE_READ_CONCURRENCY": "4"},
+            {"BATCHEE_FAST_WRITER": "true"},
+            {"BATCHEE_STREAMING": "true", "BATCHEE_FAST_WRITER": "true"},
+            {"BATCHEE_FAST_WRITER": "true", "BATCHEE_WRITE_CONCURRENCY": "4"},
+            {"BATCHEE_SHARD_THRESHOLD": "1", "BATCHEE_SHARD_PROCESSES": "2"},
+            {"BATCHEE_FAST_READER": "true", "BATCHEE_READ_CONCURRENCY": "4"},
+            {
+                "BATCHEE_FAST_READER": "true",
+                "BATCHEE_FAST_WRITER": "true",
+                "BATCHEE_STREAMING": "true",
+            },
+            {"BATCHEE_GROUPING_MEMORY": "1"},
+            {"BATCHEE_GROUPING_MEMORY": "1", "BATCHEE_FAST_WRITER": "true"},
+            # The output of the first catalog is the previous output of the second
+            {"BATCHEE_PREVIOUS_OUTPUT": "{temp_output_dir}"},
+        ],
+        ids=[
+            "default",
+            "streaming",
+            "read",
+            "fast",
+            "streaming-fast",
+            "fast-write",
+            "sharded",
+            "fast-read",
+            "streaming-fast-read",
+            "spilled",
+            "spilled-fast",
+            "incremental",
+        ],
+    )
+    def test_service_invoke(self, temp_output_dir, batchee_env):
         in_message_path = self.__harmony_path.joinpath("message.json")
         in_message_data = in_message_path.read_text()
 
@@ -46,6 +98,10 @@ class TestBatching:
                 "OAUTH_REDIRECT_URI": "",
                 "STAGING_PATH": "",
                 "STAGING_BUCKET": "",
+                **{
+                    name: value.format(temp_output_dir=temp_output_dir)
+                    for name, value in batchee_env.items()
+                },
             }
 
             with patch.object(sys, "argv", test_args), patch.dict(environ, test_env):
@@ -98,3 +154,350 @@ class TestBatching:
             }
 
             assert batched_files == files_dict
+
+    @pytest.mark.parametrize(
+        "batchee_env",
+        [{}, {"BATCHEE_PROFILE": "cprofile"}, {"BATCHEE_STREAMING": "true"}],
+        ids=["harmony", "profiled", "streaming"],
+    )
+    def test_empty_input_writes_one_empty_catalog(self, temp_output_dir, batchee_env):
+        in_catalog_path = temp_output_dir / "source" / "catalog.json"
+        Catalog("empty", "An input catalog without items").normalize_and_save(
+            str(in_catalog_path.parent), pystac.CatalogType.SELF_CONTAINED
+        )
+        metadata_dir = temp_output_dir / "metadata"
+        test_args = [
+            batchee.harmony.cli.__file__,
+            "--harmony-action",
+            "invoke",
+            "--harmony-input",
+            self.__harmony_path.joinpath("message.json").read_text(),
+            "--harmony-source",
+            str(in_catalog_path),
+            "--harmony-metadata-dir",
+            str(metadata_dir),
+            "--harmony-data-location",
+            temp_output_dir.as_uri(),
+        ]
+        test_env = {"ENV": "dev", **batchee_env}
+
+        with (
+            patch.object(sys, "argv", test_args),
+            patch.dict(environ, test_env),
+            patch.object(
+                batchee.harmony.cli.harmony_service_lib,
+                "run_cli",
+                wraps=batchee.harmony.cli.harmony_service_lib.run_cli,
+            ) as harmony_run_cli,
+        ):
+            batchee.harmony.cli.main()
+
+        # harmony-service-lib invokes the adapter unless an option needs batchee's invocation
+        assert harmony_run_cli.called == (not batchee_env)
+        output_files = {path.name for path in metadata_dir.iterdir() if path.is_file()}
+        assert output_files == {"catalog.json", "message.json"}
+        assert "item" not in {
+            link["rel"] for link in json.loads((metadata_dir / "catalog.json").read_text())["links"]
+        }
+
+    def test_worker_invokes_each_request(self, temp_output_dir):
+        in_message_data = json.loads(self.__harmony_path.joinpath("message.json").read_text())
+        requests = [
+            {
+                "harmony_input": in_message_data,
+                "harmony_sources": str(self.__harmony_path.joinpath("source", catalog_name)),
+                "harmony_metadata_dir": str(temp_output_dir.joinpath(f"out-{catalog_name[:-5]}")),
+                "harmony_data_location": temp_output_dir.as_uri(),
+            }
+            for catalog_name in ["catalog.json", "catalog0.json"]
+        ]
+        requests_path = temp_output_dir.joinpath("requests.ndjson")
+        requests_path.write_text(
+            "\n".join(
+                [json.dumps(requests[0]), "", '{"harmony_sources": "x"}', json.dumps(requests[1])]
+            )
+        )
+
+        test_args = [batchee.harmony.cli.__file__, "--batchee-worker", str(requests_path)]
+        test_env = {
+            "ENV": "dev",
+            "OAUTH_CLIENT_ID": "",
+            "OAUTH_UID": "",
+            "OAUTH_PASSWORD": "",
+            "OAUTH_REDIRECT_URI": "",
+            "STAGING_PATH": "",
+            "STAGING_BUCKET": "",
+        }
+        # The request without a message fails, without stopping the others
+        with (
+            patch.object(sys, "argv", test_args),
+            patch.dict(environ, test_env),
+            pytest.raises(SystemExit, match="1"),
+        ):
+            batchee.harmony.cli.main()
+
+        for request in requests:
+            metadata_dir = Path(request["harmony_metadata_dir"])
+            assert len(json.loads(metadata_dir.joinpath("batch-catalogs.json").read_text())) == 3
+
+    def test_streaming_yields_each_batch_when_its_scan_is_complete(self):
+        in_message = Message(json.loads(self.__harmony_path.joinpath("message.json").read_text()))
+        in_catalog = Catalog.from_file(str(self.__harmony_path.joinpath("source", "catalog.json")))
+        adapter = ConcatBatching(in_message, catalog=in_catalog, options=BatcheeOptions())
+
+        items_read = []
+
+        def recording_reader(catalog, **kwargs):
+            for item in _iter_catalog_items(catalog, **kwargs):
+                items_read.append(item)
+                yield item
+
+        with patch("batchee.harmony.service_adapter._iter_catalog_items", recording_reader):
+            batches = adapter.iter_batch_catalogs(in_catalog)
+
+            # The first scan is complete once the first granule of the second scan is read
+            first_batch = next(batches)
+            assert len(items_read) == 3
+            assert len(list(first_batch.get_items())) == 2
+
+            assert [len(list(batch.get_items())) for batch in batches] == [2, 2]
+            assert len(items_read) == 6
+
+    def test_filename_parser_is_picked_from_message_collection(self, monkeypatch):
+        message_data = json.loads(self.__harmony_path.joinpath("message.json").read_text())
+
+        # A registry of a single parser resolves to that parser
+        adapter = ConcatBatching(Message(message_data), options=BatcheeOptions())
+        assert adapter.filename_parser is TEMPO_PARSER
+
+        other_parser = FilenameParser("other", ("OTHER_",), re.compile("OTHER_"), fields_key())
+        registry = ParserRegistry([TEMPO_PARSER, other_parser])
+        monkeypatch.setattr(service_adapter, "default_registry", registry)
+
+        # Unregistered collection: granules are routed to a parser by their filenames
+        adapter = ConcatBatching(Message(message_data), options=BatcheeOptions())
+        assert adapter.filename_parser is registry
+
+        message_data["sources"][0]["shortName"] = "TEMPO_NO2_L2"
+        adapter = ConcatBatching(Message(message_data), options=BatcheeOptions())
+
+        assert adapter.filename_parser is TEMPO_PARSER
+
+    @pytest.mark.parametrize("streaming", [False, True], ids=["grouped", "streaming"])
+    def test_batches_are_split_and_merged_by_size(self, streaming):
+        in_message = Message(json.loads(self.__harmony_path.joinpath("message.json").read_text()))
+        in_catalog = Catalog.from_file(str(self.__harmony_path.joinpath("source", "catalog.json")))
+
+        def get_scans(options):
+            adapter = ConcatBatching(in_message, catalog=in_catalog, options=options)
+            batches = adapter.iter_batches if streaming else adapter.group_batches
+            return [[url[-10:-3] for _, url in batch] for batch in batches(in_catalog)]
+
+        assert get_scans(BatcheeOptions(max_batch_granules=1)) == [
+            ["S012G01"],
+            ["S012G02"],
+            ["S013G01"],
+            ["S013G02"],
+            ["S014G01"],
+            ["S014G02"],
+        ]
+        assert get_scans(BatcheeOptions(max_batch_granules=4, merge_small_batches=True)) == [
+            ["S012G01", "S012G02", "S013G01", "S013G02"],
+            ["S014G01", "S014G02"],
+        ]
+
+    @pytest.mark.parametrize("streaming", [False, True], ids=["grouped", "streaming"])
+    def test_batches_are_sorted_with_missing_granules(self, streaming):
+        in_message = Message(json.loads(self.__harmony_path.joinpath("message.json").read_text()))
+        in_catalog = Catalog.from_file(str(self.__harmony_path.joinpath("source", "catalog.json")))
+        # Reverse the order of the input items (or, when streaming, of the items of each scan)
+        item_links = in_catalog.get_links("item")
+        in_catalog.links = [link for link in in_catalog.links if link.rel != "item"]
+        if streaming:
+            in_catalog.links.extend(item_links[i ^ 1] for i in range(len(item_links)))
+        else:
+            in_catalog.links.extend(reversed(item_links))
+
+        options = BatcheeOptions(sort_batches=True)
+        adapter = ConcatBatching(in_message, catalog=in_catalog, options=options)
+        batches = list((adapter.iter_batches if streaming else adapter.group_batches)(in_catalog))
+
+        assert [[url[-10:-3] for _, url in batch] for batch in batches] == [
+            ["S012G01", "S012G02"],
+            ["S013G01", "S013G02"],
+            ["S014G01", "S014G02"],
+        ]
+
+        catalog = adapter._build_batch_catalog(
+            _get_batch_catalog_template(in_catalog), 0, batches[0][1:]
+        )
+        assert catalog.extra_fields["batchee:missing_granules"] == ["20240601_S012G01"]
+
+    @pytest.mark.parametrize("streaming", [False, True], ids=["grouped", "streaming"])
+    def test_unmatched_granules_keep_items_aligned(self, streaming):
+        in_message = Message(json.loads(self.__harmony_path.joinpath("message.json").read_text()))
+        in_catalog = Catalog.from_file(str(self.__harmony_path.joinpath("source", "catalog.json")))
+
+        def renaming_reader(catalog, **kwargs):
+            for item in _iter_catalog_items(catalog, **kwargs):
+                if item.assets["data"].href.endswith("S013G01.nc"):
+                    item.assets["data"].href = "s3://bucket/not-a-granule.nc"
+                yield item
+
+        def get_scans(unmatched):
+            options = BatcheeOptions(unmatched_granules=unmatched)
+            adapter = ConcatBatching(in_message, catalog=in_catalog, options=options)
+            batches = adapter.iter_batches if streaming else adapter.group_batches
+            with patch("batchee.harmony.service_adapter._iter_catalog_items", renaming_reader):
+                batches = list(batches(in_catalog))
+            for batch in batches:
+                for item, url in batch:
+                    assert item.assets["data"].href == url
+            return [[url[-10:-3] for _, url in batch] for batch in batches]
+
+        assert get_scans("drop") == [["S012G01", "S012G02"], ["S013G02"], ["S014G01", "S014G02"]]
+        assert sorted(get_scans("batch")) == [
+            ["S012G01", "S012G02"],
+            ["S013G02"],
+            ["S014G01", "S014G02"],
+            ["granule"],
+        ]
+        with pytest.raises(ValueError, match="not-a-granule.nc"):
+            get_scans("error")
+
+    @pytest.mark.parametrize("streaming", [False, True], ids=["grouped", "streaming"])
+    def test_duplicate_granules_are_dropped(self, streaming):
+        in_message = Message(json.loads(self.__harmony_path.joinpath("message.json").read_text()))
+        in_catalog = Catalog.from_file(str(self.__harmony_path.joinpath("source", "catalog.json")))
+
+        def duplicating_reader(catalog, **kwargs):
+            for item in _iter_catalog_items(catalog, **kwargs):
+                href = item.assets["data"].href
+                if href.endswith("S013G01.nc"):
+                    # An older version of the granule, listed first
+                    older = item.clone()
+                    older.assets["data"].href = href.replace("_V03_", "_V02_")
+                    yield older
+                yield item
+                if href.endswith("S014G02.nc"):
+                    # The same granule again, e.g. from overlapping pages
+                    yield item
+
+        def get_granules(keep):
+            options = BatcheeOptions(deduplicate_granules=keep)
+            adapter = ConcatBatching(in_message, catalog=in_catalog, options=options)
+            batches = adapter.iter_batches if streaming else adapter.group_batches
+            with patch("batchee.harmony.service_adapter._iter_catalog_items", duplicating_reader):
+                batches = list(batches(in_catalog))
+            return [[f"{url[-31:-28]}_{url[-10:-3]}" for _, url in batch] for batch in batches]
+
+        assert get_granules("")[1:] == [
+            ["V02_S013G01", "V03_S013G01", "V03_S013G02"],
+            ["V03_S014G01", "V03_S014G02", "V03_S014G02"],
+        ]
+        assert get_granules("newest")[1:] == [
+            ["V03_S013G01", "V03_S013G02"],
+            ["V03_S014G01", "V03_S014G02"],
+        ]
+        assert get_granules("first")[1] == ["V02_S013G01", "V03_S013G02"]
+        with pytest.raises(ValueError):
+            get_granules("oldest")
+
+    @pytest.mark.parametrize("sort", [False, True], ids=["unsorted", "sorted"])
+    @pytest.mark.parametrize("unmatched", ["drop", "batch"])
+    @pytest.mark.parametrize("deduplicate", ["", "first", "newest"], ids=["all", "first", "newest"])
+    def test_grouping_modes_give_identical_batches(
+        self, temp_output_dir, sort, unmatched, deduplicate
+    ):
+        in_message = Message(json.loads(self.__harmony_path.joinpath("message.json").read_text()))
+        in_catalog = Catalog.from_file(str(self.__harmony_path.joinpath("source", "catalog.json")))
+        template = Item.from_file(
+            str(self.__harmony_path.joinpath("source", "granule_S012G01.json"))
+        )
+        urls = [
+            f"s3://bucket/TEMPO_{product}_L2_{version}_2024060{day}T{11 + scan:02d}0000Z_S{scan:03d}G{granule:02d}.nc"
+            for product in ("NO2", "O3TOT")
+            for version in ("V03", "V02")
+            for day in (1, 2)
+            for scan in range(1, 5)
+            for granule in range(1, 6 if version == "V03" else 3)
+        ] + [f"s3://bucket/unmatched-{index}.nc" for index in (2, 0, 1)]
+        random.Random(0).shuffle(urls)
+
+        def many_granules_reader(catalog, **kwargs):
+            for index, url in enumerate(urls):
+                item = template.clone()
+                item.bbox = [-index, -1.0, index, 1.0]
+                item.assets["data"].href = url
+                yield item
+
+        def get_batches(parser=TEMPO_PARSER, **kwargs):
+            options = BatcheeOptions(
+                sort_batches=sort,
+                unmatched_granules=unmatched,
+                deduplicate_granules=deduplicate,
+                max_batch_granules=4,
+                **kwargs,
+            )
+            adapter = ConcatBatching(in_message, catalog=in_catalog, options=options)
+            adapter.filename_parser = parser
+            grouped = "grouping_memory" in kwargs
+            batches = adapter.iter_grouped_batches if grouped else adapter.group_batches
+            with patch("batchee.harmony.service_adapter._iter_catalog_items", many_granules_reader):
+                batches = list(batches(in_catalog))
+            return adapter.metrics.counters, [
+                [(url, item.bbox, _get_item_date_range(item)) for item, url in batch]
+                for batch in batches
+            ]
+
+        generic_parser = replace(TEMPO_PARSER, name="copy")
+        counters, expected = get_batches()
+        spilled_counters, spilled = get_batches(grouping_memory=4000)
+
+        assert spilled == expected
+        assert spilled_counters.pop("spilled_runs") > 1
+        assert spilled_counters.pop("spilled_bytes") > 0
+        assert spilled_counters == counters
+        assert get_batches(generic_parser)[1] == expected
+        assert get_batches(generic_parser, grouping_memory=4000)[1] == expected
+        assert get_batches(shard_threshold=1, shard_processes=2)[1] == expected
+        assert get_batches(parse_cache=str(temp_output_dir / "cache.sqlite"))[1] == expected
+
+    @pytest.mark.parametrize("fast_writer", ["false", "true"], ids=["pystac", "fast"])
+    def test_invoke_reports_metrics_and_profile(self, temp_output_dir, fast_writer):
+        metadata_dir = temp_output_dir / "metadata"
+        metrics_file = temp_output_dir / "batchee.prom"
+        test_args = [
+            batchee.harmony.cli.__file__,
+            "--harmony-action",
+            "invoke",
+            "--harmony-input",
+            self.__harmony_path.joinpath("message.json").read_text(),
+            "--harmony-source",
+            str(self.__harmony_path.joinpath("source", "catalog.json")),
+            "--harmony-metadata-dir",
+            str(metadata_dir),
+            "--harmony-data-location",
+            temp_output_dir.as_uri(),
+        ]
+        test_env = {
+            "ENV": "dev",
+            "BATCHEE_FAST_WRITER": fast_writer,
+            "BATCHEE_METRICS_FILE": str(metrics_file),
+            "BATCHEE_PROFILE": "cprofile",
+        }
+
+        with patch.object(sys, "argv", test_args), patch.dict(environ, test_env):
+            batchee.harmony.cli.main()
+
+        # The profile is saved beside the metadata directory, which Harmony reads
+        profile_path = temp_output_dir / "metadata-batchee-profile.prof"
+        assert pstats.Stats(str(profile_path)).total_calls > 0
+        assert not list(metadata_dir.glob("batchee-profile*"))
+        lines = metrics_file.read_text().splitlines()
+        assert "batchee_items 6" in lines
+        assert "batchee_batches 3" in lines
+        assert "batchee_largest_batch 2" in lines
+        [bytes_written] = [line for line in lines if line.startswith("batchee_bytes_written ")]
+        assert int(bytes_written.split()[1]) > 0
+        assert any(line.startswith('batchee_stage_seconds{stage="write_output"}') for line in lines)
@@ -0,0 +1,140 @@
+import json
+from datetime import UTC, datetime
+from pathlib import Path
+
+import pytest
+from pystac import Catalog, Item, Link
+
+from batchee.harmony.util import (
+    GranuleRecord,
+    _get_batch_catalog_template,
+    _get_item_date_range,
+    _get_item_size,
+    _get_item_url,
+    _iter_catalog_items,
+    get_batch_extent,
+    get_batch_fingerprint,
+    read_granule_record,
+)
+
+pytestmark = pytest.mark.usefixtures("harmony_env")
+
+source_path = Path(__file__).parent.resolve().joinpath("data", "harmony", "source")
+
+
+def test_parallel_item_reads_keep_catalog_order():
+    in_catalog_path = str(source_path / "catalog0.json")
+
+    serial_ids = [item.id for item in _iter_catalog_items(Catalog.from_file(in_catalog_path))]
+    parallel_ids = [
+        item.id for item in _iter_catalog_items(Catalog.from_file(in_catalog_path), max_workers=3)
+    ]
+
+    assert len(serial_ids) == 6
+    assert parallel_ids == serial_ids
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_next_page_link_must_point_to_a_catalog(max_workers):
+    in_catalog = Catalog.from_file(str(source_path / "catalog1.json"))
+    in_catalog.add_link(Link("next", "./granule_S012G01.json"))
+
+    with pytest.raises(ValueError, match="'next' link does not point to a STAC catalog"):
+        list(_iter_catalog_items(in_catalog, max_workers=max_workers))
+
+
+def test_batch_catalog_template_keeps_only_catalog_links():
+    in_catalog = Catalog.from_file(str(source_path / "catalog0.json"))
+
+    template = _get_batch_catalog_template(in_catalog)
+
+    assert sorted(link.rel for link in template.links) == ["harmony_source", "next", "root", "self"]
+    assert len(in_catalog.get_links(rel="item")) == 3
+
+
+def test_granule_records_match_pystac_items(temp_output_dir):
+    in_catalog_path = str(source_path / "catalog.json")
+    items = list(_iter_catalog_items(Catalog.from_file(in_catalog_path)))
+    records = list(
+        _iter_catalog_items(Catalog.from_file(in_catalog_path), read_item=read_granule_record)
+    )
+
+    assert len(records) == len(items) == 6
+    for item, record in zip(items, records, strict=True):
+        assert _get_item_url(record) == _get_item_url(item)
+        assert record.bbox == item.bbox
+        assert _get_item_date_range(record) == _get_item_date_range(item)
+        assert record.to_item().to_dict() == item.to_dict()
+
+    # A single datetime, a file size, and a data asset picked by its extension
+    item_dict = json.loads(Path(records[0].href).read_text())
+    item_dict["properties"] = {"datetime": "2024-06-01T12:01:01Z"}
+    item_dict["assets"] = {
+        "thumbnail": {"href": "preview.png", "roles": ["thumbnail"]},
+        "data": {"href": "granules/G01.NC", "roles": ["data"], "file:size": 1024},
+    }
+    item_path = temp_output_dir / "item.json"
+    item_path.write_text(json.dumps(item_dict))
+    record = read_granule_record(str(item_path))
+    item = Item.from_file(str(item_path))
+    assert record.url == _get_item_url(item) == "granules/G01.NC"
+    assert _get_item_size(record, record.url) == _get_item_size(item, record.url) == 1024
+    assert _get_item_date_range(record) == _get_item_date_range(item)
+
+    item_dict["assets"]["data"]["type"] = "image/png"
+    item_dict["properties"] = {"start_datetime": "2024-06-01T12:01:01Z"}
+    item_path.write_text(json.dumps(item_dict))
+    with pytest.raises(ValueError):
+        read_granule_record(str(item_path))
+    item_dict["properties"]["end_datetime"] = "2024-06-01T12:02:01Z"
+    item_path.write_text(json.dumps(item_dict))
+    assert read_granule_record(str(item_path)).url is None
+
+
+def test_batch_extent_leaves_items_unchanged():
+    def utc(hour):
+        return datetime(2024, 6, 1, hour, tzinfo=UTC)
+
+    items = [
+        Item("a", None, [-100.0, 20.0, -90.0, 30.0], utc(12), {}),
+        Item(
+            "b",
+            None,
+            [-110.0, 25.0, 0.0, -95.0, 40.0, 10.0],
+            None,
+            {"start_datetime": utc(10).isoformat(), "end_datetime": utc(11).isoformat()},
+        ),
+        GranuleRecord("c.json", "c.nc", None, utc(13), utc(14), None),
+    ]
+    bboxes = [list(item.bbox) if item.bbox else None for item in items]
+
+    extent = get_batch_extent(items)
+
+    assert extent == ([-110.0, 20.0, -90.0, 40.0], items[1].common_metadata.start_datetime, utc(14))
+    assert [item.bbox for item in items] == bboxes
+    assert get_batch_extent(items[2:]).bbox is None
+    with pytest.raises(ValueError):
+        get_batch_extent([])
+
+
+def test_batch_fingerprint_ignores_order():
+    urls = [
+        f"s3://bucket/TEMPO_NO2_L2_V03_20240601T120101Z_S012G0{granule}.nc" for granule in (1, 2)
+    ]
+
+    assert get_batch_fingerprint(urls) == get_batch_fingerprint(reversed(urls))
+    assert get_batch_fingerprint(urls) != get_batch_fingerprint(urls[1:])
+
+
+def test_item_size_from_asset_or_local_file(temp_output_dir):
+    item = Item.from_file(str(source_path / "granule_S012G01.json"))
+    url = next(iter(item.assets.values())).href
+    assert _get_item_size(item, url) is None
+
+    next(iter(item.assets.values())).extra_fields["file:size"] = 1234
+    assert _get_item_size(item, url) == 1234
+
+    local_file = temp_output_dir / "granule.nc"
+    local_file.write_bytes(b"x" * 10)
+    assert _get_item_size(item, str(local_file)) == 10
+    assert _get_item_size(item, local_file.as_uri()) == 10
@@ -0,0 +1,156 @@
+import json
+from pathlib import Path
+
+import pytest
+from harmony_service_lib.message import Message
+from pystac import Catalog
+
+from batchee.harmony.options import BatcheeOptions
+from batchee.harmony.previous_output import PreviousOutput
+from batchee.harmony.service_adapter import ConcatBatching
+from batchee.harmony.util import _get_batch_catalog_template
+from batchee.harmony.writers import (
+    _get_profile_path,
+    _invoke,
+    write_batch_catalogs,
+    write_batch_json,
+)
+
+pytestmark = pytest.mark.usefixtures("harmony_env")
+
+harmony_path = Path(__file__).parent.resolve().joinpath("data", "harmony")
+
+
+@pytest.fixture
+def adapter():
+    in_message = Message(json.loads(harmony_path.joinpath("message.json").read_text()))
+    in_catalog = Catalog.from_file(str(harmony_path.joinpath("source", "catalog0.json")))
+    options = BatcheeOptions(batch_extent=True, batch_fingerprint=True)
+    return ConcatBatching(in_message, catalog=in_catalog, options=options)
+
+
+def write_json(adapter, batches, out_dir, previous=None):
+    """Write batches with the fast writer, with the batch fields of the adapter."""
+    return write_batch_json(
+        adapter.catalog,
+        batches,
+        str(out_dir),
+        metrics=adapter.metrics,
+        get_batch_fields=adapter.get_batch_fields,
+        previous=previous,
+    )
+
+
+def read_outputs(out_dir):
+    """Read each batch catalog and its items, with their generated ids and hrefs removed."""
+    outputs = []
+    for catalog_name in json.loads(out_dir.joinpath("batch-catalogs.json").read_text()):
+        out_catalog = json.loads(out_dir.joinpath(catalog_name).read_text())
+        items = []
+        for link in out_catalog["links"]:
+            if link["rel"] == "item":
+                item = json.loads(out_dir.joinpath(link.pop("href")).read_text())
+                item.pop("id")
+                items.append(item)
+        out_catalog.pop("id")
+        outputs.append((out_catalog, items))
+    return outputs
+
+
+def test_fast_writer_matches_pystac_writer(adapter, temp_output_dir):
+    batches = adapter.group_batches(adapter.catalog)
+    pystac_dir, json_dir = temp_output_dir / "pystac", temp_output_dir / "json"
+    template = _get_batch_catalog_template(adapter.catalog)
+    write_batch_catalogs(
+        [adapter._build_batch_catalog(template, i, batch) for i, batch in enumerate(batches)],
+        str(pystac_dir),
+    )
+    write_json(adapter, batches, json_dir)
+
+    assert read_outputs(json_dir) == read_outputs(pystac_dir)
+    assert json_dir.joinpath("batch-count.txt").read_text() == "3"
+    assert read_outputs(json_dir)[0][0]["batchee:extent"] == {
+        "spatial": {"bbox": [[-1.0, -3.0, 1.0, 3.0]]},
+        "temporal": {"interval": [["2020-01-02T00:00:00+00:00", "2020-01-03T23:59:59+00:00"]]},
+    }
+
+
+def test_batch_fields_are_opt_in(adapter):
+    batch = adapter.group_batches(adapter.catalog)[0]
+    adapter.options = BatcheeOptions()
+    assert adapter.get_batch_fields(batch) == {}
+
+    adapter.options = BatcheeOptions(previous_output="previous")
+    assert list(adapter.get_batch_fields(batch)) == ["batchee:fingerprint"]
+
+
+def test_unchanged_batches_reuse_previous_items(adapter, temp_output_dir):
+    batches = adapter.group_batches(adapter.catalog)
+    previous_dir, full_dir, incremental_dir = (
+        temp_output_dir / "previous",
+        temp_output_dir / "full",
+        temp_output_dir / "incremental",
+    )
+    write_json(adapter, batches, previous_dir)
+
+    # The second scan lost a granule since the previous run
+    batches[1] = batches[1][1:]
+    write_json(adapter, batches, full_dir)
+    previous = PreviousOutput.read(str(previous_dir))
+    assert len(previous) == 3
+    write_json(adapter, batches, incremental_dir, previous)
+
+    assert read_outputs(incremental_dir) == read_outputs(full_dir)
+    assert adapter.metrics.counters["reused_batches"] == 2
+    # Only the item of the changed batch is written again
+    assert len([child for child in incremental_dir.iterdir() if child.is_dir()]) == 1
+    assert len(PreviousOutput.read(str(temp_output_dir))) == 0
+
+
+@pytest.mark.parametrize("change", ["inserted", "removed"])
+def test_shifted_batches_are_not_reused(adapter, temp_output_dir, change):
+    batches = adapter.group_batches(adapter.catalog)
+    previous_dir, out_dir = temp_output_dir / "previous", temp_output_dir / "out"
+    write_json(adapter, batches, previous_dir)
+
+    # A batch before the last two is added or dropped, which shifts their indices
+    if change == "inserted":
+        batches.insert(1, batches[1][:1])
+    else:
+        del batches[1]
+    write_json(adapter, batches, out_dir, PreviousOutput.read(str(previous_dir)))
+
+    assert adapter.metrics.counters["reused_batches"] == 1
+    for catalog_name in json.loads(out_dir.joinpath("batch-catalogs.json").read_text()):
+        out_catalog = json.loads(out_dir.joinpath(catalog_name).read_text())
+        for link in out_catalog["links"]:
+            if link["rel"] == "item":
+                item_path = out_dir.joinpath(link["href"]).resolve()
+                item = json.loads(item_path.read_text())
+                # Each item's parent is a catalog of the same batch, in this run or the last
+                [parent_href] = [link["href"] for link in item["links"] if link["rel"] == "parent"]
+                parent = json.loads(item_path.parent.joinpath(parent_href).read_text())
+                assert parent["batchee:fingerprint"] == out_catalog["batchee:fingerprint"]
+
+
+def test_failed_invocation_writes_error_file(adapter, temp_output_dir):
+    adapter.catalog = None
+
+    with pytest.raises(RuntimeError):
+        _invoke(adapter, str(temp_output_dir))
+
+    assert json.loads(temp_output_dir.joinpath("error.json").read_text()) == {
+        "error": "Service request failed with an unknown error",
+        "category": "Unknown",
+        "level": "Error",
+    }
+
+
+def test_profile_path_is_outside_the_metadata_dir():
+    options = BatcheeOptions(profile="cprofile")
+
+    assert _get_profile_path(options, "s3://bucket/job/metadata/", "id") == (
+        "s3://bucket/job/metadata-batchee-profile"
+    )
+    options = BatcheeOptions(profile="cprofile", profile_dir="/profiles")
+    assert _get_profile_path(options, "/job/metadata", "id") == "/profiles/batchee-profile-id"
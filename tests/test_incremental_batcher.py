@@ -0,0 +1,75 @@
+import json
+
+from pystac import Asset, Item
+
+from batchee.incremental import IncrementalBatcher
+from batchee.tempo_filename_parser import get_batch_indices
+from tests.test_filename_grouping import example_filenames, example_nrt_filenames
+
+
+def test_incremental_batches_match_get_batch_indices():
+    for filenames in [example_filenames, example_nrt_filenames]:
+        batcher = IncrementalBatcher()
+
+        assert [batcher.add(name) for name in filenames] == get_batch_indices(filenames)
+
+
+def test_batches_close_when_a_later_scan_arrives():
+    batcher = IncrementalBatcher()
+
+    assert batcher.add_many(example_filenames[0:3]) == [0, 0, 0]
+    assert batcher.pop_closed() == []
+
+    assert batcher.add(example_filenames[3]) == 1
+    assert batcher.pop_closed() == [0]
+    assert batcher.open_batches == {("20240731", "S017"): 1}
+
+    batcher.add_many(example_filenames[4:])
+    assert batcher.pop_closed() == [1]
+    assert batcher.close_all() == [2]
+    assert batcher.open_batches == {}
+
+
+def test_late_granule_starts_a_closed_batch():
+    batcher = IncrementalBatcher()
+    batcher.add_many(example_filenames[0:4])
+    batcher.pop_closed()
+
+    assert batcher.add(example_filenames[0]) == 2
+    assert batcher.pop_closed() == [2]
+
+
+def test_interleaved_scans_with_more_open_batches():
+    interleaved = [example_filenames[i] for i in [0, 3, 1, 4, 2, 5, 6]]
+    batcher = IncrementalBatcher(max_open_batches=2)
+
+    assert batcher.add_many(interleaved) == [0, 1, 0, 1, 0, 1, 2]
+    assert batcher.pop_closed() == [0]
+
+
+def test_unmatched_names_are_skipped():
+    batcher = IncrementalBatcher()
+
+    assert batcher.add_many(["not_a_granule.nc", example_filenames[0]]) == [None, 0]
+
+
+def test_stac_items():
+    batcher = IncrementalBatcher()
+    items = []
+    for name in example_filenames[2:4]:
+        item = Item(name, None, None, None, {"start_datetime": "", "end_datetime": ""})
+        item.add_asset("data", Asset(f"s3://bucket/{name}", roles=["data"]))
+        items.append(item)
+
+    assert batcher.add_many(items) == [0, 1]
+
+
+def test_snapshot_and_restore():
+    batcher = IncrementalBatcher(max_open_batches=2)
+    batcher.add_many(example_filenames[0:5])
+
+    restored = IncrementalBatcher.from_snapshot(json.loads(json.dumps(batcher.snapshot())))
+
+    assert restored.snapshot() == batcher.snapshot()
+    assert restored.add_many(example_filenames[5:]) == batcher.add_many(example_filenames[5:])
+    assert restored.pop_closed() == batcher.pop_closed()
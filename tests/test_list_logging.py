@@ -0,0 +1,54 @@
+import json
+import logging
+
+from batchee.list_logging import ListSummary, get_list_hash, log_list
+
+
+class UnprintableList(list):
+    """A list that fails the test if it is ever formatted."""
+
+    def __repr__(self):
+        raise AssertionError("the list was formatted")
+
+    __str__ = __repr__
+
+
+def test_summary_shows_count_edges_and_hash():
+    values = [f"granule-{i}.nc" for i in range(100)]
+
+    summary = str(ListSummary(values, edge_items=2))
+
+    assert summary == (
+        "['granule-0.nc', 'granule-1.nc', ..., 'granule-98.nc', 'granule-99.nc']"
+        f" (count=100, hash={get_list_hash(values)})"
+    )
+    assert str(ListSummary([1, 2])) == f"[1, 2] (count=2, hash={get_list_hash([1, 2])})"
+    assert get_list_hash(values) != get_list_hash(values[:-1])
+
+
+def test_full_list_only_at_debug(caplog):
+    logger = logging.getLogger("batchee.test")
+    values = list(range(10))
+
+    with caplog.at_level(logging.INFO, logger="batchee.test"):
+        log_list(logger, "batch_indices", values)
+    assert [record.levelno for record in caplog.records] == [logging.INFO]
+    assert "count=10" in caplog.records[0].getMessage()
+
+    caplog.clear()
+    with caplog.at_level(logging.DEBUG, logger="batchee.test"):
+        log_list(logger, "batch_indices", values)
+    assert caplog.records[1].getMessage() == f"batch_indices (all)==={values}."
+
+
+def test_filtered_lists_are_not_formatted():
+    logger = logging.getLogger("batchee.test.quiet")
+    logger.setLevel(logging.WARNING)
+
+    log_list(logger, "netcdf_urls", UnprintableList(["a", "b"]))
+
+
+def test_full_list_written_to_dump_dir(tmp_path):
+    log_list(logging.getLogger("batchee.test"), "netcdf_urls", ["a.nc", "b.nc"], str(tmp_path))
+
+    assert json.loads(tmp_path.joinpath("netcdf_urls.json").read_text()) == ["a.nc", "b.nc"]
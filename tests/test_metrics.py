@@ -0,0 +1,75 @@
+import json
+import logging
+
+import pytest
+
+from batchee.harmony.metrics import (
+    InvocationMetrics,
+    export_opentelemetry,
+    write_prometheus_textfile,
+)
+
+
+def test_stages_and_counters():
+    metrics = InvocationMetrics()
+
+    with metrics.stage("group"):
+        pass
+    assert list(metrics.timed("read_items", [1, 2, 3])) == [1, 2, 3]
+    metrics.count("items", 3)
+    metrics.record_max("largest_batch", 2)
+    metrics.record_max("largest_batch", 1)
+
+    record = metrics.as_dict()
+    assert set(record["stage_seconds"]) == {"group", "read_items"}
+    assert record["counters"] == {"items": 3, "largest_batch": 2}
+    assert record["items_per_second"] > 0
+
+
+def test_log_writes_one_json_record(caplog):
+    metrics = InvocationMetrics()
+    metrics.count("batches", 2)
+
+    with caplog.at_level(logging.INFO):
+        metrics.log(logging.getLogger("batchee.test"))
+
+    [log_record] = caplog.records
+    message = log_record.getMessage()
+    assert message.startswith("batchee.metrics ")
+    assert json.loads(message.removeprefix("batchee.metrics "))["counters"] == {"batches": 2}
+
+
+def test_prometheus_textfile(tmp_path):
+    metrics = InvocationMetrics()
+    metrics.add_time("read_items", 1.5)
+    metrics.count("items", 6)
+    filename = tmp_path / "batchee.prom"
+
+    write_prometheus_textfile(metrics.as_dict(), str(filename))
+
+    lines = filename.read_text().splitlines()
+    assert 'batchee_stage_seconds{stage="read_items"} 1.5' in lines
+    assert "batchee_items 6" in lines
+    assert list(tmp_path.iterdir()) == [filename]
+
+
+def test_opentelemetry_export():
+    sdk_metrics = pytest.importorskip("opentelemetry.sdk.metrics")
+    sdk_export = pytest.importorskip("opentelemetry.sdk.metrics.export")
+    from opentelemetry import metrics as otel_metrics
+
+    reader = sdk_export.InMemoryMetricReader()
+    otel_metrics.set_meter_provider(sdk_metrics.MeterProvider(metric_readers=[reader]))
+    metrics = InvocationMetrics()
+    metrics.add_time("group", 0.25)
+    metrics.count("batches", 3)
+
+    export_opentelemetry(metrics.as_dict())
+
+    names = {
+        metric.name
+        for resource_metrics in reader.get_metrics_data().resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+    assert {"batchee.stage.duration", "batchee.batches"} <= names
@@ -0,0 +1,130 @@
+import multiprocessing
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from batchee.parse_cache import ParseCache, ParsedGranule, parse_granule
+from batchee.tempo_filename_parser import get_batch_indices
+from tests.test_filename_grouping import example_filenames, example_nrt_filenames
+
+
+def test_parse_granule():
+    assert parse_granule("s3://bucket/TEMPO_NO2_L2_NRT_V02_20250712T000606Z_S016G03.nc") == (
+        ParsedGranule("NO2", "L2", "NRT_V02", "20250711", "S016", "G03")
+    )
+    assert parse_granule("TEMPO_O3TOT-PROXY_L3_V01_20240601T120000Z_S001G01.nc").product == (
+        "O3TOT-PROXY"
+    )
+    assert parse_granule("not-a-granule.nc") is None
+
+
+def test_batch_indices_with_cache(tmp_path):
+    filenames = [f"s3://bucket/{name}" for name in example_filenames + example_nrt_filenames]
+    filenames.insert(3, "s3://bucket/not-a-granule.nc")
+    cache = ParseCache(str(tmp_path / "cache.sqlite"))
+
+    assert get_batch_indices(filenames, cache=cache) == get_batch_indices(filenames)
+    assert len(cache) == len(example_filenames + example_nrt_filenames)
+
+    # Served from the cache, by base name, in a new connection
+    moved = [filename.replace("s3://bucket/", "/staging/") for filename in filenames]
+    reopened = ParseCache(str(tmp_path / "cache.sqlite"))
+    assert get_batch_indices(moved, cache=reopened) == get_batch_indices(filenames)
+
+
+def test_cache_parses_the_whole_url(tmp_path):
+    ex = example_filenames
+    filenames = [
+        f"s3://bucket/{ex[0]}",
+        f"{ex[1]}?x=1/2",
+        f"{ex[3][:-3]}/data.nc",
+        ex[6],
+        f"{ex[7][:-3]}/data.nc",
+        f"x{ex[3]}?x=1/2",
+    ]
+    cache = ParseCache(str(tmp_path / "cache.sqlite"))
+
+    assert cache.parse_many(filenames) == [parse_granule(filename) for filename in filenames]
+    assert get_batch_indices(filenames, cache=cache) == get_batch_indices(filenames)
+    assert get_batch_indices(filenames, cache=cache) == [0, 0, 1, 2, 2, 1]
+    # Only the granules named by their base name are cached
+    assert len(cache) == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache.sqlite"), max_entries=3)
+    cache.parse_many(example_filenames[:3])
+    cache.connection.execute("UPDATE granules SET last_used = 0")
+    # A hit refreshes the last use of the first granule
+    cache.parse_many(example_filenames[:1])
+
+    cache.parse_many(example_filenames[3:5])
+
+    names = {row[0] for row in cache.connection.execute("SELECT name FROM granules")}
+    assert names == {example_filenames[0], example_filenames[3], example_filenames[4]}
+
+
+def test_entries_are_counted_only_every_recount_interval(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache.sqlite"), max_entries=4)
+    cache._RECOUNT_INTERVAL = 3
+    statements = []
+    cache.connection.set_trace_callback(statements.append)
+
+    for filename in example_filenames[:6]:
+        cache.parse_many([filename])
+
+    assert [statement for statement in statements if "COUNT" in statement] == [
+        "SELECT COUNT(*) FROM granules"
+    ] * 2
+    assert len(cache) == 4
+    # Another process evicted entries since the last count
+    cache.connection.execute("DELETE FROM granules")
+    cache.parse_many(example_filenames[6:9])
+    assert len(cache) == 3
+
+
+class _LockedConnection(sqlite3.Connection):
+    def execute(self, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_connection_retries_while_database_is_locked(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    connect = sqlite3.connect
+    calls = []
+
+    def connect_locked_once(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            return connect(*args, **kwargs, factory=_LockedConnection)
+        return connect(*args, **kwargs)
+
+    with patch("batchee.parse_cache.sqlite3.connect", connect_locked_once):
+        cache = ParseCache(path)
+        assert cache.parse_many(example_filenames[:1]) == [parse_granule(example_filenames[0])]
+        assert len(calls) == 2
+
+        # No retry once the timeout has passed
+        calls.clear()
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            ParseCache(path, timeout=0).parse_many(example_filenames[:1])
+
+
+def _parse_in_worker(arguments):
+    path, filenames = arguments
+    return [tuple(granule) for granule in ParseCache(path).parse_many(filenames)]
+
+
+def test_concurrent_worker_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    filenames = example_filenames + example_nrt_filenames
+    chunks = [(path, filenames[start::3]) for start in range(3)] * 2
+
+    with multiprocessing.get_context("spawn").Pool(3) as pool:
+        results = pool.map(_parse_in_worker, chunks)
+
+    assert [list(map(ParsedGranule._make, result)) for result in results] == [
+        [parse_granule(filename) for filename in chunk] for _, chunk in chunks
+    ]
+    assert len(ParseCache(path)) == len(filenames)
@@ -0,0 +1,149 @@
+import re
+
+import pytest
+
+from batchee.granule_table import GranuleTable
+from batchee.incremental import IncrementalBatcher
+from batchee.parsers import (
+    TEMPO_PARSER,
+    FilenameParser,
+    ParserRegistry,
+    default_registry,
+    fields_key,
+    hour_window_key,
+)
+from batchee.sharding import get_batch_indices_sharded
+from batchee.tempo_filename_parser import get_batch_indices
+from tests.test_filename_grouping import example_filenames, example_nrt_filenames
+
+orbit_parser = FilenameParser(
+    name="orbit",
+    prefixes=("OMI-Aura_",),
+    pattern=re.compile(
+        r".*OMI-Aura_L2-(?P<product>\w+)_(?P<day>\d{4}m\d{4})t\d{4}-o(?P<orbit>\d{6})"
+    ),
+    key=fields_key("orbit"),
+    collections=("C0000000001-EXAMPLE",),
+)
+
+window_parser = FilenameParser(
+    name="window",
+    prefixes=("GEO_",),
+    pattern=re.compile(r".*GEO_(?P<day>\d{8})T(?P<hour>\d{2})\d{4}\.nc"),
+    key=hour_window_key(6),
+)
+
+omi_filenames = [
+    "s3://bucket/OMI-Aura_L2-OMNO2_2024m0801t0035-o106512_v003.he5",
+    "s3://bucket/OMI-Aura_L2-OMNO2_2024m0801t0214-o106513_v003.he5",
+    "s3://bucket/OMI-Aura_L2-OMNO2_2024m0801t0214-o106513_v004.he5",
+]
+
+
+def test_tempo_parser_matches_tempo_batch_indices():
+    urls = [f"s3://bucket/path/{name}" for name in example_filenames + example_nrt_filenames]
+
+    assert TEMPO_PARSER.get_batch_indices(urls) == get_batch_indices(urls)
+
+
+def test_fields_and_hour_window_keys():
+    assert orbit_parser.get_batch_indices(omi_filenames) == [0, 1, 1]
+
+    names = ["GEO_20240801T000000.nc", "GEO_20240801T055959.nc", "GEO_20240801T060000.nc"]
+    assert [window_parser.get_key(name) for name in names] == [
+        ("20240801", 0),
+        ("20240801", 0),
+        ("20240801", 1),
+    ]
+
+
+def test_registry_routes_mixed_collections():
+    registry = ParserRegistry([TEMPO_PARSER, orbit_parser, window_parser])
+    names = [example_filenames[3], omi_filenames[0], example_filenames[4], "unknown.nc"]
+
+    assert [registry.route(name) for name in names] == [
+        TEMPO_PARSER,
+        orbit_parser,
+        TEMPO_PARSER,
+        None,
+    ]
+    assert registry.get_batch_indices(names) == [0, 1, 0]
+    assert registry.get_key(omi_filenames[1]) == ("orbit", "106513")
+
+
+def test_registry_prefers_longest_prefix():
+    nrt_parser = FilenameParser(
+        name="tempo-nrt",
+        prefixes=("TEMPO_NO2_L2_NRT_",),
+        pattern=re.compile(r".*TEMPO_NO2_L2_NRT_V\d+_(?P<day>\d{8})"),
+        key=fields_key("day"),
+    )
+    registry = ParserRegistry([TEMPO_PARSER, nrt_parser])
+
+    assert registry.route(example_nrt_filenames[0]) is nrt_parser
+    assert registry.route(example_filenames[0]) is TEMPO_PARSER
+
+
+def test_registry_falls_back_to_full_patterns():
+    registry = ParserRegistry([TEMPO_PARSER, orbit_parser])
+    # Accepted by the TEMPO pattern, although it does not start with "TEMPO_"
+    prefixed = f"s3://bucket/x{example_filenames[3]}"
+
+    assert registry.route(prefixed) is TEMPO_PARSER
+    assert registry.get_key(prefixed) == registry.get_key(example_filenames[3])
+    assert registry.get_batch_indices([prefixed, example_filenames[4]]) == [0, 0]
+    assert registry.route("unknown.nc") is None
+    assert registry.get_key("unknown.nc") is None
+
+
+def test_registry_rejects_duplicates():
+    registry = ParserRegistry([TEMPO_PARSER])
+
+    with pytest.raises(ValueError, match="named 'tempo'"):
+        registry.register(TEMPO_PARSER)
+    with pytest.raises(ValueError, match="Prefix 'TEMPO_'"):
+        registry.register(FilenameParser("other", ("TEMPO_",), re.compile("x"), fields_key()))
+
+
+def test_registry_for_collection():
+    registry = ParserRegistry([TEMPO_PARSER, orbit_parser])
+
+    assert registry.for_collection("C0000000001-EXAMPLE") is orbit_parser
+    assert registry.for_collection("C1234088182-EEDTEST", "TEMPO_NO2_L2") is TEMPO_PARSER
+    assert registry.for_collection("C1234088182-EEDTEST") is None
+
+
+def test_incremental_batcher_with_parser_key():
+    batcher = IncrementalBatcher(get_key=orbit_parser.get_key)
+
+    assert batcher.add_many(omi_filenames) == [0, 1, 1]
+    assert batcher.pop_closed() == [0]
+
+    restored = IncrementalBatcher.from_snapshot(batcher.snapshot(), get_key=orbit_parser.get_key)
+    assert restored.open_batches == {("106513",): 1}
+
+
+def test_all_paths_match_the_whole_url():
+    # Granule names in a directory, or followed by a query string holding a "/"
+    urls = [
+        f"s3://bucket/{example_filenames[0]}",
+        f"s3://bucket/{example_filenames[1]}?x=1/2",
+        f"s3://bucket/{example_filenames[3][:-3]}/data.nc",
+        f"s3://bucket/{example_filenames[6]}",
+        f"s3://bucket/{example_filenames[7][:-3]}/data.nc",
+        f"s3://bucket/x{example_filenames[3]}?x=1/2",
+    ]
+    expected = get_batch_indices(urls)
+    registry = ParserRegistry([TEMPO_PARSER, orbit_parser])
+
+    assert expected == [0, 0, 1, 2, 2, 1]
+    assert GranuleTable.from_urls(urls).batch_indices() == expected
+    assert IncrementalBatcher(4).add_many(urls) == expected
+    assert TEMPO_PARSER.get_batch_indices(urls) == expected
+    assert default_registry.get_batch_indices(urls) == expected
+    assert registry.get_batch_indices(urls) == expected
+    assert get_batch_indices_sharded(urls, default_registry.get_key, 2) == expected
+    assert None not in [registry.get_sort_key(url) for url in urls]
+
+    vectorized = pytest.importorskip("batchee.vectorized")
+    assert list(vectorized.get_batch_indices_array(urls)) == expected
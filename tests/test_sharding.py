@@ -0,0 +1,35 @@
+import pytest
+
+from batchee.parsers import default_registry
+from batchee.sharding import _get_shards, get_batch_indices_sharded
+from batchee.tempo_filename_parser import get_batch_indices
+from tests.test_filename_grouping import example_filenames, example_nrt_filenames
+
+filenames = [
+    f"s3://bucket/{name}"
+    for name in example_filenames + example_nrt_filenames + example_filenames[::-1]
+]
+filenames.insert(4, "not-a-granule.nc")
+
+
+def test_shards_hold_whole_lines():
+    data = b"a\nbb\n\nccc"
+    shards = _get_shards(data, 3)
+
+    assert [data[start:end] for start, end, _ in shards] == [b"a\nbb", b"\nccc"]
+    assert [row for _, _, row in shards] == [0, 2]
+    assert _get_shards(b"a", 4) == [(0, 1, 0)]
+
+
+@pytest.mark.parametrize("processes", [1, 2, 3, 8])
+def test_same_batches_as_serial(processes):
+    assert get_batch_indices_sharded(filenames, processes=processes) == get_batch_indices(filenames)
+    assert get_batch_indices_sharded(
+        filenames, default_registry.get_key, processes
+    ) == default_registry.get_batch_indices(filenames)
+
+
+def test_empty_and_invalid_input():
+    assert get_batch_indices_sharded([], processes=2) == []
+    with pytest.raises(ValueError, match="newlines"):
+        get_batch_indices_sharded(["TEMPO_a\nb.nc"], processes=2)
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from batchee.spill import ExternalSorter
+
+
+@pytest.mark.parametrize(
+    ("memory_budget", "max_fan_in"),
+    [(1, 64), (1, 2), (2000, 64), (2000, 3), (10**9, 2)],
+    ids=["run-per-pair", "run-per-pair-passes", "runs", "runs-passes", "memory"],
+)
+def test_pairs_are_merged_in_stable_key_order(temp_output_dir, memory_budget, max_fan_in):
+    rng = random.Random(0)
+    pairs = [(rng.randrange(20), index) for index in range(500)]
+
+    with ExternalSorter(memory_budget, str(temp_output_dir), max_fan_in) as sorter:
+        for key, value in pairs:
+            sorter.add(key, value)
+        merged = list(sorter)
+
+    assert merged == sorted(pairs, key=lambda pair: pair[0])
+    assert (sorter.run_count == 0) == (memory_budget == 10**9)
+    assert list(temp_output_dir.iterdir()) == []
+
+
+def test_budget_bounds_the_buffer_and_the_runs_are_removed(temp_output_dir):
+    sorter = ExternalSorter(10_000, directory=str(temp_output_dir))
+    for index in range(1000):
+        sorter.add((-index, "key"), {"value": index})
+
+    assert sorter.run_count > 1
+    assert sorter._buffered_bytes < 10_000
+    assert sorter.spilled_bytes > 0
+    assert [value["value"] for _, value in sorter] == list(range(999, -1, -1))
+    assert len(list(temp_output_dir.iterdir())) == 1
+
+    sorter.close()
+    assert list(temp_output_dir.iterdir()) == []
+    with pytest.raises(ValueError):
+        ExternalSorter(0)
+    with pytest.raises(ValueError):
+        ExternalSorter(1, max_fan_in=1)
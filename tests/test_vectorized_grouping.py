@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from batchee.tempo_filename_parser import get_batch_indices
+from tests.test_filename_grouping import example_filenames, example_nrt_filenames
+
+np = pytest.importorskip("numpy")
+
+from batchee.vectorized import get_batch_indices_array  # noqa: E402
+
+mixed_filenames = [
+    "s3://bucket/TEMPO_NO2_L2/2024/TEMPO_NO2_L2_V03_20240731T235252Z_S016G04.nc",
+    "https://host/TEMPO_HCHO-PROXY_L2_V01_20240801T000606Z_S016G06_subsetted.nc4",
+    "not_a_tempo_granule.nc",
+    "TEMPO_NO2_L2_V03_20240801T001302Z_S017G01.nc.h5",
+    "TEMPO_NO2_L2_V03_20240801T001302Z_S017G02_Z_S.nc",
+    "TEMPO_NO2_L2_V03_20240801T001942Z_S017G02.txt",
+    "TEMPO_TEMPO_L2_V03_20240801T002619Z_S017G03.nc",
+    "TEMPO_O3TOT_L3_NRT_V02_20240801T233313Z_S016G01.nc",
+]
+
+
+@pytest.mark.parametrize(
+    "filenames", [example_filenames, example_nrt_filenames, mixed_filenames, []]
+)
+def test_array_grouping_matches_scalar(filenames):
+    results = get_batch_indices_array(np.array(filenames, dtype=str))
+
+    assert results.dtype == np.int32
+    assert results.tolist() == get_batch_indices(filenames)
+
+
+def test_array_grouping_of_shuffled_synthetic_names():
+    rng = random.Random(42)
+    filenames = [
+        f"TEMPO_NO2_L2_V03_2024{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}"
+        f"T{rng.randint(0, 23):02d}{rng.randint(0, 59):02d}{rng.randint(0, 59):02d}Z_"
+        f"S{rng.randint(1, 16):03d}G{rng.randint(1, 9):02d}.nc"
+        for _ in range(2000)
+    ]
+
+    assert get_batch_indices_array(filenames).tolist() == get_batch_indices(filenames)
+
+
+def test_array_grouping_across_dst_transitions():
+    filenames = [
+        f"TEMPO_NO2_L2_V03_{day}T{hour:02d}1530Z_S{hour % 5 + 1:03d}G01.nc"
+        for day in ["20240309", "20240310", "20240311", "20241102", "20241103", "20241104"]
+        for hour in range(24)
+    ]
+
+    assert get_batch_indices_array(filenames).tolist() == get_batch_indices(filenames)
+
+
+def test_array_grouping_invalid_date_raises_like_scalar():
+    filenames = ["TEMPO_NO2_L2_V03_20240230T120000Z_S016G04.nc"]
+
+    with pytest.raises(ValueError):
+        get_batch_indices(filenames)
+    with pytest.raises(ValueError):
+        get_batch_indices_array(filenames)
+
+
+def test_array_grouping_from_pyarrow():
+    pa = pytest.importorskip("pyarrow")
+
+    results = get_batch_indices_array(pa.array(example_filenames))
+
+    assert results.tolist() == [0, 0, 0, 1, 1, 1, 2, 2, 2]